@@ -0,0 +1,31 @@
+"""add session history summary
+
+Revision ID: 3f1c9a7d2b64
+Revises: ebad77aec718
+Create Date: 2026-10-18 18:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7d2b64'
+down_revision: Union[str, None] = 'ebad77aec718'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("sessions", sa.Column("history_summary", sa.Text(), nullable=True))
+    op.add_column("sessions", sa.Column("history_summary_until", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+
+    op.drop_column("sessions", "history_summary_until")
+    op.drop_column("sessions", "history_summary")
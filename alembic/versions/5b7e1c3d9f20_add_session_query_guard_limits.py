@@ -0,0 +1,33 @@
+"""add session query guard limits
+
+Revision ID: 5b7e1c3d9f20
+Revises: 8d2e4b6f1a93
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e1c3d9f20'
+down_revision: Union[str, None] = '8d2e4b6f1a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("sessions", sa.Column("query_max_cost", sa.Float(), nullable=True))
+    op.add_column("sessions", sa.Column("query_max_plan_rows", sa.Integer(), nullable=True))
+    op.add_column("sessions", sa.Column("query_statement_timeout_ms", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+
+    op.drop_column("sessions", "query_statement_timeout_ms")
+    op.drop_column("sessions", "query_max_plan_rows")
+    op.drop_column("sessions", "query_max_cost")
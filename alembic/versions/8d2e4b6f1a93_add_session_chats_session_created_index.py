@@ -0,0 +1,35 @@
+"""add session_chats (session_id, created_at) index
+
+Revision ID: 8d2e4b6f1a93
+Revises: 3f1c9a7d2b64
+Create Date: 2026-10-18 18:45:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2e4b6f1a93'
+down_revision: Union[str, None] = '3f1c9a7d2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # id breaks ties between messages saved in the same transaction, so keyset
+    # pagination on (created_at, id) is served by the index alone
+    op.create_index(
+        "ix_session_chats_session_id_created_at",
+        "session_chats",
+        ["session_id", sa.text("created_at DESC"), sa.text("id DESC")],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+
+    op.drop_index("ix_session_chats_session_id_created_at", table_name="session_chats")
@@ -0,0 +1,29 @@
+"""add session_chats result handle
+
+Revision ID: a4c8e2f61b07
+Revises: 5b7e1c3d9f20
+Create Date: 2026-10-18 19:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c8e2f61b07'
+down_revision: Union[str, None] = '5b7e1c3d9f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("session_chats", sa.Column("result_handle", sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+
+    op.drop_column("session_chats", "result_handle")
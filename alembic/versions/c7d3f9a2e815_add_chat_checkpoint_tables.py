@@ -0,0 +1,70 @@
+"""add chat checkpoint tables
+
+Revision ID: c7d3f9a2e815
+Revises: a4c8e2f61b07
+Create Date: 2026-10-18 20:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d3f9a2e815'
+down_revision: Union[str, None] = 'a4c8e2f61b07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "chat_checkpoints",
+        sa.Column("thread_id", sa.String(), nullable=False),
+        sa.Column("checkpoint_ns", sa.String(), nullable=False),
+        sa.Column("checkpoint_id", sa.String(), nullable=False),
+        sa.Column("parent_checkpoint_id", sa.String(), nullable=True),
+        sa.Column("checkpoint_type", sa.String(), nullable=False),
+        sa.Column("checkpoint", sa.LargeBinary(), nullable=False),
+        sa.Column("metadata_type", sa.String(), nullable=False),
+        sa.Column("metadata", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("thread_id", "checkpoint_ns", "checkpoint_id"),
+    )
+    op.create_index(op.f("ix_chat_checkpoints_created_at"), "chat_checkpoints", ["created_at"], unique=False)
+
+    op.create_table(
+        "chat_checkpoint_blobs",
+        sa.Column("thread_id", sa.String(), nullable=False),
+        sa.Column("checkpoint_ns", sa.String(), nullable=False),
+        sa.Column("channel", sa.String(), nullable=False),
+        sa.Column("version", sa.String(), nullable=False),
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("blob", sa.LargeBinary(), nullable=True),
+        sa.PrimaryKeyConstraint("thread_id", "checkpoint_ns", "channel", "version"),
+    )
+
+    op.create_table(
+        "chat_checkpoint_writes",
+        sa.Column("thread_id", sa.String(), nullable=False),
+        sa.Column("checkpoint_ns", sa.String(), nullable=False),
+        sa.Column("checkpoint_id", sa.String(), nullable=False),
+        sa.Column("task_id", sa.String(), nullable=False),
+        sa.Column("idx", sa.Integer(), nullable=False),
+        sa.Column("channel", sa.String(), nullable=False),
+        sa.Column("type", sa.String(), nullable=True),
+        sa.Column("blob", sa.LargeBinary(), nullable=True),
+        sa.Column("task_path", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+
+    op.drop_table("chat_checkpoint_writes")
+    op.drop_table("chat_checkpoint_blobs")
+    op.drop_index(op.f("ix_chat_checkpoints_created_at"), table_name="chat_checkpoints")
+    op.drop_table("chat_checkpoints")
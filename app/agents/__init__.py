@@ -1,3 +1,23 @@
-from .db_agent import *
-from .graph_agent import *
-from .chat_agent import *
+from .db_agent import get_db_assistant
+from .graph_agent import get_graph_generation_agent
+from .chat_agent import get_workflow, get_supervisor, aget_supervisor
+
+# agent graphs, built on first use by their `get_*` functions
+LAZY_AGENTS = {
+    "db_assistant": get_db_assistant,
+    "graph_generation_agent": get_graph_generation_agent,
+    "workflow": get_workflow,
+    "supervisor": get_supervisor,
+}
+
+def __getattr__(name):
+    if name in LAZY_AGENTS:
+        return LAZY_AGENTS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def warm_up_agents():
+    """
+    Build the LLM client and every agent graph now instead of on the first
+    chat turn.
+    """
+    get_supervisor()
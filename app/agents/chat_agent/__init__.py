@@ -1 +1,9 @@
-from .agent import *
+from .agent import SUPERVISOR_PROMPT, get_workflow, get_supervisor, aget_supervisor
+
+def __getattr__(name):
+    # the graphs are built on first use, see `get_workflow` and `get_supervisor`
+    if name == "workflow":
+        return get_workflow()
+    if name == "supervisor":
+        return get_supervisor()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
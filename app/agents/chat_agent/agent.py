@@ -1,11 +1,14 @@
-from langgraph_supervisor import create_supervisor
-from app.agents import db_assistant, graph_generation_agent
-from app.helper import llm
-
-supervisor = create_supervisor(
-    agents=[db_assistant, graph_generation_agent],
-    model=llm,
-    prompt=(
+import asyncio
+import threading
+
+from app.agents.db_agent import get_db_assistant
+from app.agents.graph_agent import get_graph_generation_agent
+from app.helper import get_llm
+from app.db import chat_checkpointer
+from .router import FastPathChatModel
+
+# system prompt of the supervisor model
+SUPERVISOR_PROMPT = (
         """
         You are a helpful assistant that can interact with a database and a graph generation agent.
         You can ask the database assistant to fetch data from the database or run queries,
@@ -18,5 +21,72 @@ supervisor = create_supervisor(
         
         In final output if you have any html code just return that not return any other text. if you not have any code then generate a response based on the interaction with the agents.
         """
-    ),
-).compile()
+)
+
+# the graphs, see `get_workflow` and `get_supervisor`; re-entrant since the
+# supervisor builds the workflow under the same lock
+_workflow = None
+_supervisor = None
+_build_lock = threading.RLock()
+
+def get_workflow():
+    """
+    The supervisor graph over db_assistant and graph_generation_agent, built
+    on first use and not compiled.
+    """
+    global _workflow
+    if _workflow is None:
+        with _build_lock:
+            if _workflow is None:
+                from langgraph.pregel import Pregel
+                from langgraph_supervisor import create_supervisor
+
+                workflow = create_supervisor(
+                    agents=[get_db_assistant(), get_graph_generation_agent()],
+                    # routing steps of clear data and chart questions are taken locally
+                    model=FastPathChatModel(model=get_llm()),
+                    prompt=SUPERVISOR_PROMPT,
+                )
+
+                # the supervisor's own agent loop only lives within a turn; the outer graph
+                # state is the one checkpointed per session. create_supervisor has no
+                # option for the inner agent's checkpointer, so it is switched off on
+                # the compiled node, which must still be where this expects it
+                supervisor_node = workflow.nodes.get("supervisor")
+                if supervisor_node is None or not isinstance(supervisor_node.runnable, Pregel):
+                    raise RuntimeError(
+                        "create_supervisor no longer adds the supervisor agent as a compiled "
+                        "'supervisor' node; its checkpointer cannot be disabled"
+                    )
+                supervisor_node.runnable.checkpointer = False
+                _workflow = workflow
+    return _workflow
+
+def get_supervisor():
+    """
+    The compiled chat supervisor, checkpointed per session, built on first use.
+    """
+    global _supervisor
+    if _supervisor is None:
+        with _build_lock:
+            if _supervisor is None:
+                _supervisor = get_workflow().compile(checkpointer=chat_checkpointer)
+    return _supervisor
+
+async def aget_supervisor():
+    """
+    `get_supervisor` for the event loop: until the supervisor is built, the
+    build (or the wait for a warm-up already building it) runs in a worker
+    thread.
+    """
+    if _supervisor is not None:
+        return _supervisor
+    return await asyncio.to_thread(get_supervisor)
+
+def __getattr__(name):
+    # the graphs are built on first use, see `get_workflow` and `get_supervisor`
+    if name == "workflow":
+        return get_workflow()
+    if name == "supervisor":
+        return get_supervisor()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
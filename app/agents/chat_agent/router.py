@@ -0,0 +1,230 @@
+import math
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from app.constants import config
+from app.helper import logger, record_stage, ShortcutChatModel
+
+ROUTE_DATA = "data"
+ROUTE_CHART = "chart"
+ROUTE_SUPERVISOR = "supervisor"
+# a fast-path turn that handed back to the supervisor model midway
+ROUTE_FALLBACK = "fallback"
+
+# (pattern, weight) features of the classifier; each counts once per question.
+# Positive weights favour a direct hand-off, negative ones the supervisor.
+FAST_PATH_FEATURES = [
+    (re.compile(r"\b(how many|how much|count|number of|total|sum|average|avg|mean|median|maximum|minimum|max|min|top \d+|highest|lowest|most|least|latest|earliest|per|group(ed)? by|breakdown|distinct)\b"), 2.0),
+    (re.compile(r"\b(list|show|find|get|fetch|give me|which|what (is|are|was|were)|who|when)\b"), 1.0),
+    (re.compile(r"\b(tables?|columns?|rows?|records?|schema|database)\b"), 1.0),
+    (re.compile(r"^\s*(list|show|find|get|fetch|give me|count)\b"), 1.0),
+    (re.compile(r"\b(less than|more than|greater than|at least|at most|between|before|after|since|last (day|week|month|quarter|year)|in \d{4})\b"), 1.0),
+    # follow-ups and conversation that need the supervisor's judgement
+    (re.compile(r"\b(it|that|this|those|these|them|above|previous|again|instead|same|also)\b"), -2.0),
+    (re.compile(r"\b(why|explain|meaning|mean by|interpret|recommend|should|what about|how about)\b"), -2.0),
+    (re.compile(r"\b(you|your)\b"), -1.0),
+    (re.compile(r"^\s*(hi|hello|hey|thanks|thank you|ok|okay|yes|no|sure|great)\b"), -4.0),
+    # writes are refused by db_assistant anyway; let the supervisor explain
+    (re.compile(r"\b(insert|update|delete|drop|alter|truncate|grant|create (table|index|view|schema|database))\b"), -3.0),
+]
+FAST_PATH_BIAS = -0.5
+
+# an explicit chart request sends the data to the graph agent as well
+CHART_PATTERN = re.compile(r"\b(chart|graph|plot|visuali[sz]e|visuali[sz]ation|histogram|pie|scatter|heat ?map|diagram)s?\b")
+
+# questions shorter than this are too vague to route without the supervisor
+MIN_QUESTION_WORDS = 3
+
+class RouteDecision(BaseModel):
+    """
+    Route picked for a user question by `classify_question`.
+    """
+    route: str
+    confidence: float
+    reason: str
+
+def classify_question(question: str, min_confidence: Optional[float] = None) -> RouteDecision:
+    """
+    Decide locally, without calling a model, whether a question can skip the
+    supervisor's routing step.
+
+    A logistic score over weighted keyword features measures how clearly the
+    question is a standalone data question; when it reaches `min_confidence`
+    the question is routed to "chart" if it asks for a visualization and to
+    "data" otherwise. Everything else goes to the "supervisor".
+
+    Args:
+        question (str): The user's message.
+        min_confidence (Optional[float]): Confidence needed for a fast path,
+            ROUTER_MIN_CONFIDENCE by default.
+    Returns:
+        RouteDecision: The route, its confidence and the reason.
+    """
+    if min_confidence is None:
+        min_confidence = config["ROUTER_MIN_CONFIDENCE"]
+
+    text = question.lower().strip()
+    if len(text.split()) < MIN_QUESTION_WORDS:
+        return RouteDecision(route=ROUTE_SUPERVISOR, confidence=1.0, reason="too_short")
+
+    score = FAST_PATH_BIAS + sum(weight for pattern, weight in FAST_PATH_FEATURES if pattern.search(text))
+    chart = CHART_PATTERN.search(text) is not None
+    # a chart request is a data request too
+    if chart:
+        score += 2.0
+
+    confidence = 1.0 / (1.0 + math.exp(-score))
+    if confidence < min_confidence:
+        return RouteDecision(route=ROUTE_SUPERVISOR, confidence=1.0 - confidence, reason="low_confidence")
+
+    return RouteDecision(route=ROUTE_CHART if chart else ROUTE_DATA, confidence=confidence, reason="classifier")
+
+class RouterStats:
+    """
+    Thread-safe counts of chat turns by route.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._turns = {route: 0 for route in (ROUTE_DATA, ROUTE_CHART, ROUTE_SUPERVISOR, ROUTE_FALLBACK)}
+
+    def record(self, route: str):
+        with self._lock:
+            self._turns[route] = self._turns.get(route, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            turns = dict(self._turns)
+
+        total = sum(turns.values())
+        hits = turns[ROUTE_DATA] + turns[ROUTE_CHART]
+        return {
+            "turns": total,
+            **{f"{route}_turns": count for route, count in turns.items()},
+            "fast_path_hit_rate": hits / total if total else 0.0,
+        }
+
+router_stats = RouterStats()
+
+# route of the current chat turn, see `route_timer`
+_turn_route: ContextVar[Optional[Dict[str, str]]] = ContextVar("turn_route", default=None)
+
+@contextmanager
+def route_timer():
+    """
+    Time a chat turn as the stage "route:<route>" of the route it took, so
+    turn latency can be compared per route, and count it in `router_stats`.
+
+    Yields:
+        Dict[str, str]: The turn's route, updated in place by the router.
+    """
+    turn = {"route": ROUTE_SUPERVISOR}
+    _turn_route.set(turn)
+
+    start = time.perf_counter()
+    try:
+        yield turn
+    finally:
+        router_stats.record(turn["route"])
+        record_stage(f"route:{turn['route']}", time.perf_counter() - start)
+
+def _set_turn_route(route: str):
+    turn = _turn_route.get()
+    if turn is not None:
+        turn["route"] = route
+
+def _turn_messages(messages: List[BaseMessage]) -> tuple:
+    # the latest user message and everything the graph added after it
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return messages[index], messages[index + 1:]
+    return None, []
+
+def _agent_answer(messages: List[BaseMessage], agent: str) -> Optional[str]:
+    # last answer of an agent, skipping its "Transferring back" hand-off message
+    for message in reversed(messages):
+        if isinstance(message, AIMessage) and message.name == agent and not message.tool_calls:
+            return message.content if isinstance(message.content, str) and message.content.strip() else None
+    return None
+
+class FastPathChatModel(ShortcutChatModel):
+    """
+    Supervisor model that takes the routing steps of clear data and chart
+    questions without calling the wrapped model.
+
+    For a new user question it asks `classify_question` for a route. On
+    "data" it hands off to the data agent and returns that agent's answer as
+    the final message; on "chart" it hands off to the data agent, then to the
+    chart agent, and returns the chart. The steps are ordinary supervisor
+    messages, so the graph, its checkpoints and the stored history are the
+    same as with a model-driven turn. Any other question, or a fast path that
+    meets an unexpected state, is answered by the wrapped model.
+    """
+
+    data_agent: str = "db_assistant"
+    chart_agent: str = "graph_generation_agent"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fast_path_router"
+
+    def _handoff(self, agent: str, route: str) -> ChatResult:
+        message = AIMessage(
+            content="",
+            tool_calls=[{"name": f"transfer_to_{agent}", "args": {}, "id": f"call_{uuid.uuid4().hex[:24]}"}],
+            response_metadata={"fast_path": route},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message, generation_info={"fast_path": route})])
+
+    def _answer(self, content: str, route: str) -> ChatResult:
+        message = AIMessage(content=content, response_metadata={"fast_path": route})
+        return ChatResult(generations=[ChatGeneration(message=message, generation_info={"fast_path": route})])
+
+    def shortcut(self, messages: List[BaseMessage]) -> Optional[ChatResult]:
+        """
+        Next supervisor step of a fast-path turn, or None to call the wrapped model.
+        """
+        if not config["ROUTER_ENABLED"]:
+            return None
+
+        question, turn = _turn_messages(messages)
+        if question is None:
+            return None
+
+        # a new question: classify it
+        if not turn:
+            decision = classify_question(str(question.content))
+            if decision.route == ROUTE_SUPERVISOR:
+                return None
+            _set_turn_route(decision.route)
+            return self._handoff(self.data_agent, decision.route)
+
+        # a turn the wrapped model is already routing
+        first = turn[0]
+        route = first.response_metadata.get("fast_path") if isinstance(first, AIMessage) else None
+        if route is None:
+            return None
+
+        data = _agent_answer(turn, self.data_agent)
+        if route == ROUTE_DATA and data is not None:
+            return self._answer(data, route)
+
+        if route == ROUTE_CHART and data is not None:
+            chart = _agent_answer(turn, self.chart_agent)
+            if chart is None and not any(message.name == self.chart_agent for message in turn):
+                return self._handoff(self.chart_agent, route)
+            if chart is not None:
+                return self._answer(chart, route)
+
+        _set_turn_route(ROUTE_FALLBACK)
+        logger.info({"action": "fast_path_router - fallback", "route": route})
+        return None
@@ -1 +1,7 @@
-from .agent import db_assistant
+from .agent import get_db_assistant
+
+def __getattr__(name):
+    # `db_assistant` is built on first use, see `get_db_assistant`
+    if name == "db_assistant":
+        return get_db_assistant()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,29 @@
-from langgraph.prebuilt import create_react_agent
-from app.helper import llm
-from .tools import fetch_schema, run_query
+from functools import lru_cache
+
+from app.helper import get_llm
+from .tools import fetch_schema, fetch_relevant_schema, run_query
+from .planner import SQLPlanChatModel
 from app.constants import db_agent_prompt
 
-db_assistant = create_react_agent(
-    name="db_assistant",
-    model=llm,
-    tools=[fetch_schema, run_query],
-    prompt=db_agent_prompt,
-)
+@lru_cache(maxsize=None)
+def get_db_assistant():
+    """
+    The db_assistant agent graph, built on first use.
+    """
+    from langgraph.prebuilt import create_react_agent
+
+    return create_react_agent(
+        name="db_assistant",
+        # starts questions seen before with their cached SQL
+        model=SQLPlanChatModel(model=get_llm()),
+        tools=[fetch_relevant_schema, fetch_schema, run_query],
+        prompt=db_agent_prompt,
+        # runs on the messages handed over by the supervisor, whose state is the one checkpointed
+        checkpointer=False,
+    )
+
+def __getattr__(name):
+    # `db_assistant` is built on first use, see `get_db_assistant`
+    if name == "db_assistant":
+        return get_db_assistant()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,118 @@
+import re
+import time
+import uuid
+from typing import List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from app.constants import config
+from app.helper import logger, ShortcutChatModel
+from .tools.sqlPlanCache import current_sql_plan, sql_plan_cache
+
+# the system message the chat controllers add with the session's database
+DB_URL_PATTERN = re.compile(r"Use this DB Connection URL to connect to the database:\s*(\S+)")
+
+def _db_connection_url(messages: List[BaseMessage]) -> Optional[str]:
+    for message in reversed(messages):
+        if isinstance(message, SystemMessage):
+            match = DB_URL_PATTERN.search(str(message.content))
+            if match is not None:
+                return match.group(1)
+    return None
+
+def _question(messages: List[BaseMessage]) -> Optional[str]:
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return str(message.content)
+    return None
+
+class SQLPlanChatModel(ShortcutChatModel):
+    """
+    db_assistant model that starts a hand-off with the queries of a cached
+    plan, see `SQLPlanCache`.
+
+    On the first step after the supervisor hands a question over, a question
+    of the same shape as an earlier one on the same database gets the earlier
+    run_query calls with this question's literals filled in, skipping the
+    schema look-ups and SQL writing. The following steps, which read the
+    results and answer, go to the wrapped model as usual. Other steps only
+    count the model calls it takes to get to the query that answers the
+    question, the cost a cached plan saves.
+    """
+
+    @property
+    def _llm_type(self) -> str:
+        return "sql_plan_cache"
+
+    def _plan_result(self, db_connection_url: str, queries: List[str]) -> ChatResult:
+        message = AIMessage(
+            content="",
+            tool_calls=[
+                {"name": "run_query", "args": {"db_connection_url": db_connection_url, "query": query}, "id": f"call_{uuid.uuid4().hex[:24]}"}
+                for query in queries
+            ],
+            response_metadata={"fast_path": "sql_plan"},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message, generation_info={"fast_path": "sql_plan"})])
+
+    def _start(self, messages: List[BaseMessage]) -> Optional[tuple]:
+        """
+        The turn's plan, database and question when this is the first step of a
+        hand-off; counts the step otherwise.
+        """
+        plan = current_sql_plan()
+        if plan is None:
+            return None
+
+        last = messages[-1] if messages else None
+        if not (isinstance(last, ToolMessage) and (last.name or "").startswith("transfer_to_")):
+            if plan["agent_started"] is not None:
+                plan["llm_steps"] += 1
+            return None
+
+        plan["agent_started"] = time.perf_counter()
+        plan["llm_steps"] = 1
+
+        db_connection_url, question = _db_connection_url(messages), _question(messages)
+        if not config["PLAN_CACHE_ENABLED"] or db_connection_url is None or question is None:
+            return None
+        return plan, db_connection_url, question
+
+    def _hit(self, plan: dict, db_connection_url: str, hit) -> ChatResult:
+        plan["hit"] = True
+        logger.info({
+            "action": "sql_plan_cache - hit",
+            "cached_question": hit.question,
+            "parameters": hit.parameters,
+            "queries": len(hit.queries),
+        })
+        return self._plan_result(db_connection_url, hit.queries)
+
+    def shortcut(self, messages: List[BaseMessage]) -> Optional[ChatResult]:
+        start = self._start(messages)
+        if start is None:
+            return None
+
+        plan, db_connection_url, question = start
+        try:
+            hit = sql_plan_cache.lookup(db_connection_url, question)
+        except Exception as e:
+            # the plan cannot be validated, let the model plan the turn
+            logger.error({"action": "sql_plan_cache - lookup error", "error": str(e)})
+            return None
+        return None if hit is None else self._hit(plan, db_connection_url, hit)
+
+    async def ashortcut(self, messages: List[BaseMessage]) -> Optional[ChatResult]:
+        start = self._start(messages)
+        if start is None:
+            return None
+
+        plan, db_connection_url, question = start
+        try:
+            hit = await sql_plan_cache.alookup(db_connection_url, question)
+        except Exception as e:
+            # the plan cannot be validated, let the model plan the turn
+            logger.error({"action": "sql_plan_cache - lookup error", "error": str(e)})
+            return None
+        return None if hit is None else self._hit(plan, db_connection_url, hit)
@@ -1,2 +1,5 @@
 from .fetchSchema import *
 from .runFetchQuery import *
+from .queryGuard import QueryGuardLimits, QueryGuardDecision, query_guard_limits, start_query_guard
+from .fetchRelevantSchema import *
+from .sqlPlanCache import SQLPlanCache, SQLPlanHit, sql_plan_cache, start_sql_plan, store_turn_sql_plan
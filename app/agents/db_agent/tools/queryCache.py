@@ -0,0 +1,260 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.constants import config
+
+# quoted literals/identifiers are kept verbatim, everything else is normalized
+_SQL_TOKEN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\s+|[^'\"\s]+")
+
+# relations referenced after FROM / JOIN, optionally schema qualified
+_TABLE_REFERENCE = re.compile(
+    r"\b(?:from|join)\s+((?:\"[^\"]+\"|[a-z_][\w$]*)(?:\s*\.\s*(?:\"[^\"]+\"|[a-z_][\w$]*))?)"
+)
+
+# references are resolved like the query resolves them (search_path for
+# unqualified names), so equally named tables of other schemas are not read
+TABLE_STATS_QUERY = """
+    SELECT t.reference, s.n_tup_ins + s.n_tup_upd + s.n_tup_del
+    FROM unnest(CAST(:references AS text[])) AS t(reference)
+    JOIN pg_catalog.pg_stat_user_tables s ON s.relid = to_regclass(t.reference);
+"""
+
+CacheKey = Tuple[str, str, int]
+
+def normalize_sql(query: str) -> str:
+    """
+    Normalize SQL text for use as a cache key: whitespace is collapsed, text
+    outside quotes is lower-cased and trailing semicolons are removed.
+
+    Args:
+        query (str): The SQL text.
+    Returns:
+        str: The normalized SQL.
+    """
+    parts = []
+    for token in _SQL_TOKEN.findall(query.strip()):
+        if token.isspace():
+            parts.append(" ")
+        elif token[0] in ("'", '"'):
+            parts.append(token)
+        else:
+            parts.append(token.lower())
+
+    return "".join(parts).rstrip("; ")
+
+def referenced_tables(normalized_query: str) -> List[str]:
+    """
+    Best-effort list of the tables a normalized query reads from, as written
+    in it (schema qualified or not, quotes kept).
+    """
+    tables = set()
+    for reference in _TABLE_REFERENCE.findall(normalized_query):
+        tables.add(".".join(part.strip() for part in reference.split(".")))
+    return sorted(tables)
+
+def table_modification_counters(conn: Connection, tables: List[str]) -> Optional[Dict[str, int]]:
+    """
+    Read the insert/update/delete counters of the given tables from
+    pg_stat_user_tables.
+
+    Returns:
+        Optional[Dict[str, int]]: Counters by table reference, or None when not available.
+    """
+    if not tables or conn.dialect.name != "postgresql":
+        return None
+
+    rows = conn.execute(text(TABLE_STATS_QUERY), {"references": tables}).fetchall()
+    if not rows:
+        return None
+
+    return {name: int(changes) for name, changes in rows}
+
+class QueryCacheEntry:
+    """
+    A cached QueryResult with its size and the table counters it was read at.
+    """
+
+    def __init__(self, result, size: int, table_counters: Optional[Dict[str, int]]):
+        self.result = result
+        self.size = size
+        self.table_counters = table_counters
+        self.cached_at = time.time()
+        self.created = time.monotonic()
+
+class QueryCache:
+    """
+    LRU cache of run_query results keyed by connection URL, normalized SQL
+    text and row limit.
+
+    Entries expire after the TTL of their database (`default_ttl` unless
+    overridden with `set_ttl`), and the total estimated size of cached rows is
+    bounded by `max_bytes`. When `check_table_stats` is enabled, entries for
+    PostgreSQL are also dropped as soon as the pg_stat_user_tables
+    modification counters of the tables they read change. Other backends
+    report those counters with a short delay, so this narrows the staleness
+    window rather than closing it.
+    """
+
+    def __init__(self, default_ttl: float = 60, max_bytes: int = 32 * 1024 * 1024, check_table_stats: bool = True):
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.check_table_stats = check_table_stats
+
+        self._entries: "OrderedDict[CacheKey, QueryCacheEntry]" = OrderedDict()
+        self._ttls: Dict[str, float] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(db_connection_url: str, query: str, max_rows: int) -> CacheKey:
+        return (db_connection_url, normalize_sql(query), max_rows)
+
+    def set_ttl(self, db_connection_url: str, ttl: Optional[float]):
+        """
+        Override the TTL for one database; a TTL of 0 disables caching for it
+        and None restores the default.
+        """
+        with self._lock:
+            if ttl is None:
+                self._ttls.pop(db_connection_url, None)
+            else:
+                self._ttls[db_connection_url] = ttl
+
+    def ttl(self, db_connection_url: str) -> float:
+        return self._ttls.get(db_connection_url, self.default_ttl)
+
+    def _get(self, key: CacheKey) -> Optional[QueryCacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if time.monotonic() - entry.created >= self.ttl(key[0]):
+            self._remove(key)
+            return None
+
+        return entry
+
+    def _remove(self, key: CacheKey):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _hit(self, key: CacheKey, entry: QueryCacheEntry):
+        self._entries.move_to_end(key)
+        self.hits += 1
+
+        return entry.result.model_copy(update={
+            "cached": True,
+            "cache_age_seconds": round(time.time() - entry.cached_at, 3),
+        })
+
+    def get_fresh(self, key: CacheKey):
+        """
+        Return a cached result that can be served without a database round
+        trip, i.e. one that does not need its table counters re-checked.
+        """
+        with self._lock:
+            entry = self._get(key)
+            if entry is None or entry.table_counters is not None:
+                return None
+            return self._hit(key, entry)
+
+    def resolve(self, conn: Connection, key: CacheKey, execute: Callable[[Connection], object]):
+        """
+        Return the cached result for the key if it is still valid, otherwise
+        run `execute(conn)` and cache its result.
+
+        Args:
+            conn (Connection): An open connection to the database the key refers to.
+            key (CacheKey): Key built with `QueryCache.key`.
+            execute (Callable): Runs the query and returns a QueryResult.
+        Returns:
+            QueryResult: The cached or freshly fetched result.
+        """
+        with self._lock:
+            entry = self._get(key)
+
+        if entry is not None:
+            counters = entry.table_counters
+            if counters is None or table_modification_counters(conn, list(counters)) == counters:
+                with self._lock:
+                    return self._hit(key, entry)
+
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._remove(key)
+                self.stale += 1
+
+        with self._lock:
+            self.misses += 1
+
+        result = execute(conn)
+
+        if self.ttl(key[0]) > 0:
+            counters = None
+            if self.check_table_stats:
+                counters = table_modification_counters(conn, referenced_tables(key[1]))
+            self.put(key, result, counters)
+
+        return result
+
+    def put(self, key: CacheKey, result, table_counters: Optional[Dict[str, int]] = None):
+        size = len(json.dumps(result.rows, default=str))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = QueryCacheEntry(result, size, table_counters)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, db_connection_url: str) -> int:
+        """
+        Drop every cached result for the given connection URL.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == db_connection_url]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+# shared cache used by run_query
+query_cache = QueryCache(
+    default_ttl=config["QUERY_CACHE_TTL"],
+    max_bytes=config["QUERY_CACHE_MAX_BYTES"],
+    check_table_stats=config["QUERY_CACHE_CHECK_TABLE_STATS"],
+)
@@ -0,0 +1,226 @@
+import json
+from contextvars import ContextVar
+from typing import Optional, Tuple
+
+from pydantic import BaseModel
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+
+from app.constants import config
+from app.helper import logger
+
+# PostgreSQL SQLSTATEs turned into guard decisions instead of tool errors
+QUERY_CANCELED = "57014"
+READ_ONLY_SQL_TRANSACTION = "25006"
+
+class QueryGuardLimits(BaseModel):
+    """
+    Thresholds applied to run_query statements before they are executed.
+    """
+    max_cost: float
+    max_plan_rows: int
+    statement_timeout_ms: int
+    action: str = "limit"
+
+class QueryGuardDecision(BaseModel):
+    """
+    Outcome of the guard for one statement, returned to the agent so it can
+    rewrite a query that was limited, rejected or cancelled.
+    """
+    action: str
+    reason: Optional[str] = None
+    message: Optional[str] = None
+    estimated_cost: Optional[float] = None
+    estimated_rows: Optional[int] = None
+    max_cost: Optional[float] = None
+    max_plan_rows: Optional[int] = None
+    statement_timeout_ms: Optional[int] = None
+    limit_applied: Optional[int] = None
+
+# limits of the session whose chat turn is running, see `start_query_guard`
+_query_guard_limits: ContextVar[Optional[QueryGuardLimits]] = ContextVar("query_guard_limits", default=None)
+
+def query_guard_limits(max_cost: Optional[float] = None, max_plan_rows: Optional[int] = None, statement_timeout_ms: Optional[int] = None) -> QueryGuardLimits:
+    """
+    Build guard limits, using the configured defaults for values that are not given.
+    """
+    return QueryGuardLimits(
+        max_cost=max_cost if max_cost is not None else config["QUERY_GUARD_MAX_COST"],
+        max_plan_rows=max_plan_rows if max_plan_rows is not None else config["QUERY_GUARD_MAX_PLAN_ROWS"],
+        statement_timeout_ms=statement_timeout_ms if statement_timeout_ms is not None else config["QUERY_STATEMENT_TIMEOUT_MS"],
+        action=config["QUERY_GUARD_ACTION"],
+    )
+
+def start_query_guard(limits: QueryGuardLimits) -> QueryGuardLimits:
+    """
+    Apply per-session guard limits to the run_query calls of the current request.
+
+    Args:
+        limits (QueryGuardLimits): The limits of the session.
+    Returns:
+        QueryGuardLimits: The limits now in effect.
+    """
+    _query_guard_limits.set(limits)
+    return limits
+
+def current_query_guard_limits() -> QueryGuardLimits:
+    return _query_guard_limits.get() or query_guard_limits()
+
+def explain_plan(conn: Connection, query: str, raise_errors: bool = False) -> Optional[dict]:
+    """
+    Ask the PostgreSQL planner for the plan of a query, without running it.
+
+    Args:
+        conn (Connection): An open connection to the target database.
+        query (str): The SELECT query to explain.
+        raise_errors (bool): Raise database errors (e.g. a syntax error in the
+            query) instead of returning None.
+    Returns:
+        Optional[dict]: The top plan node, or None when no plan is available.
+    """
+    if conn.dialect.name != "postgresql":
+        return None
+
+    try:
+        plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {query}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]
+    except SQLAlchemyError:
+        if raise_errors:
+            raise
+        return None
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+
+def begin_guarded_transaction(conn: Connection, limits: QueryGuardLimits):
+    """
+    Make the current transaction read-only and bound its statements by the
+    statement timeout. Both settings are transaction-local and are reset when
+    the pooled connection is returned and rolled back.
+
+    Only PostgreSQL is guarded; other backends run unchanged.
+    """
+    if conn.dialect.name != "postgresql":
+        return
+
+    conn.execute(text("SET TRANSACTION READ ONLY"))
+    if limits.statement_timeout_ms > 0:
+        conn.execute(text(f"SET LOCAL statement_timeout = {int(limits.statement_timeout_ms)}"))
+
+def _limited(query: str, row_limit: int) -> str:
+    # one extra row lets run_query still report the result as truncated; the
+    # line break keeps a trailing -- comment of the query from swallowing the wrapper
+    return f"SELECT * FROM ({query.strip().rstrip(';')}\n) AS guarded_query LIMIT {row_limit + 1}"
+
+def guard_query(conn: Connection, query: str, limits: QueryGuardLimits, row_limit: int) -> Tuple[str, QueryGuardDecision]:
+    """
+    Start a guarded transaction and check the planner estimates of a query
+    against the limits.
+
+    A query over the cost or row threshold is rejected, or, when the guard
+    action is "limit" and it returns more rows than run_query would keep,
+    wrapped in a LIMIT and re-checked; it is rejected when it stays over the
+    cost threshold (e.g. sorts and aggregates over large inputs).
+
+    Args:
+        conn (Connection): An open connection to the target database.
+        query (str): The SELECT query written by the agent.
+        limits (QueryGuardLimits): The thresholds to apply.
+        row_limit (int): Number of rows run_query returns at most.
+    Returns:
+        Tuple[str, QueryGuardDecision]: The query to execute and the decision.
+    """
+    begin_guarded_transaction(conn, limits)
+
+    decision = QueryGuardDecision(
+        action="allowed",
+        max_cost=limits.max_cost,
+        max_plan_rows=limits.max_plan_rows,
+        statement_timeout_ms=limits.statement_timeout_ms,
+    )
+
+    # a query the planner rejects fails the same way when executed, so let the error through
+    plan = explain_plan(conn, query, raise_errors=True)
+    if plan is None:
+        return query, decision
+
+    decision.estimated_cost = float(plan.get("Total Cost", 0))
+    decision.estimated_rows = int(plan.get("Plan Rows", 0))
+
+    over_cost = decision.estimated_cost > limits.max_cost
+    over_rows = decision.estimated_rows > limits.max_plan_rows
+    if not over_cost and not over_rows:
+        return query, decision
+
+    if limits.action == "limit" and decision.estimated_rows > row_limit:
+        limited_query = _limited(query, row_limit)
+        limited_plan = explain_plan(conn, limited_query, raise_errors=True)
+        if limited_plan is not None and float(limited_plan.get("Total Cost", 0)) <= limits.max_cost:
+            decision.action = "limited"
+            decision.reason = "cost_limit" if over_cost else "row_limit"
+            decision.limit_applied = row_limit + 1
+            decision.message = (
+                f"The query was estimated to return {decision.estimated_rows} rows at cost {decision.estimated_cost:.0f}, "
+                f"so it was run with LIMIT {row_limit + 1}. Use filters or aggregates for complete results."
+            )
+            return limited_query, decision
+
+    decision.action = "rejected"
+    if over_cost:
+        decision.reason = "cost_limit"
+        decision.message = (
+            f"Estimated cost {decision.estimated_cost:.0f} exceeds the limit of {limits.max_cost:.0f}. "
+            "Add selective filters, avoid cross joins and aggregate in SQL, then retry."
+        )
+    else:
+        decision.reason = "row_limit"
+        decision.message = (
+            f"Estimated {decision.estimated_rows} rows exceed the limit of {limits.max_plan_rows}. "
+            "Add filters, aggregates or a LIMIT, then retry."
+        )
+
+    logger.info({
+        "action": "query_guard_rejected",
+        "reason": decision.reason,
+        "estimated_cost": decision.estimated_cost,
+        "estimated_rows": decision.estimated_rows,
+    })
+
+    return query, decision
+
+def statement_error_decision(error: Exception, limits: QueryGuardLimits) -> Optional[QueryGuardDecision]:
+    """
+    Translate a statement timeout or read-only violation into a guard decision.
+
+    Args:
+        error (Exception): The error raised while executing the query, either a
+            wrapped DBAPIError or, for asyncpg server-side cursors, the driver error.
+        limits (QueryGuardLimits): The limits the query ran with.
+    Returns:
+        Optional[QueryGuardDecision]: The decision, or None for other errors.
+    """
+    orig = error.orig if isinstance(error, DBAPIError) else error
+    sqlstate = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+
+    if sqlstate == QUERY_CANCELED:
+        logger.info({"action": "query_guard_timeout", "statement_timeout_ms": limits.statement_timeout_ms})
+        return QueryGuardDecision(
+            action="rejected",
+            reason="statement_timeout",
+            message=(
+                f"The query was cancelled after {limits.statement_timeout_ms} ms. "
+                "Narrow it with filters or pre-aggregate, then retry."
+            ),
+            statement_timeout_ms=limits.statement_timeout_ms,
+        )
+
+    if sqlstate == READ_ONLY_SQL_TRANSACTION:
+        return QueryGuardDecision(
+            action="rejected",
+            reason="read_only",
+            message="Only read-only queries are allowed.",
+        )
+
+    return None
@@ -0,0 +1,170 @@
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from app.constants import config
+from app.helper import count_tokens
+
+class ColumnStats(BaseModel):
+    """
+    Aggregates of one column over all fetched rows of a sampled result.
+    """
+    min: Optional[str] = None
+    max: Optional[str] = None
+    distinct: int
+    nulls: int
+
+class EncodedRows(BaseModel):
+    """
+    Rows of a query result encoded as CSV with the header written once.
+    """
+    format: str = "csv"
+    column_types: List[str]
+    data: str
+    rows_shown: int
+    omitted_rows: int = 0
+    column_stats: Optional[Dict[str, ColumnStats]] = None
+    tokens: int
+
+def value_type(value: Any) -> str:
+    """
+    Short type name of a Python value returned by the database driver.
+    """
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, Decimal):
+        return "decimal"
+    if isinstance(value, datetime):
+        return "datetime"
+    if isinstance(value, date):
+        return "date"
+    if isinstance(value, time):
+        return "time"
+    if isinstance(value, timedelta):
+        return "interval"
+    if isinstance(value, UUID):
+        return "uuid"
+    if isinstance(value, (dict, list)):
+        return "json"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "bytes"
+    return "text"
+
+def format_value(value: Any) -> str:
+    """
+    Format a value compactly and losslessly for the model: ISO dates without
+    zero microseconds, decimals without exponents or trailing zeros, compact
+    JSON, and an empty string for NULL.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds" if not value.microsecond else "auto")
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        # NaN and Infinity have no fixed-point form
+        if not value.is_finite():
+            return str(value)
+        # exact at any precision, unlike normalize() which rounds to the context's 28 digits
+        text = format(value, "f")
+        return text.rstrip("0").rstrip(".") if "." in text else text
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"), default=str)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(bytes(value))} bytes>"
+    return str(value)
+
+def infer_column_types(columns: List[str], rows: List[Dict[str, Any]]) -> List[str]:
+    """
+    Type of each column, taken from its first non-NULL value ("null" when there is none).
+    """
+    types = []
+    for column in columns:
+        value = next((row[column] for row in rows if row.get(column) is not None), None)
+        types.append(value_type(value) if value is not None else "null")
+    return types
+
+def _column_stats(columns: List[str], rows: List[Dict[str, Any]]) -> Dict[str, ColumnStats]:
+    stats = {}
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        present = [value for value in values if value is not None]
+
+        minimum = maximum = None
+        try:
+            if present and not isinstance(present[0], (dict, list, bool, bytes, bytearray, memoryview)):
+                minimum, maximum = format_value(min(present)), format_value(max(present))
+        except (TypeError, ArithmeticError):
+            # mixed types that cannot be ordered, or decimal NaNs
+            pass
+
+        stats[column] = ColumnStats(
+            min=minimum,
+            max=maximum,
+            distinct=len({format_value(value) for value in present}),
+            nulls=len(values) - len(present),
+        )
+    return stats
+
+def encode_rows(columns: List[str], rows: List[Dict[str, Any]], full_max_rows: Optional[int] = None, head_rows: Optional[int] = None, tail_rows: Optional[int] = None) -> EncodedRows:
+    """
+    Encode result rows as CSV. Results longer than `full_max_rows` are reduced
+    to their first `head_rows` and last `tail_rows` rows plus per-column
+    aggregates (min, max, distinct count, nulls) over all rows.
+
+    Args:
+        columns (List[str]): Column names in result order.
+        rows (List[Dict[str, Any]]): The fetched rows.
+        full_max_rows (Optional[int]): Largest result encoded in full.
+        head_rows (Optional[int]): Rows kept from the start of a sampled result.
+        tail_rows (Optional[int]): Rows kept from the end of a sampled result.
+    Returns:
+        EncodedRows: The CSV text, column types, sampling details and its token count.
+    """
+    full_max_rows = config["RESULT_FULL_MAX_ROWS"] if full_max_rows is None else full_max_rows
+    head_rows = config["RESULT_HEAD_ROWS"] if head_rows is None else head_rows
+    tail_rows = config["RESULT_TAIL_ROWS"] if tail_rows is None else tail_rows
+
+    columns = columns or (list(rows[0].keys()) if rows else [])
+
+    sampled = len(rows) > full_max_rows and head_rows + tail_rows < len(rows)
+    head = rows[:head_rows] if sampled else rows
+    tail = rows[len(rows) - tail_rows:] if sampled and tail_rows else []
+    shown = head + tail
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if columns:
+        writer.writerow(columns)
+    for row in head:
+        writer.writerow([format_value(row.get(column)) for column in columns])
+    if sampled:
+        buffer.write(f"...{len(rows) - len(shown)} rows omitted...\n")
+    for row in tail:
+        writer.writerow([format_value(row.get(column)) for column in columns])
+
+    data = buffer.getvalue()
+
+    return EncodedRows(
+        column_types=infer_column_types(columns, rows),
+        data=data,
+        rows_shown=len(shown),
+        omitted_rows=len(rows) - len(shown),
+        column_stats=_column_stats(columns, rows) if sampled else None,
+        tokens=count_tokens(data),
+    )
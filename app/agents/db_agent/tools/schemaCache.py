@@ -0,0 +1,260 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text as Text
+from sqlalchemy.engine import Connection
+
+from app.constants import config
+from .schemaIntrospection import DatabaseSchema, TableProfile, introspect_profiles, introspect_schema
+
+# cheap digest of the catalog rows that change on DDL for one schema. Row
+# versions (xmin) change whenever a relation, column, default or constraint
+# is created, altered or dropped, while ANALYZE/VACUUM update pg_class in place.
+# Partitions are left out like in the introspection queries.
+FINGERPRINT_QUERY = """
+    SELECT md5(coalesce(string_agg(x, ',' ORDER BY x), ''))
+    FROM (
+      SELECT 'c' || c.oid::text || ':' || c.xmin::text AS x
+      FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+      WHERE n.nspname = :schema_name AND c.relkind IN ('r', 'p', 'v', 'm') AND NOT c.relispartition
+      UNION ALL
+      SELECT 'a' || a.attrelid::text || '.' || a.attnum::text || ':' || a.xmin::text
+      FROM pg_catalog.pg_attribute a
+        JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+      WHERE n.nspname = :schema_name AND c.relkind IN ('r', 'p', 'v', 'm') AND NOT c.relispartition AND a.attnum > 0
+      UNION ALL
+      SELECT 'd' || d.oid::text || ':' || d.xmin::text
+      FROM pg_catalog.pg_attrdef d
+        JOIN pg_catalog.pg_class c ON c.oid = d.adrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+      WHERE n.nspname = :schema_name AND NOT c.relispartition
+      UNION ALL
+      SELECT 'k' || con.oid::text || ':' || con.xmin::text
+      FROM pg_catalog.pg_constraint con
+        JOIN pg_catalog.pg_namespace n ON n.oid = con.connamespace
+      WHERE n.nspname = :schema_name
+    ) s;
+"""
+
+CacheKey = Tuple[str, str, bool]
+
+def schema_fingerprint(conn: Connection, schema_name: str) -> Optional[str]:
+    """
+    Compute a fingerprint of the catalog state of a schema in one round trip.
+
+    Args:
+        conn (Connection): An open connection to the target database.
+        schema_name (str): The schema to fingerprint.
+    Returns:
+        Optional[str]: The fingerprint, or None when the database is not PostgreSQL.
+    """
+    if conn.dialect.name != "postgresql":
+        return None
+
+    return conn.execute(Text(FINGERPRINT_QUERY), {"schema_name": schema_name}).scalar()
+
+class SchemaCacheEntry:
+    """
+    A cached DatabaseSchema together with the fingerprint it was built from
+    and, once requested, its column profiles.
+    """
+
+    def __init__(self, schema: DatabaseSchema, fingerprint: Optional[str]):
+        now = time.monotonic()
+        self.schema = schema
+        self.fingerprint = fingerprint
+        self.profiles: Optional[Dict[str, TableProfile]] = None
+        self.built_at = now
+        self.checked_at = now
+
+class SchemaCache:
+    """
+    LRU cache of introspected DatabaseSchema objects keyed by connection URL,
+    schema name and whether views are included.
+
+    A cached schema is served without touching the database for
+    `revalidate_interval` seconds. After that the catalog fingerprint is
+    compared (one cheap query) and the schema is only re-introspected when the
+    fingerprint changed or the entry is older than `ttl` seconds.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl: float = 3600, revalidate_interval: float = 30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.revalidate_interval = revalidate_interval
+
+        self._entries: "OrderedDict[CacheKey, SchemaCacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.profile_builds = 0
+
+    @staticmethod
+    def key(db_connection_url: str, schema_name: str = "public", include_views: bool = False) -> CacheKey:
+        return (db_connection_url, schema_name, include_views)
+
+    def get_fresh(self, key: CacheKey) -> Optional[DatabaseSchema]:
+        """
+        Return the cached schema if it was validated recently enough to be
+        served without a database round trip.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            now = time.monotonic()
+            if now - entry.built_at >= self.ttl or now - entry.checked_at >= self.revalidate_interval:
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.schema
+
+    def resolve(self, conn: Connection, key: CacheKey) -> DatabaseSchema:
+        """
+        Return the schema for the key, revalidating or rebuilding the cached
+        entry with the given connection as needed.
+
+        Args:
+            conn (Connection): An open connection to the database the key refers to.
+            key (CacheKey): Key built with `SchemaCache.key`.
+        Returns:
+            DatabaseSchema: The up to date schema.
+        """
+        fresh = self.get_fresh(key)
+        if fresh is not None:
+            return fresh
+
+        _, schema_name, include_views = key
+        fingerprint = schema_fingerprint(conn, schema_name)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if (
+                entry is not None
+                and fingerprint is not None
+                and entry.fingerprint == fingerprint
+                and now - entry.built_at < self.ttl
+            ):
+                entry.checked_at = now
+                self._entries.move_to_end(key)
+                self.revalidations += 1
+                return entry.schema
+
+            if entry is None:
+                self.misses += 1
+            else:
+                self.rebuilds += 1
+
+        schema = introspect_schema(conn, schema_name=schema_name, include_views=include_views)
+        self.put(key, schema, fingerprint)
+
+        return schema
+
+    def put(self, key: CacheKey, schema: DatabaseSchema, fingerprint: Optional[str]):
+        with self._lock:
+            self._entries[key] = SchemaCacheEntry(schema, fingerprint)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def profiles(self, key: CacheKey) -> Optional[Dict[str, TableProfile]]:
+        """
+        Return the column profiles cached with the schema for the key, if any.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.profiles if entry else None
+
+    def resolve_profiles(self, conn: Connection, key: CacheKey) -> Optional[Dict[str, TableProfile]]:
+        """
+        Return the column profiles for the key, reading them from pg_stats and
+        caching them with the schema entry when they are missing. Call after
+        `resolve`, so the profiles are dropped whenever the schema is rebuilt.
+
+        Args:
+            conn (Connection): An open connection to the database the key refers to.
+            key (CacheKey): Key built with `SchemaCache.key`.
+        Returns:
+            Optional[Dict[str, TableProfile]]: Profiles by table name, or None
+            when the database is not PostgreSQL.
+        """
+        profiles = self.profiles(key)
+        if profiles is not None:
+            return profiles
+
+        _, schema_name, include_views = key
+        profiles = introspect_profiles(
+            conn,
+            schema_name=schema_name,
+            include_views=include_views,
+            max_values=config["SCHEMA_PROFILE_MAX_VALUES"],
+            histogram_bounds=config["SCHEMA_PROFILE_HISTOGRAM_BOUNDS"],
+            max_value_chars=config["SCHEMA_PROFILE_MAX_VALUE_CHARS"],
+        )
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and profiles is not None:
+                entry.profiles = profiles
+                self.profile_builds += 1
+
+        return profiles
+
+    def fingerprint(self, key: CacheKey) -> Optional[str]:
+        """
+        Return the fingerprint the cached schema for the key was built from.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.fingerprint if entry else None
+
+    def invalidate(self, db_connection_url: str) -> int:
+        """
+        Drop every cached schema for the given connection URL.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == db_connection_url]
+            for key in keys:
+                del self._entries[key]
+
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.revalidations + self.misses + self.rebuilds
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "revalidations": self.revalidations,
+                "misses": self.misses,
+                "rebuilds": self.rebuilds,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "profile_builds": self.profile_builds,
+                "hit_rate": (self.hits + self.revalidations) / lookups if lookups else 0.0,
+            }
+
+# shared cache used by fetch_schema
+schema_cache = SchemaCache(
+    max_entries=config["SCHEMA_CACHE_MAX_ENTRIES"],
+    ttl=config["SCHEMA_CACHE_TTL"],
+    revalidate_interval=config["SCHEMA_CACHE_REVALIDATE_INTERVAL"],
+)
@@ -0,0 +1,206 @@
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .schemaIntrospection import DatabaseSchema
+
+# relative weight of the places a term can appear in a table document
+TABLE_NAME_WEIGHT = 3
+COLUMN_NAME_WEIGHT = 1
+NEIGHBOUR_NAME_WEIGHT = 1
+
+_WORD = re.compile(r"[A-Z]+(?![a-z])|[A-Za-z][a-z]*|\d+")
+
+# words that carry no table-selection signal in questions
+STOP_WORDS = {
+    "a", "about", "all", "an", "and", "any", "are", "as", "at", "be", "by", "can", "count",
+    "data", "database", "do", "does", "each", "for", "from", "get", "give", "has", "have",
+    "how", "i", "id", "in", "is", "it", "list", "many", "me", "most", "much", "my", "of",
+    "on", "or", "per", "show", "table", "tables", "that", "the", "their", "there", "this",
+    "to", "total", "was", "were", "what", "when", "where", "which", "who", "with",
+}
+
+def _stem(word: str) -> str:
+    # light suffix folding so "orders" and "ordered" match "order_id"
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 4 and word.endswith("ed"):
+        return word[:-2]
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split identifiers and free text into lower-cased, stemmed terms
+    (snake_case and camelCase identifiers are split into their words).
+    """
+    terms = []
+    for word in _WORD.findall(text):
+        word = word.lower()
+        if word in STOP_WORDS:
+            continue
+        terms.append(_stem(word))
+    return terms
+
+class SchemaIndex:
+    """
+    BM25 index over the tables of a DatabaseSchema.
+
+    Each table is indexed as a document made of its name, its column names
+    and the names of the tables it is linked to by foreign keys, so a
+    question mentioning "customer" also ranks tables that reference
+    customers. Selection adds the foreign key neighbours of the best matches
+    so the agent has what it needs to write joins.
+    """
+
+    def __init__(self, schema: DatabaseSchema, k1: float = 1.5, b: float = 0.75):
+        self.schema = schema
+        self.k1 = k1
+        self.b = b
+
+        # token size of the full schema, measured on first use
+        self.full_tokens: Optional[int] = None
+
+        self.references: Dict[str, Set[str]] = {}
+        self.referenced_by: Dict[str, Set[str]] = {name: set() for name in schema.tables}
+        for name, table in schema.tables.items():
+            targets = {
+                fk.references["table"]
+                for fk in table.foreignKeys
+                if fk.references.get("schema", schema.schema_name) == schema.schema_name
+                and fk.references["table"] in schema.tables
+            }
+            self.references[name] = targets
+            for target in targets:
+                self.referenced_by[target].add(name)
+
+        self.term_frequencies: Dict[str, Counter] = {}
+        self.lengths: Dict[str, int] = {}
+        document_frequencies: Counter = Counter()
+
+        for name, table in schema.tables.items():
+            terms: Counter = Counter()
+            for term in tokenize(name):
+                terms[term] += TABLE_NAME_WEIGHT
+            for column in table.columns:
+                for term in tokenize(column.name):
+                    terms[term] += COLUMN_NAME_WEIGHT
+            for neighbour in self.references[name] | self.referenced_by[name]:
+                for term in tokenize(neighbour):
+                    terms[term] += NEIGHBOUR_NAME_WEIGHT
+
+            self.term_frequencies[name] = terms
+            self.lengths[name] = sum(terms.values())
+            document_frequencies.update(terms.keys())
+
+        count = len(schema.tables)
+        self.average_length = (sum(self.lengths.values()) / count) if count else 0.0
+        self.idf = {
+            term: math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequencies.items()
+        }
+
+    def score(self, question: str) -> List[Tuple[str, float]]:
+        """
+        Rank the tables of the schema by BM25 relevance to a question.
+
+        Args:
+            question (str): The user's question or search terms.
+        Returns:
+            List[Tuple[str, float]]: (table name, score) pairs with a positive score, best first.
+        """
+        query_terms = set(tokenize(question))
+        scores = []
+
+        for name, terms in self.term_frequencies.items():
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[name] / (self.average_length or 1))
+            for term in query_terms:
+                frequency = terms.get(term)
+                if frequency:
+                    score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            if score > 0:
+                scores.append((name, score))
+
+        scores.sort(key=lambda item: (-item[1], item[0]))
+        return scores
+
+    def select(self, question: str, top_k: int, tables: Optional[Iterable[str]] = None) -> Tuple[List[str], List[str]]:
+        """
+        Choose the tables relevant to a question.
+
+        The top_k best-scoring tables and any explicitly requested tables are
+        expanded with the tables they reference and with link tables that
+        reference at least two of them.
+
+        Args:
+            question (str): The user's question.
+            top_k (int): Number of best-scoring tables to start from.
+            tables (Optional[Iterable[str]]): Table names that must be included.
+        Returns:
+            Tuple[List[str], List[str]]: The selected table names, and the
+            remaining matching tables in rank order.
+        """
+        ranked = [name for name, _ in self.score(question)]
+
+        selected = []
+        for name in tables or []:
+            if name in self.schema.tables and name not in selected:
+                selected.append(name)
+
+        added = 0
+        for name in ranked:
+            if added >= top_k:
+                break
+            if name not in selected:
+                selected.append(name)
+                added += 1
+
+        chosen = set(selected)
+        for name in list(selected):
+            for target in sorted(self.references[name]):
+                if target not in chosen:
+                    chosen.add(target)
+                    selected.append(target)
+
+        for name in sorted(self.schema.tables):
+            if name not in chosen and len(self.references[name] & chosen) >= 2:
+                chosen.add(name)
+                selected.append(name)
+
+        return selected, [name for name in ranked if name not in chosen]
+
+class SchemaIndexCache:
+    """
+    Keeps the BM25 index of recently used schemas, rebuilt whenever the schema
+    cache hands out a new DatabaseSchema object for the same key.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, SchemaIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, schema: DatabaseSchema) -> SchemaIndex:
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None and index.schema is schema:
+                self._entries.move_to_end(key)
+                return index
+
+        index = SchemaIndex(schema)
+
+        with self._lock:
+            self._entries[key] = index
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return index
+
+schema_index_cache = SchemaIndexCache()
@@ -0,0 +1,343 @@
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from sqlalchemy import inspect, text as Text
+from sqlalchemy.engine import Connection
+
+class Column(BaseModel):
+    name: str
+    type: str
+    nullable: bool
+    default: Optional[str]
+    primary_key: bool = False
+
+class ForeignKey(BaseModel):
+    column: str
+    references: Dict[str, str]
+
+class TableSchema(BaseModel):
+    columns: List[Column]
+    foreignKeys: List[ForeignKey]
+    kind: str = "table"
+
+class ColumnProfile(BaseModel):
+    """
+    Planner statistics of a column, from pg_stats.
+    """
+    null_frac: Optional[float] = None
+    distinct: Optional[int] = None
+    common_values: Optional[List[str]] = None
+    common_freqs: Optional[List[float]] = None
+    histogram: Optional[List[str]] = None
+    value_range: Optional[List[str]] = None
+
+class TableProfile(BaseModel):
+    """
+    Planner statistics of a table: estimated rows and analyzed columns.
+    """
+    estimated_rows: Optional[int] = None
+    columns: Dict[str, ColumnProfile] = {}
+
+class DatabaseSchema(BaseModel):
+    schema_name: str
+    tables: Dict[str, TableSchema]
+    profiles: Optional[Dict[str, TableProfile]] = None
+
+# pg_class.relkind values and how they are reported to the agent; partitions
+# (relispartition) are left out of every query, their parent stands for them
+TABLE_KINDS = {"r": "table", "p": "table"}
+VIEW_KINDS = {"v": "view", "m": "materialized_view"}
+
+# every relation with its columns, types, nullability and defaults
+COLUMNS_QUERY = """
+    SELECT
+      c.relname,
+      c.relkind::text,
+      a.attname,
+      pg_catalog.format_type(a.atttypid, a.atttypmod),
+      a.attnotnull,
+      pg_catalog.pg_get_expr(d.adbin, d.adrelid)
+    FROM pg_catalog.pg_class c
+      JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+      LEFT JOIN pg_catalog.pg_attribute a
+        ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+      LEFT JOIN pg_catalog.pg_attrdef d
+        ON d.adrelid = c.oid AND d.adnum = a.attnum
+    WHERE n.nspname = :schema_name
+      AND c.relkind::text = ANY(:relkinds)
+      AND NOT c.relispartition
+    ORDER BY c.relname, a.attnum;
+"""
+
+# primary and foreign key columns, one row per column pair
+CONSTRAINTS_QUERY = """
+    SELECT
+      c.relname,
+      con.contype::text,
+      a.attname,
+      fn.nspname,
+      fc.relname,
+      fa.attname
+    FROM pg_catalog.pg_constraint con
+      JOIN pg_catalog.pg_class c ON c.oid = con.conrelid
+      JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+      CROSS JOIN LATERAL unnest(con.conkey, con.confkey)
+        WITH ORDINALITY AS k(attnum, fattnum, ord)
+      JOIN pg_catalog.pg_attribute a
+        ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+      LEFT JOIN pg_catalog.pg_class fc ON fc.oid = con.confrelid
+      LEFT JOIN pg_catalog.pg_namespace fn ON fn.oid = fc.relnamespace
+      LEFT JOIN pg_catalog.pg_attribute fa
+        ON fa.attrelid = con.confrelid AND fa.attnum = k.fattnum
+    WHERE n.nspname = :schema_name
+      AND con.contype IN ('p', 'f')
+      AND NOT c.relispartition
+    ORDER BY c.relname, con.conname, k.ord;
+"""
+
+# row estimates and per-column statistics kept by ANALYZE, read without
+# scanning any table; values of any type are returned as text
+PROFILES_QUERY = """
+    SELECT
+      c.relname,
+      c.reltuples::bigint,
+      s.attname,
+      s.null_frac,
+      s.n_distinct,
+      s.most_common_vals::text::text[],
+      s.most_common_freqs,
+      s.histogram_bounds::text::text[]
+    FROM pg_catalog.pg_class c
+      JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+      LEFT JOIN pg_catalog.pg_stats s
+        ON s.schemaname = n.nspname AND s.tablename = c.relname
+        AND s.inherited = (c.relkind = 'p')
+    WHERE n.nspname = :schema_name
+      AND c.relkind::text = ANY(:relkinds)
+      AND NOT c.relispartition
+    ORDER BY c.relname, s.attname;
+"""
+
+def introspect_schema(conn: Connection, schema_name: str = "public", include_views: bool = False) -> DatabaseSchema:
+    """
+    Build a DatabaseSchema for one PostgreSQL schema using a constant number
+    of pg_catalog queries, independent of the number of tables.
+
+    Args:
+        conn (Connection): An open connection to the target database.
+        schema_name (str): The schema to introspect.
+        include_views (bool): Also return views and materialized views.
+    Returns:
+        DatabaseSchema: Tables (and optionally views) with columns, primary keys and foreign keys.
+    """
+    if conn.dialect.name != "postgresql":
+        return inspect_schema(conn, schema_name, include_views)
+
+    relkinds = dict(TABLE_KINDS)
+    if include_views:
+        relkinds.update(VIEW_KINDS)
+
+    schema = DatabaseSchema(schema_name=schema_name, tables={})
+
+    # Step 1: relations and their columns
+    columns = conn.execute(Text(COLUMNS_QUERY), {
+        "schema_name": schema_name,
+        "relkinds": list(relkinds),
+    }).fetchall()
+
+    for table_name, relkind, column_name, data_type, not_null, default in columns:
+        table = schema.tables.get(table_name)
+        if table is None:
+            table = schema.tables[table_name] = TableSchema(
+                columns=[],
+                foreignKeys=[],
+                kind=relkinds[relkind],
+            )
+
+        # relations without columns still show up once with NULL attributes
+        if column_name is None:
+            continue
+
+        table.columns.append(Column(
+            name=column_name,
+            type=data_type,
+            nullable=not not_null,
+            default=default,
+        ))
+
+    # Step 2: primary and foreign keys
+    constraints = conn.execute(Text(CONSTRAINTS_QUERY), {
+        "schema_name": schema_name,
+    }).fetchall()
+
+    for table_name, contype, column_name, ref_schema, ref_table, ref_column in constraints:
+        table = schema.tables.get(table_name)
+        if table is None:
+            continue
+
+        if contype == "p":
+            for column in table.columns:
+                if column.name == column_name:
+                    column.primary_key = True
+            continue
+
+        references = {"table": ref_table, "column": ref_column}
+        if ref_schema != schema_name:
+            references["schema"] = ref_schema
+
+        table.foreignKeys.append(ForeignKey(column=column_name, references=references))
+
+    return schema
+
+def inspect_schema(conn: Connection, schema_name: str = "public", include_views: bool = False) -> DatabaseSchema:
+    """
+    Build a DatabaseSchema with the SQLAlchemy inspector, for databases other
+    than PostgreSQL (e.g. SQLite). This issues a few queries per table.
+
+    Args:
+        conn (Connection): An open connection to the target database.
+        schema_name (str): The schema to inspect; 'public' maps to the default
+            schema on databases that do not have one by that name.
+        include_views (bool): Also return views.
+    Returns:
+        DatabaseSchema: Tables (and optionally views) with columns, primary keys and foreign keys.
+    """
+    inspector = inspect(conn)
+
+    schema = schema_name
+    if schema_name == "public" and schema_name not in inspector.get_schema_names():
+        schema = None
+
+    relations = [(name, "table") for name in inspector.get_table_names(schema=schema)]
+    if include_views:
+        relations += [(name, "view") for name in inspector.get_view_names(schema=schema)]
+
+    database_schema = DatabaseSchema(schema_name=schema_name, tables={})
+
+    for table_name, kind in relations:
+        primary_key = set(inspector.get_pk_constraint(table_name, schema=schema).get("constrained_columns") or [])
+
+        table = database_schema.tables[table_name] = TableSchema(
+            columns=[
+                Column(
+                    name=column["name"],
+                    type=str(column["type"]),
+                    nullable=column.get("nullable", True),
+                    default=None if column.get("default") is None else str(column["default"]),
+                    primary_key=column["name"] in primary_key,
+                )
+                for column in inspector.get_columns(table_name, schema=schema)
+            ],
+            foreignKeys=[],
+            kind=kind,
+        )
+
+        if kind != "table":
+            continue
+
+        for foreign_key in inspector.get_foreign_keys(table_name, schema=schema):
+            for column_name, ref_column in zip(foreign_key["constrained_columns"], foreign_key["referred_columns"]):
+                references = {"table": foreign_key["referred_table"], "column": ref_column}
+                if foreign_key.get("referred_schema") not in (None, schema):
+                    references["schema"] = foreign_key["referred_schema"]
+
+                table.foreignKeys.append(ForeignKey(column=column_name, references=references))
+
+    return database_schema
+
+def _profile_values(values: Optional[List[str]], limit: int, max_chars: int) -> Optional[List[str]]:
+    if not values:
+        return None
+    return [value if len(value) <= max_chars else value[:max_chars] + "..." for value in values[:limit]]
+
+def _histogram(bounds: Optional[List[str]], points: int, max_chars: int) -> Optional[List[str]]:
+    # evenly spaced bounds, always keeping the first and last (the value range)
+    if not bounds or points <= 0:
+        return None
+    points = max(points, 2)
+    if len(bounds) > points:
+        step = (len(bounds) - 1) / (points - 1)
+        bounds = [bounds[round(i * step)] for i in range(points)]
+    return _profile_values(bounds, points, max_chars)
+
+def _value_range(common_values: Optional[List[str]], bounds: Optional[List[str]], max_chars: int) -> Optional[List[str]]:
+    # the histogram leaves out the most common values, so the range spans both;
+    # numbers compare as numbers, anything else (ISO dates included) as text
+    values = (common_values or []) + (bounds or [])
+    if not values:
+        return None
+    try:
+        key = {value: float(value) for value in values}.__getitem__
+    except ValueError:
+        key = None
+    return _profile_values([min(values, key=key), max(values, key=key)], 2, max_chars)
+
+def introspect_profiles(
+    conn: Connection,
+    schema_name: str = "public",
+    include_views: bool = False,
+    max_values: int = 10,
+    histogram_bounds: int = 5,
+    max_value_chars: int = 64,
+) -> Optional[Dict[str, TableProfile]]:
+    """
+    Read the planner statistics of every relation of a PostgreSQL schema in
+    one pg_catalog query: estimated row counts from pg_class.reltuples and,
+    per analyzed column, the null fraction, distinct count, most common values,
+    histogram bounds and the range they span from pg_stats. No table is
+    scanned, so the numbers are as fresh as the last ANALYZE.
+
+    Args:
+        conn (Connection): An open connection to the target database.
+        schema_name (str): The schema to profile.
+        include_views (bool): Also profile materialized views.
+        max_values (int): Most common values kept per column.
+        histogram_bounds (int): Histogram bounds kept per column, first and last included.
+        max_value_chars (int): Length above which values are cut.
+    Returns:
+        Optional[Dict[str, TableProfile]]: Profiles by table name, or None when
+        the database is not PostgreSQL.
+    """
+    if conn.dialect.name != "postgresql":
+        return None
+
+    relkinds = dict(TABLE_KINDS)
+    if include_views:
+        relkinds.update(VIEW_KINDS)
+
+    rows = conn.execute(Text(PROFILES_QUERY), {
+        "schema_name": schema_name,
+        "relkinds": list(relkinds),
+    }).fetchall()
+
+    profiles: Dict[str, TableProfile] = {}
+    for table_name, reltuples, column_name, null_frac, n_distinct, common_values, common_freqs, bounds in rows:
+        profile = profiles.get(table_name)
+        if profile is None:
+            # reltuples is -1 for tables that were never vacuumed or analyzed
+            profile = profiles[table_name] = TableProfile(
+                estimated_rows=reltuples if reltuples is not None and reltuples >= 0 else None,
+                columns={},
+            )
+
+        if column_name is None:
+            continue
+
+        # negative n_distinct is a fraction of the row count
+        distinct = None
+        if n_distinct is not None and n_distinct > 0:
+            distinct = int(n_distinct)
+        elif n_distinct is not None and n_distinct < 0 and profile.estimated_rows is not None:
+            distinct = int(-n_distinct * profile.estimated_rows)
+
+        value_range = _value_range(common_values, bounds, max_value_chars)
+        common_values = _profile_values(common_values, max_values, max_value_chars)
+        profile.columns[column_name] = ColumnProfile(
+            null_frac=round(null_frac, 4) if null_frac is not None else None,
+            distinct=distinct,
+            common_values=common_values,
+            common_freqs=[round(freq, 4) for freq in common_freqs[:len(common_values)]] if common_values and common_freqs else None,
+            histogram=_histogram(bounds, histogram_bounds, max_value_chars),
+            value_range=value_range,
+        )
+
+    return profiles
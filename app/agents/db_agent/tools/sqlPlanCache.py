@@ -0,0 +1,518 @@
+import asyncio
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from pydantic import BaseModel
+from sqlalchemy.engine import Connection, make_url
+
+from app.constants import config
+from app.db import engine_registry
+from app.helper import logger
+from .queryCache import _TABLE_REFERENCE, normalize_sql
+from .schemaCache import schema_fingerprint
+
+# string literals, quoted identifiers and numeric literals of a query
+_SQL_LITERAL = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|(?<![\w.$:])\d+(?:\.\d+)?(?![\w.])")
+_NUMBER = r"\d+(?:\.\d+)?"
+
+# a query template: SQL text with the indexes of the slots filled in on a hit
+Template = List[Union[str, int]]
+CacheKey = Tuple[str, str]
+
+def normalize_question(question: str) -> str:
+    """
+    Collapse whitespace and drop trailing punctuation, so questions differing
+    only in those match the same plan.
+    """
+    return " ".join(question.split()).rstrip("?.! ")
+
+def referenced_schemas(queries: List[str]) -> List[str]:
+    """
+    Schemas the queries read from; unqualified tables count as 'public'.
+    """
+    schemas = set()
+    for query in queries:
+        for reference in _TABLE_REFERENCE.findall(normalize_sql(query)):
+            parts = reference.split(".")
+            schemas.add(parts[0].strip().strip('"') if len(parts) > 1 else "public")
+    return sorted(schemas)
+
+def plan_fingerprints(conn: Connection, schemas: List[str]) -> Optional[Dict[str, str]]:
+    """
+    Catalog fingerprints of the given schemas, or None when the database is
+    not PostgreSQL (plans are then only bounded by their TTL).
+    """
+    fingerprints = {}
+    for schema in schemas:
+        fingerprint = schema_fingerprint(conn, schema)
+        if fingerprint is None:
+            return None
+        fingerprints[schema] = fingerprint
+    return fingerprints
+
+class PlanSlot(BaseModel):
+    """
+    A literal taken from the question: where its value goes and how it is written in SQL.
+    """
+    numeric: bool
+    # "lower" or "upper" when the SQL wrote the question's value in that case
+    case: Optional[str] = None
+
+class SQLPlanHit(BaseModel):
+    """
+    Queries of a cached plan with the literals of the new question filled in.
+    """
+    question: str
+    queries: List[str]
+    parameters: List[str]
+    llm_steps: int
+    generation_seconds: float
+
+def _slot_case(sql_value: str, question_value: str) -> Optional[str]:
+    if sql_value == question_value:
+        return ""
+    if sql_value == question_value.lower():
+        return "lower"
+    if sql_value == question_value.upper():
+        return "upper"
+    return None
+
+def _literals(query: str) -> Iterator[Tuple[re.Match, str, bool]]:
+    """
+    String and numeric literals of a query with their value (string literals
+    unquoted and without LIKE wildcards) and whether they are numeric.
+    """
+    for literal in _SQL_LITERAL.finditer(query):
+        token = literal.group(0)
+        if token[0] == '"':
+            continue
+        if token[0] == "'":
+            value = token[1:-1].replace("''", "'").strip("%")
+            if value.strip():
+                yield literal, value, False
+        else:
+            yield literal, token, True
+
+def parameterize(question: str, queries: List[str]) -> Optional[Tuple[str, List[Template], List[PlanSlot]]]:
+    """
+    Turn a question and the SQL that answered it into a question pattern and
+    query templates.
+
+    Every SQL literal whose value appears exactly once in the question (as a
+    whole word, optionally wrapped in LIKE wildcards) and exactly once in the
+    queries becomes a slot: the question pattern captures it and the
+    templates take the captured value. Any other literal stays fixed, and so
+    does every other word of the question, so a new question only matches
+    when it differs in slot values.
+
+    Args:
+        question (str): The user's question.
+        queries (List[str]): The queries that answered it.
+    Returns:
+        Optional[Tuple[str, List[Template], List[PlanSlot]]]: The question
+        regex, the query templates and the slots, or None when a value of the
+        question is written more than once in the queries (e.g. a customer id
+        that is also the LIMIT), since it cannot tell which of them to replace.
+    """
+    question = normalize_question(question)
+    slots: List[PlanSlot] = []
+    spans: List[Tuple[int, int, int]] = []
+
+    def question_match(value: str) -> Optional[re.Match]:
+        matches = list(re.finditer(rf"(?<!\w){re.escape(value)}(?!\w)", question, re.IGNORECASE))
+        return matches[0] if len(matches) == 1 else None
+
+    sql_counts = Counter(value.lower() for query in queries for _, value, _ in _literals(query))
+    if any(count > 1 and question_match(value) is not None for value, count in sql_counts.items()):
+        return None
+
+    def find_slot(value: str, numeric: bool) -> Optional[int]:
+        match = question_match(value)
+        if match is None:
+            return None
+        if any(match.start() < end and start < match.end() for start, end, _ in spans):
+            return None
+
+        case = _slot_case(value, match.group(0))
+        if case is None:
+            return None
+
+        slots.append(PlanSlot(numeric=numeric, case=case or None))
+        spans.append((match.start(), match.end(), len(slots) - 1))
+        return len(slots) - 1
+
+    templates: List[Template] = []
+    for query in queries:
+        template: Template = []
+        position = 0
+        for literal, value, numeric in _literals(query):
+            slot = find_slot(value, numeric)
+            if slot is None:
+                continue
+
+            if numeric:
+                template.extend([query[position:literal.start()], slot])
+            else:
+                token = literal.group(0)[1:-1]
+                prefix = token[:len(token) - len(token.lstrip("%"))]
+                suffix = token[len(token.rstrip("%")):]
+                template.extend([query[position:literal.start()] + "'" + prefix, slot, suffix + "'"])
+
+            position = literal.end()
+
+        template.append(query[position:])
+        templates.append([part for part in template if part != ""])
+
+    # slots are numbered in question order, the order of the pattern's groups
+    order = {slot: index for index, (_, _, slot) in enumerate(sorted(spans))}
+    templates = [[order[part] if isinstance(part, int) else part for part in template] for template in templates]
+    slots = [slots[slot] for _, _, slot in sorted(spans)]
+
+    pattern = []
+    position = 0
+    for start, end, slot in sorted(spans):
+        pattern.append(re.escape(question[position:start]))
+        if slots[order[slot]].numeric:
+            pattern.append(f"({_NUMBER})")
+        else:
+            # as many words as the original value, so a slot cannot swallow the rest of a question
+            words = len(question[start:end].split())
+            pattern.append(r"(\S+" + r"(?:\s+\S+)" * (words - 1) + ")")
+        position = end
+    pattern.append(re.escape(question[position:]))
+
+    return "^" + "".join(pattern) + "$", templates, slots
+
+def render(templates: List[Template], slots: List[PlanSlot], values: List[str]) -> List[str]:
+    """
+    Fill the slot values of a new question into query templates.
+    """
+    literals = []
+    for slot, value in zip(slots, values):
+        if slot.case == "lower":
+            value = value.lower()
+        elif slot.case == "upper":
+            value = value.upper()
+        literals.append(value if slot.numeric else value.replace("'", "''"))
+
+    return ["".join(literals[part] if isinstance(part, int) else part for part in template) for template in templates]
+
+class SQLPlanEntry:
+    """
+    A cached plan: question pattern, query templates and the schema
+    fingerprints and generation cost it was recorded with.
+    """
+
+    def __init__(
+        self,
+        question: str,
+        pattern: str,
+        templates: List[Template],
+        slots: List[PlanSlot],
+        fingerprints: Optional[Dict[str, str]],
+        llm_steps: int,
+        generation_seconds: float,
+    ):
+        self.question = question
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+        self.templates = templates
+        self.slots = slots
+        self.fingerprints = fingerprints
+        self.llm_steps = llm_steps
+        self.generation_seconds = generation_seconds
+        self.created = time.monotonic()
+        self.checked_at = self.created
+
+class SQLPlanCache:
+    """
+    LRU cache of the SQL that answered earlier questions, per database.
+
+    Entries are stored as parameterized templates (see `parameterize`), so a
+    question of the same shape with other literals reuses the plan. Entries
+    expire after `ttl` seconds; on PostgreSQL they are also dropped as soon
+    as the catalog fingerprint of a schema they read changes, checked at
+    most every `revalidate_interval` seconds per entry.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 86400, revalidate_interval: float = 30, max_queries: int = 5):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.revalidate_interval = revalidate_interval
+        self.max_queries = max_queries
+
+        self._entries: "OrderedDict[CacheKey, SQLPlanEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.llm_calls_saved = 0
+        self.latency_saved = 0.0
+
+    def _match(self, db_connection_url: str, question: str) -> Optional[Tuple[CacheKey, SQLPlanEntry, List[str]]]:
+        question = normalize_question(question)
+        now = time.monotonic()
+
+        with self._lock:
+            for key, entry in reversed(self._entries.items()):
+                if key[0] != db_connection_url:
+                    continue
+                if now - entry.created >= self.ttl:
+                    continue
+                match = entry.pattern.match(question)
+                if match is not None:
+                    return key, entry, list(match.groups())
+        return None
+
+    def _needs_check(self, entry: SQLPlanEntry) -> bool:
+        return entry.fingerprints is not None and time.monotonic() - entry.checked_at >= self.revalidate_interval
+
+    def _remove(self, key: CacheKey, entry: SQLPlanEntry):
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+
+    def _hit(self, key: CacheKey, entry: SQLPlanEntry, values: List[str], current: Optional[Dict[str, str]], checked: bool, started: float) -> Optional[SQLPlanHit]:
+        with self._lock:
+            if checked:
+                if current != entry.fingerprints:
+                    self._remove(key, entry)
+                    self.invalidations += 1
+                    self.misses += 1
+                    return None
+                entry.checked_at = time.monotonic()
+
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            self.llm_calls_saved += entry.llm_steps
+            self.latency_saved += max(entry.generation_seconds - (time.perf_counter() - started), 0.0)
+
+        return SQLPlanHit(
+            question=entry.question,
+            queries=render(entry.templates, entry.slots, values),
+            parameters=values,
+            llm_steps=entry.llm_steps,
+            generation_seconds=entry.generation_seconds,
+        )
+
+    def _miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def lookup(self, db_connection_url: str, question: str) -> Optional[SQLPlanHit]:
+        """
+        Find the plan of an earlier question of the same shape and fill in
+        the literals of this one.
+
+        Args:
+            db_connection_url (str): The database the question is about.
+            question (str): The user's question.
+        Returns:
+            Optional[SQLPlanHit]: The queries to run, or None on a miss.
+        """
+        started = time.perf_counter()
+        found = self._match(db_connection_url, question)
+        if found is None:
+            self._miss()
+            return None
+
+        key, entry, values = found
+        current, checked = None, self._needs_check(entry)
+        if checked:
+            with engine_registry.connect(db_connection_url) as conn:
+                current = plan_fingerprints(conn, list(entry.fingerprints))
+
+        return self._hit(key, entry, values, current, checked, started)
+
+    async def alookup(self, db_connection_url: str, question: str) -> Optional[SQLPlanHit]:
+        """
+        Async counterpart of `lookup`.
+        """
+        started = time.perf_counter()
+        found = self._match(db_connection_url, question)
+        if found is None:
+            self._miss()
+            return None
+
+        key, entry, values = found
+        current, checked = None, self._needs_check(entry)
+        if checked:
+            current = await _afingerprints(db_connection_url, list(entry.fingerprints))
+
+        return self._hit(key, entry, values, current, checked, started)
+
+    def store(
+        self,
+        db_connection_url: str,
+        question: str,
+        queries: List[str],
+        fingerprints: Optional[Dict[str, str]],
+        llm_steps: int,
+        generation_seconds: float,
+    ) -> bool:
+        """
+        Cache the queries that answered a question.
+
+        Args:
+            db_connection_url (str): The database the queries ran on.
+            question (str): The user's question.
+            queries (List[str]): The successful queries of the turn, in order.
+            fingerprints (Optional[Dict[str, str]]): Catalog fingerprints of the schemas they read.
+            llm_steps (int): Model calls it took to get to the first query.
+            generation_seconds (float): Time it took to get to the first query.
+        Returns:
+            bool: Whether the plan was stored; plans without slots are not.
+        """
+        if not queries or len(queries) > self.max_queries:
+            return False
+
+        parameterized = parameterize(question, queries)
+        if parameterized is None:
+            return False
+        # a plan without slots only matches the same question, whose SQL may
+        # hold values derived from it (dates for "yesterday") that go stale
+        pattern, templates, slots = parameterized
+        if not slots:
+            return False
+        entry = SQLPlanEntry(normalize_question(question), pattern, templates, slots, fingerprints, llm_steps, generation_seconds)
+
+        with self._lock:
+            key = (db_connection_url, pattern)
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            self.stores += 1
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return True
+
+    def invalidate(self, db_connection_url: str) -> int:
+        """
+        Drop every plan for the given connection URL.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == db_connection_url]
+            for key in keys:
+                del self._entries[key]
+
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "llm_calls_saved": self.llm_calls_saved,
+                "latency_saved_seconds": self.latency_saved,
+            }
+
+async def _afingerprints(db_connection_url: str, schemas: List[str]) -> Optional[Dict[str, str]]:
+    if make_url(db_connection_url).get_backend_name() != "postgresql":
+        return None
+
+    if not engine_registry.supports_async(db_connection_url):
+        def fingerprints():
+            with engine_registry.connect(db_connection_url) as conn:
+                return plan_fingerprints(conn, schemas)
+        return await asyncio.to_thread(fingerprints)
+
+    async with engine_registry.async_connect(db_connection_url) as conn:
+        return await conn.run_sync(plan_fingerprints, schemas)
+
+# shared cache used by the db_assistant model
+sql_plan_cache = SQLPlanCache(
+    max_entries=config["PLAN_CACHE_MAX_ENTRIES"],
+    ttl=config["PLAN_CACHE_TTL"],
+    revalidate_interval=config["SCHEMA_CACHE_REVALIDATE_INTERVAL"],
+    max_queries=config["PLAN_CACHE_MAX_QUERIES"],
+)
+
+# the question and queries of the current chat turn, see `start_sql_plan`
+_turn_sql_plan: ContextVar[Optional[dict]] = ContextVar("turn_sql_plan", default=None)
+
+def start_sql_plan(question: str) -> dict:
+    """
+    Start recording the query that answers the current chat turn's question.
+
+    Returns:
+        dict: The turn's plan, filled in place by run_query and the db_assistant model.
+    """
+    plan = {
+        "question": question,
+        "db_connection_url": None,
+        # the last query that returned rows, when it started and the model
+        # calls it took to get to it
+        "query": None,
+        "query_started": None,
+        "query_llm_steps": 0,
+        "hit": False,
+        "agent_started": None,
+        "llm_steps": 0,
+    }
+    _turn_sql_plan.set(plan)
+    return plan
+
+def current_sql_plan() -> Optional[dict]:
+    return _turn_sql_plan.get()
+
+def record_sql_plan_query(db_connection_url: str, query: str, started: float):
+    """
+    Record a run_query of the current turn that returned rows; the one started
+    last is taken as the query that answered the question, earlier ones as
+    exploration.
+    """
+    plan = _turn_sql_plan.get()
+    if plan is None:
+        return
+
+    if plan["db_connection_url"] is None:
+        plan["db_connection_url"] = db_connection_url
+    if plan["db_connection_url"] != db_connection_url:
+        return
+
+    if plan["query_started"] is None or started >= plan["query_started"]:
+        plan["query"] = query
+        plan["query_started"] = started
+        plan["query_llm_steps"] = plan["llm_steps"]
+
+async def store_turn_sql_plan(plan: dict):
+    """
+    Cache the query that answered a finished turn, unless the turn was itself
+    served from a cached plan or no query returned rows.
+    """
+    if not config["PLAN_CACHE_ENABLED"] or plan["hit"] or plan["query"] is None or plan["agent_started"] is None:
+        return
+
+    try:
+        fingerprints = await _afingerprints(plan["db_connection_url"], referenced_schemas([plan["query"]]))
+        sql_plan_cache.store(
+            plan["db_connection_url"],
+            plan["question"],
+            [plan["query"]],
+            fingerprints,
+            llm_steps=plan["query_llm_steps"],
+            generation_seconds=max(plan["query_started"] - plan["agent_started"], 0.0),
+        )
+    except Exception as e:
+        logger.error({
+            "action": "store_turn_sql_plan - error",
+            "error": str(e),
+        })
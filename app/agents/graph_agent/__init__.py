@@ -1 +1,7 @@
-from .agent import *
\ No newline at end of file
+from .agent import OutputSchema, get_graph_generation_agent
+
+def __getattr__(name):
+    # `graph_generation_agent` is built on first use, see `get_graph_generation_agent`
+    if name == "graph_generation_agent":
+        return get_graph_generation_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
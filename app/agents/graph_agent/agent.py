@@ -1,7 +1,8 @@
+from functools import lru_cache
+
 from pydantic import BaseModel
 
-from langgraph.prebuilt import create_react_agent
-from app.helper import llm
+from app.helper import get_llm
 from app.constants import graph_agent_prompt
 
 class OutputSchema(BaseModel):
@@ -11,10 +12,25 @@ class OutputSchema(BaseModel):
     """
     results: str
 
-graph_generation_agent = create_react_agent(
-    name="graph_generation_agent",
-    model=llm,
-    tools=[],
-    prompt=graph_agent_prompt,
-    response_format=OutputSchema,
-)
+@lru_cache(maxsize=None)
+def get_graph_generation_agent():
+    """
+    The graph_generation_agent graph, built on first use.
+    """
+    from langgraph.prebuilt import create_react_agent
+
+    return create_react_agent(
+        name="graph_generation_agent",
+        model=get_llm(),
+        tools=[],
+        prompt=graph_agent_prompt,
+        response_format=OutputSchema,
+        # runs on the messages handed over by the supervisor, whose state is the one checkpointed
+        checkpointer=False,
+    )
+
+def __getattr__(name):
+    # `graph_generation_agent` is built on first use, see `get_graph_generation_agent`
+    if name == "graph_generation_agent":
+        return get_graph_generation_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
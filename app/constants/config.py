@@ -14,4 +14,141 @@ config = {
     "GEMINI_MODEL_ID" : os.getenv("GEMINI_MODEL_ID","gemini-2.0-flash"),
     "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY",""),
     "OPENAI_MODEL_ID": os.getenv("OPENAI_MODEL_ID","gpt-4o-mini"),
+    "OPENAI_TEMPERATURE": float(os.getenv("OPENAI_TEMPERATURE","0.9")),
+
+    # persistent LLM response cache
+    "LLM_CACHE_ENABLED": os.getenv("LLM_CACHE_ENABLED","false").lower() == "true",
+    "LLM_CACHE_PATH": os.getenv("LLM_CACHE_PATH","cache/llm_cache.sqlite3"),
+    "LLM_CACHE_MAX_ENTRIES": int(os.getenv("LLM_CACHE_MAX_ENTRIES","10000")),
+    "LLM_CACHE_ALLOW_NONZERO_TEMPERATURE": os.getenv("LLM_CACHE_ALLOW_NONZERO_TEMPERATURE","false").lower() == "true",
+
+    # persistence of chat messages: "sync" commits before the response is sent,
+    # "async" queues rows for a background writer that inserts them in batches
+    "CHAT_PERSISTENCE_MODE": os.getenv("CHAT_PERSISTENCE_MODE","sync").lower(),
+    "CHAT_WRITE_BATCH_SIZE": int(os.getenv("CHAT_WRITE_BATCH_SIZE","500")),
+    "CHAT_WRITE_FLUSH_INTERVAL": float(os.getenv("CHAT_WRITE_FLUSH_INTERVAL","0.2")),
+    "CHAT_WRITE_MAX_QUEUE": int(os.getenv("CHAT_WRITE_MAX_QUEUE","1000")),
+    "CHAT_WRITE_DRAIN_TIMEOUT": float(os.getenv("CHAT_WRITE_DRAIN_TIMEOUT","30")),
+
+    # durable LangGraph checkpoints of the chat supervisor, so a session resumes
+    # from its saved state instead of re-sending the rebuilt history every turn.
+    # CHECKPOINTER: "postgres" (application database), "sqlite" or "none"
+    "CHECKPOINTER": os.getenv("CHECKPOINTER","postgres").lower(),
+    "CHECKPOINT_SQLITE_PATH": os.getenv("CHECKPOINT_SQLITE_PATH","cache/checkpoints.sqlite3"),
+    "CHECKPOINT_KEEP_LAST": int(os.getenv("CHECKPOINT_KEEP_LAST","1")),
+    "CHECKPOINT_TTL": float(os.getenv("CHECKPOINT_TTL","604800")),
+    "CHECKPOINT_SWEEP_INTERVAL": float(os.getenv("CHECKPOINT_SWEEP_INTERVAL","3600")),
+
+    # local router in front of the supervisor model: clear data questions go
+    # straight to db_assistant and chart requests to db_assistant then the
+    # graph agent; anything below ROUTER_MIN_CONFIDENCE is left to the supervisor
+    "ROUTER_ENABLED": os.getenv("ROUTER_ENABLED","true").lower() == "true",
+    "ROUTER_MIN_CONFIDENCE": float(os.getenv("ROUTER_MIN_CONFIDENCE","0.8")),
+
+    # admission control in front of the chat supervisor: turns run at once
+    # (in total and per target database), turns waiting per user and in total,
+    # and the longest wait before a turn is refused with 429 and Retry-After
+    "ADMISSION_ENABLED": os.getenv("ADMISSION_ENABLED","true").lower() == "true",
+    "ADMISSION_MAX_CONCURRENT_TURNS": int(os.getenv("ADMISSION_MAX_CONCURRENT_TURNS","32")),
+    "ADMISSION_MAX_TURNS_PER_DATABASE": int(os.getenv("ADMISSION_MAX_TURNS_PER_DATABASE","8")),
+    "ADMISSION_MAX_QUEUED": int(os.getenv("ADMISSION_MAX_QUEUED","256")),
+    "ADMISSION_MAX_QUEUED_PER_USER": int(os.getenv("ADMISSION_MAX_QUEUED_PER_USER","4")),
+    "ADMISSION_QUEUE_TIMEOUT": float(os.getenv("ADMISSION_QUEUE_TIMEOUT","30")),
+    # LLM calls in flight per provider, and the longest wait for one
+    "LLM_MAX_CONCURRENT_CALLS": int(os.getenv("LLM_MAX_CONCURRENT_CALLS","16")),
+    "LLM_QUEUE_TIMEOUT": float(os.getenv("LLM_QUEUE_TIMEOUT","60")),
+
+    # logging: root level, per-logger levels ("httpx=WARNING,..."), "text" or
+    # "json" lines, size-rotated files, the queue drained by a background
+    # thread (0 writes in the calling thread) and the kept share of DEBUG records
+    "LOG_LEVEL": os.getenv("LOG_LEVEL","INFO").upper(),
+    "LOG_LEVELS": os.getenv("LOG_LEVELS",""),
+    "LOG_FORMAT": os.getenv("LOG_FORMAT","text").lower(),
+    "LOG_DIR": os.getenv("LOG_DIR","logs"),
+    "LOG_FILE_MAX_BYTES": int(os.getenv("LOG_FILE_MAX_BYTES","10485760")),
+    "LOG_FILE_BACKUPS": int(os.getenv("LOG_FILE_BACKUPS","5")),
+    "LOG_QUEUE_SIZE": int(os.getenv("LOG_QUEUE_SIZE","10000")),
+    "LOG_DEBUG_SAMPLE_RATE": float(os.getenv("LOG_DEBUG_SAMPLE_RATE","1.0")),
+
+    # start-up warm-up in the background: build the LLM client and agent graphs,
+    # and open this many application database connections
+    "WARMUP_AGENTS": os.getenv("WARMUP_AGENTS","true").lower() == "true",
+    "WARMUP_DB_CONNECTIONS": int(os.getenv("WARMUP_DB_CONNECTIONS","2")),
+
+    # in-process metrics exported on /metrics
+    "METRICS_ENABLED": os.getenv("METRICS_ENABLED","true").lower() == "true",
+
+    # token-budgeted conversation history
+    "HISTORY_TOKEN_BUDGET": int(os.getenv("HISTORY_TOKEN_BUDGET","4000")),
+    "HISTORY_MAX_MESSAGES": int(os.getenv("HISTORY_MAX_MESSAGES","100")),
+    "HISTORY_PAYLOAD_MAX_CHARS": int(os.getenv("HISTORY_PAYLOAD_MAX_CHARS","2000")),
+    "HISTORY_SUMMARY_MAX_TOKENS": int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS","400")),
+
+    # connection pools for the target databases queried by the agents
+    "TARGET_DB_POOL_SIZE": int(os.getenv("TARGET_DB_POOL_SIZE","5")),
+    "TARGET_DB_MAX_OVERFLOW": int(os.getenv("TARGET_DB_MAX_OVERFLOW","5")),
+    "TARGET_DB_POOL_TIMEOUT": float(os.getenv("TARGET_DB_POOL_TIMEOUT","30")),
+    "TARGET_DB_POOL_RECYCLE": int(os.getenv("TARGET_DB_POOL_RECYCLE","1800")),
+    "TARGET_DB_IDLE_TTL": float(os.getenv("TARGET_DB_IDLE_TTL","600")),
+    "TARGET_DB_MAX_ENGINES": int(os.getenv("TARGET_DB_MAX_ENGINES","64")),
+    # statements run at once per target database by concurrent tool calls
+    "TARGET_DB_MAX_CONCURRENT_QUERIES": int(os.getenv("TARGET_DB_MAX_CONCURRENT_QUERIES","4")),
+
+    # cache of introspected target database schemas
+    "SCHEMA_CACHE_MAX_ENTRIES": int(os.getenv("SCHEMA_CACHE_MAX_ENTRIES","128")),
+    "SCHEMA_CACHE_TTL": float(os.getenv("SCHEMA_CACHE_TTL","3600")),
+    "SCHEMA_CACHE_REVALIDATE_INTERVAL": float(os.getenv("SCHEMA_CACHE_REVALIDATE_INTERVAL","30")),
+
+    # column profiles (pg_stats) returned by the schema tools on request
+    "SCHEMA_PROFILE_MAX_VALUES": int(os.getenv("SCHEMA_PROFILE_MAX_VALUES","10")),
+    "SCHEMA_PROFILE_HISTOGRAM_BOUNDS": int(os.getenv("SCHEMA_PROFILE_HISTOGRAM_BOUNDS","5")),
+    "SCHEMA_PROFILE_MAX_VALUE_CHARS": int(os.getenv("SCHEMA_PROFILE_MAX_VALUE_CHARS","64")),
+
+    # relevance-based schema selection of fetch_relevant_schema
+    "SCHEMA_RELEVANT_TOP_K": int(os.getenv("SCHEMA_RELEVANT_TOP_K","8")),
+    "SCHEMA_RELEVANT_MORE_TABLES": int(os.getenv("SCHEMA_RELEVANT_MORE_TABLES","20")),
+
+    # limits applied while streaming run_query results
+    "QUERY_MAX_ROWS": int(os.getenv("QUERY_MAX_ROWS","500")),
+    "QUERY_MAX_BYTES": int(os.getenv("QUERY_MAX_BYTES","262144")),
+    "QUERY_FETCH_BATCH_SIZE": int(os.getenv("QUERY_FETCH_BATCH_SIZE","200")),
+
+    # encoding of run_query results for the model: "csv" (header once, large
+    # results sampled with column aggregates) or "json" (list of row objects)
+    "RESULT_ENCODING": os.getenv("RESULT_ENCODING","csv").lower(),
+    "RESULT_FULL_MAX_ROWS": int(os.getenv("RESULT_FULL_MAX_ROWS","100")),
+    "RESULT_HEAD_ROWS": int(os.getenv("RESULT_HEAD_ROWS","40")),
+    "RESULT_TAIL_ROWS": int(os.getenv("RESULT_TAIL_ROWS","10")),
+
+    # on-disk store of full run_query results above RESULT_STORE_MIN_ROWS rows;
+    # the model gets a handle and a summary, clients download the rows. Opt-in:
+    # filling the store reads past QUERY_MAX_ROWS/QUERY_MAX_BYTES up to its own caps
+    "RESULT_STORE_ENABLED": os.getenv("RESULT_STORE_ENABLED","false").lower() == "true",
+    "RESULT_STORE_PATH": os.getenv("RESULT_STORE_PATH","cache/results"),
+    "RESULT_STORE_MIN_ROWS": int(os.getenv("RESULT_STORE_MIN_ROWS","100")),
+    "RESULT_STORE_MAX_ROWS": int(os.getenv("RESULT_STORE_MAX_ROWS","100000")),
+    "RESULT_STORE_MAX_BYTES": int(os.getenv("RESULT_STORE_MAX_BYTES","67108864")),
+    "RESULT_STORE_TTL": float(os.getenv("RESULT_STORE_TTL","86400")),
+    "RESULT_STORE_CHUNK_BYTES": int(os.getenv("RESULT_STORE_CHUNK_BYTES","65536")),
+
+    # EXPLAIN-based guard and statement timeout of run_query; session
+    # thresholds override the cost, row and timeout defaults.
+    # QUERY_GUARD_ACTION: "limit" runs oversized queries with a LIMIT, "reject" refuses them
+    "QUERY_GUARD_ENABLED": os.getenv("QUERY_GUARD_ENABLED","true").lower() == "true",
+    "QUERY_GUARD_MAX_COST": float(os.getenv("QUERY_GUARD_MAX_COST","1000000")),
+    "QUERY_GUARD_MAX_PLAN_ROWS": int(os.getenv("QUERY_GUARD_MAX_PLAN_ROWS","100000")),
+    "QUERY_GUARD_ACTION": os.getenv("QUERY_GUARD_ACTION","limit").lower(),
+    "QUERY_STATEMENT_TIMEOUT_MS": int(os.getenv("QUERY_STATEMENT_TIMEOUT_MS","15000")),
+
+    # cache of run_query results
+    "QUERY_CACHE_ENABLED": os.getenv("QUERY_CACHE_ENABLED","true").lower() == "true",
+    "QUERY_CACHE_TTL": float(os.getenv("QUERY_CACHE_TTL","60")),
+    "QUERY_CACHE_MAX_BYTES": int(os.getenv("QUERY_CACHE_MAX_BYTES","33554432")),
+    "QUERY_CACHE_CHECK_TABLE_STATS": os.getenv("QUERY_CACHE_CHECK_TABLE_STATS","true").lower() == "true",
+
+    # cache of the SQL that answered earlier questions, reused for questions of the same shape
+    "PLAN_CACHE_ENABLED": os.getenv("PLAN_CACHE_ENABLED","true").lower() == "true",
+    "PLAN_CACHE_MAX_ENTRIES": int(os.getenv("PLAN_CACHE_MAX_ENTRIES","1024")),
+    "PLAN_CACHE_TTL": float(os.getenv("PLAN_CACHE_TTL","86400")),
+    "PLAN_CACHE_MAX_QUERIES": int(os.getenv("PLAN_CACHE_MAX_QUERIES","5")),
 }
@@ -1 +1,4 @@
 from .user_chat import user_chat_controller
+from .user_chat_stream import user_chat_stream_controller
+from .get_chat_history import get_chat_history_controller, ChatHistoryPage, InvalidHistoryCursorError
+from .persistence_stats import get_chat_persistence_stats_controller
@@ -0,0 +1,131 @@
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+from pydantic import BaseModel
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import desc, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.db import async_engine
+from app.models import SessionChat, MessageRole
+from app.helper import logger
+
+# upper bound for the page size requested by clients
+MAX_HISTORY_PAGE_SIZE = 200
+
+class InvalidHistoryCursorError(ValueError):
+    """Raised when a history cursor is malformed or was not issued by the server."""
+
+class ChatHistoryMessage(BaseModel):
+    """
+    A stored chat message as returned by the history endpoint.
+    """
+    id: UUID
+    role: MessageRole
+    message: str
+    is_final_message: bool
+    result_handle: Optional[str] = None
+    created_at: datetime
+
+class ChatHistoryPage(BaseModel):
+    """
+    One page of a session's messages, newest first, with the cursor of the next (older) page.
+    """
+    messages: List[ChatHistoryMessage]
+    next_cursor: Optional[str] = None
+
+def encode_history_cursor(created_at: datetime, message_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), UUID(message_id)
+    except (ValueError, UnicodeError) as e:
+        raise InvalidHistoryCursorError(f"Invalid history cursor: {cursor}") from e
+
+async def get_chat_history_controller(session_id: UUID, limit: int = 50, cursor: Optional[str] = None) -> ChatHistoryPage:
+    """
+    Controller function to page through the messages of a session, newest first.
+
+    Pages are read with a keyset condition on (created_at, id) that is served by
+    the (session_id, created_at DESC, id DESC) index, so reading deep into a long
+    history costs the same as reading its first page.
+
+    Args:
+        session_id (UUID): The ID of the session.
+        limit (int): Number of messages per page (at most 200).
+        cursor (Optional[str]): The next_cursor of the previous page.
+    Returns:
+        ChatHistoryPage: The messages of the page and the cursor of the next page,
+        or no cursor when the oldest message was reached.
+    Raises:
+        InvalidHistoryCursorError: If the cursor is malformed.
+        SQLAlchemyError: If there is an error during the database operation.
+        Exception: For any other unexpected errors.
+    """
+    try:
+        limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+
+        statement = select(
+            SessionChat.id,
+            SessionChat.role,
+            SessionChat.message,
+            SessionChat.is_final_message,
+            SessionChat.result_handle,
+            SessionChat.created_at,
+        ).where(SessionChat.session_id == session_id)
+
+        if cursor:
+            created_at, message_id = decode_history_cursor(cursor)
+            statement = statement.where(
+                tuple_(SessionChat.created_at, SessionChat.id) < tuple_(created_at, message_id)
+            )
+
+        async with AsyncSession(async_engine) as session:
+            # one extra row tells whether another page exists
+            rows = (await session.exec(
+                statement.order_by(desc(SessionChat.created_at), desc(SessionChat.id)).limit(limit + 1)
+            )).all()
+
+        messages = [
+            ChatHistoryMessage(
+                id=row.id,
+                role=row.role,
+                message=row.message,
+                is_final_message=row.is_final_message,
+                result_handle=row.result_handle,
+                created_at=row.created_at,
+            )
+            for row in rows[:limit]
+        ]
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = messages[-1]
+            next_cursor = encode_history_cursor(last.created_at, last.id)
+
+        return ChatHistoryPage(messages=messages, next_cursor=next_cursor)
+
+    except InvalidHistoryCursorError:
+        # a client error, reported as 400 by the route
+        raise
+
+    except SQLAlchemyError as e:
+        logger.error({
+            "action": "get_chat_history_controller - error",
+            "session_id": str(session_id),
+            "error": str(e)
+        })
+        raise e
+
+    except Exception as e:
+        logger.error({
+            "action": "get_chat_history_controller - unexpected error",
+            "session_id": str(session_id),
+            "error": str(e)
+        })
+        raise e
@@ -0,0 +1,193 @@
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import desc
+
+from app.models import SessionChat, Session as UserSession, MessageRole
+from app.constants import config, history_summary_prompt
+from app.db import async_engine
+from app.helper import get_llm, logger, count_tokens
+
+# rough per-message overhead of the chat format, in tokens
+MESSAGE_TOKEN_OVERHEAD = 4
+
+# stored messages that carry rendered charts or tables
+HTML_PAYLOAD = re.compile(r"<\s*(?:!doctype|html|head|body|script|style|svg|canvas|table|div)\b", re.IGNORECASE)
+
+def compact_message(message) -> str:
+    """
+    Replace large HTML or text payloads of a stored message with a short
+    reference to the stored row.
+
+    Args:
+        message: A stored SessionChat row (id, role, message).
+    Returns:
+        str: The message content to send to the model.
+    """
+    content = message.message or ""
+    max_chars = config["HISTORY_PAYLOAD_MAX_CHARS"]
+
+    if HTML_PAYLOAD.search(content) and len(content) > max_chars // 4:
+        return f"[{MessageRole(message.role).value} message {message.id}: HTML visualization omitted, {len(content)} characters]"
+
+    if len(content) > max_chars:
+        return f"{content[:max_chars]}... [truncated, message {message.id} has {len(content)} characters]"
+
+    return content
+
+def to_langchain_message(role: str, content: str):
+    if role == "user":
+        return HumanMessage(content=content)
+    if role == "assistant":
+        return AIMessage(content=content)
+    return SystemMessage(content=content)
+
+def message_tokens(content: str) -> int:
+    return count_tokens(content) + MESSAGE_TOKEN_OVERHEAD
+
+async def summarize_messages(previous_summary: Optional[str], messages: List[Tuple[str, str]]) -> str:
+    """
+    Fold older conversation messages into the rolling session summary.
+
+    Args:
+        previous_summary (Optional[str]): The summary stored so far.
+        messages (List[Tuple[str, str]]): (role, compacted content) pairs, oldest first.
+    Returns:
+        str: The updated summary.
+    """
+    transcript = "\n".join(f"{role}: {content}" for role, content in messages)
+
+    response = await get_llm().ainvoke([
+        SystemMessage(content=history_summary_prompt.format(max_tokens=config["HISTORY_SUMMARY_MAX_TOKENS"])),
+        HumanMessage(content=f"Current summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"),
+    ])
+
+    return response.content
+
+async def build_history(session: AsyncSession, chat_session: UserSession) -> list:
+    """
+    Assemble the prior conversation of a session within the history token budget.
+
+    The newest HISTORY_MAX_MESSAGES messages newer than the stored summary are
+    loaded with large payloads compacted. Older ones are folded into the
+    session's rolling summary (persisted, so it is computed once), a batch of
+    at most HISTORY_MAX_MESSAGES per turn, and so are the oldest loaded ones
+    when they no longer fit the budget, until the rest fit in half of it. If
+    summarizing fails, the summary is left as it was and the loaded messages
+    are all kept.
+
+    Args:
+        session (AsyncSession): An open session on the application database;
+            its read transaction is committed before the summary is generated.
+        chat_session (UserSession): The chat session (loaded with
+            expire_on_commit=False).
+    Returns:
+        list: Summary and prior messages as LangChain messages, oldest first.
+    """
+    budget = config["HISTORY_TOKEN_BUDGET"]
+    max_messages = config["HISTORY_MAX_MESSAGES"]
+
+    statement = select(SessionChat.id, SessionChat.role, SessionChat.message, SessionChat.created_at).where(
+        SessionChat.session_id == chat_session.id,
+        SessionChat.role.in_([MessageRole.USER, MessageRole.ASSISTANT, MessageRole.SYSTEM]),
+    )
+    if chat_session.history_summary_until is not None:
+        statement = statement.where(SessionChat.created_at > chat_session.history_summary_until)
+
+    rows = (await session.exec(
+        statement.order_by(desc(SessionChat.created_at)).limit(max_messages)
+    )).all()
+
+    # unsummarized messages older than the loaded ones, oldest first
+    older = []
+    if len(rows) == max_messages:
+        older = (await session.exec(
+            statement.where(SessionChat.created_at < rows[-1].created_at).order_by(SessionChat.created_at).limit(max_messages)
+        )).all()
+    # more remain between them and the loaded messages: this turn folds only
+    # the batch, the next turns catch up
+    caught_up = len(older) < max_messages
+
+    # end the read transaction, so no pooled connection sits idle in it while
+    # the summary is generated
+    await session.commit()
+
+    # newest first: keep what fits in the budget
+    messages = []
+    total = 0
+    for row in rows:
+        content = compact_message(row)
+        tokens = message_tokens(content)
+        messages.append((row, content, tokens))
+        total += tokens
+
+    summary = chat_session.history_summary
+    summary_tokens = message_tokens(summary) if summary else 0
+
+    keep = messages
+    folded = [(row, compact_message(row)) for row in older]
+    if total + summary_tokens > budget and total > budget // 2:
+        # fold until the kept messages fit in half the budget, so summarizing
+        # does not run again on every following turn
+        keep = []
+        kept_tokens = 0
+        for row, content, tokens in messages:
+            if kept_tokens + tokens > budget // 2:
+                break
+            keep.append((row, content, tokens))
+            kept_tokens += tokens
+
+        # messages are only folded after everything older than them
+        if caught_up:
+            folded += [(row, content) for row, content, _ in reversed(messages[len(keep):])]
+
+    if folded:
+        try:
+            new_summary = await summarize_messages(summary, [(MessageRole(row.role).value, content) for row, content in folded])
+            await save_history_summary(chat_session, new_summary, folded[-1][0].created_at)
+            summary = new_summary
+        except Exception as e:
+            logger.error({
+                "action": "build_history - summary error",
+                "session_id": str(chat_session.id),
+                "error": str(e)
+            })
+            keep = messages
+
+    messages = keep
+
+    history = []
+    if summary:
+        history.append(SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+
+    for row, content, _ in reversed(messages):
+        history.append(to_langchain_message(row.role, content))
+
+    logger.info({
+        "action": "build_history",
+        "session_id": str(chat_session.id),
+        "messages": len(messages),
+        "history_tokens": sum(tokens for _, _, tokens in messages) + (message_tokens(summary) if summary else 0),
+        "token_budget": budget,
+    })
+
+    return history
+
+async def save_history_summary(chat_session: UserSession, summary: str, until: datetime):
+    """
+    Store the rolling summary of a session in a short transaction of its own,
+    unless a concurrent request already advanced it.
+    """
+    async with AsyncSession(async_engine) as session:
+        await session.exec(
+            update(UserSession)
+            .where(
+                UserSession.id == chat_session.id,
+                UserSession.history_summary_until.is_not_distinct_from(chat_session.history_summary_until),
+            )
+            .values(history_summary=summary, history_summary_until=until)
+        )
+        await session.commit()
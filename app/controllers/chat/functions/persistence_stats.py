@@ -0,0 +1,14 @@
+from app.constants import config
+from app.db import chat_write_behind
+
+def get_chat_persistence_stats_controller() -> dict:
+    """
+    Controller function to report the chat persistence mode and the write-behind
+    queue depth and flush latency.
+    Returns:
+        dict: The persistence mode and write-behind statistics.
+    """
+    return {
+        "mode": config["CHAT_PERSISTENCE_MODE"],
+        **chat_write_behind.stats(),
+    }
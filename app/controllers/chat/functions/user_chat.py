@@ -1,59 +1,71 @@
-from uuid import UUID
+from contextlib import asynccontextmanager, nullcontext
+from datetime import datetime, timedelta
+from typing import AsyncContextManager, AsyncIterator, List, Optional, Tuple
+from uuid import UUID, uuid4
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
-from sqlmodel import Session, select
-from sqlalchemy import desc
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import insert
 
 
-from app.db import engine
+from app.constants import config
+from app.db import async_engine, chat_write_behind, chat_checkpointer, start_result_handles
 from app.models import SessionChat, Session as UserSession, MessageRole
-from app.agents import supervisor
+from app.agents import aget_supervisor
+from app.agents.chat_agent.router import route_timer
+from app.agents.db_agent.tools import query_guard_limits, start_query_guard, start_sql_plan, store_turn_sql_plan
+from app.helper import logger, llm_cache, start_llm_cache_request, TokenUsageCallback, stage_timer, stage_timing_callbacks, turn_admission, start_admission
+from .history import build_history, message_tokens
 
-def user_chat_controller(session_id: UUID, query: str):
+async def load_conversation_history(session_id: UUID, query: str) -> Tuple[list, list]:
     """
-    Run a database query within the context of a session.
+    Build the supervisor input for a new chat turn.
+
+    A session with a checkpoint resumes from its saved graph state, so only
+    the user query is sent. Otherwise the history is rebuilt from the stored
+    session messages.
 
     Args:
         session_id (UUID): The ID of the session.
-        query (str): The SQL query to execute.
+        query (str): The user's new message.
 
     Returns:
-        The result of the query execution.
+        Tuple[list, list]: The prior history sent with the query (including the
+        DB connection system message; empty when resuming from a checkpoint)
+        and the supervisor input ending with the user query.
+
+    Raises:
+        ValueError: If the session does not exist.
     """
     
-    # fetch last 16 messages from session chat
-    with Session(engine) as session:
-        # fetch last 16 messages from session chat
-        messages = session.exec(
-            select(SessionChat).where(SessionChat.session_id == session_id).order_by(desc(SessionChat.created_at)).limit(16)
-        ).all()
-        
-        chat_session = session.exec(
+    # looked up before the session is opened, so a turn never holds two pooled connections
+    resume = chat_checkpointer is not None and await chat_checkpointer.ahas_thread(session_id)
+    
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        chat_session = (await session.exec(
             select(UserSession).where(UserSession.id == session_id)
-        ).first()
+        )).first()
         
         if not chat_session:
-            # close the session
-            session.close()
-            
             raise ValueError(f"Session with ID {session_id} not found.")
-            
-        # close the session
-        session.close()
         
-    # define conversation history
-    old_conversation_history = []
-    conversation_history = []
-    
-    # convert messages to conversation history
-    for message in messages:
-        if message.role == "user":
-            old_conversation_history.append(HumanMessage(content=message.message))
-        elif message.role == "assistant":
-            old_conversation_history.append(AIMessage(content=message.message))
-        elif message.role == "system":
-            old_conversation_history.append(SystemMessage(content=message.message))
-        elif message.role in ["tool", "tool_response", "tool_call"]:
-            continue
+        # run_query thresholds of this session for the rest of the turn
+        start_query_guard(query_guard_limits(
+            max_cost=chat_session.query_max_cost,
+            max_plan_rows=chat_session.query_max_plan_rows,
+            statement_timeout_ms=chat_session.query_statement_timeout_ms,
+        ))
+        # the user and database the turn queues for, see `admit_turn`
+        start_admission(str(chat_session.user_id), chat_session.db_connection_url)
+        
+        # the ID finds this turn's messages in a state that also holds earlier turns
+        query_message = HumanMessage(content=query, id=str(uuid4()))
+        
+        if resume:
+            return [], [query_message]
+        
+        # summary and recent messages that fit the history token budget
+        old_conversation_history = await build_history(session, chat_session)
             
     # add system message with DB connection URL
     old_conversation_history.append(SystemMessage(content=f"""
@@ -62,21 +74,44 @@ def user_chat_controller(session_id: UUID, query: str):
     """))
     
     # add user query to conversation history
-    conversation_history = old_conversation_history + [HumanMessage(content=query)]
-    
-    # generate a unique thread ID for the conversation
-    config = {"configurable": {"thread_id": session_id}}
-    
-    # Invoke supervisor with conversation history
-    result = supervisor.invoke(
-        {"messages": conversation_history}, 
-        config=config
-    )
+    conversation_history = old_conversation_history + [query_message]
+
+    return old_conversation_history, conversation_history
+
+def admit_turn() -> AsyncContextManager:
+    """
+    Hold a slot of the turn admission control for the supervisor run of the
+    current turn (a no-op when ADMISSION_ENABLED is off).
+
+    Raises:
+        AdmissionRejected: If the turn's queue is full or it waited too long.
+    """
+    if not config["ADMISSION_ENABLED"]:
+        return nullcontext()
+    return turn_admission.admit()
+
+def extract_latest_messages(result: dict, old_conversation_history: list, conversation_history: list) -> list:
+    """
+    Return the messages produced during this turn from the supervisor's final state.
+
+    Args:
+        result (dict): The final supervisor state.
+        old_conversation_history (list): The prior history passed to the supervisor.
+        conversation_history (list): The full input history; new messages are appended to it.
+
+    Returns:
+        list: The new messages, excluding the user query.
+    """
     
     # update conversation history with the result
     if result and "messages" in result:
-        # Get all new messages from this interaction
-        new_messages = result["messages"][len(old_conversation_history):]
+        # Get all new messages from this interaction, starting at the user query
+        query_message = conversation_history[-1]
+        start = next(
+            (index for index, message in enumerate(result["messages"]) if message.id == query_message.id),
+            len(old_conversation_history),
+        )
+        new_messages = result["messages"][start:]
         
         for message in new_messages:
             if hasattr(message, 'type') and message.type == 'human':
@@ -97,59 +132,246 @@ def user_chat_controller(session_id: UUID, query: str):
                 conversation_history.append(ToolMessage(content=message.content, tool_call_id=getattr(message, 'tool_call_id', '')))
     
     # extract the latest message content from conversation history
-    latest_message = conversation_history[len(old_conversation_history)+1:]
-    
-    # insert the new messages into the session chat
-    with Session(engine) as session:
-        conversation_history_trs = []
-        for index, message in enumerate(latest_message):
-            role = None
-            message_content = ""
-            
-            # Determine role and content based on message type
-            if hasattr(message, 'type'):
-                if message.type == 'human':
-                    role = MessageRole.USER
-                elif message.type == 'ai':
-                    role = MessageRole.ASSISTANT
-                elif message.type == 'system':
-                    role = MessageRole.SYSTEM
-                elif message.type == 'tool':
-                    role = MessageRole.TOOL
-            elif type(message).__name__ == 'HumanMessage':
+    return conversation_history[len(old_conversation_history)+1:]
+
+def build_message_rows(session_id: UUID, latest_message: List, result_handles: Optional[List[str]] = None) -> List[dict]:
+    """
+    Convert the messages of a chat turn into session_chats rows.
+
+    Args:
+        session_id (UUID): The ID of the session.
+        latest_message (List): The messages returned by `extract_latest_messages`.
+        result_handles (Optional[List[str]]): Handles of the query results stored during the turn;
+            the last one is referenced by the turn's final message.
+
+    Returns:
+        List[dict]: Rows ready for a bulk insert into session_chats.
+    """
+    
+    last_handle = result_handles[-1] if result_handles else None
+    
+    # one timestamp per turn, a microsecond apart per row, so reads ordered by
+    # created_at return the messages in the order of the turn
+    turn_time = datetime.utcnow()
+    
+    conversation_history_trs = []
+    for index, message in enumerate(latest_message):
+        role = None
+        message_content = ""
+        
+        # Determine role and content based on message type
+        if hasattr(message, 'type'):
+            if message.type == 'human':
                 role = MessageRole.USER
-            elif type(message).__name__ == 'AIMessage':
+            elif message.type == 'ai':
                 role = MessageRole.ASSISTANT
-            elif type(message).__name__ == 'SystemMessage':
+            elif message.type == 'system':
                 role = MessageRole.SYSTEM
-            elif type(message).__name__ == 'ToolMessage':
+            elif message.type == 'tool':
                 role = MessageRole.TOOL
+        elif type(message).__name__ == 'HumanMessage':
+            role = MessageRole.USER
+        elif type(message).__name__ == 'AIMessage':
+            role = MessageRole.ASSISTANT
+        elif type(message).__name__ == 'SystemMessage':
+            role = MessageRole.SYSTEM
+        elif type(message).__name__ == 'ToolMessage':
+            role = MessageRole.TOOL
 
-            # Get message content
-            if hasattr(message, 'content') and message.content:
-                message_content = message.content
-            elif hasattr(message, 'name') and message.name:
-                message_content = message.name
-            else:
-                message_content = str(message)
-            
-            # Skip if we couldn't determine the role
-            if not role:
-                continue
-            
-            # create a new session chat entry
-            conversation_history_trs.append(SessionChat(
-                session_id=session_id,
-                message=message_content,
-                role=role,
-                is_final_message= (index == (len(latest_message) - 1) or index == 0 )
-            ))
-
-        # add to the session
-        session.add_all(conversation_history_trs)
-
-        # commit the changes
-        session.commit()
+        # Get message content
+        if hasattr(message, 'content') and message.content:
+            message_content = message.content
+        elif hasattr(message, 'name') and message.name:
+            message_content = message.name
+        else:
+            message_content = str(message)
+        
+        # Skip if we couldn't determine the role
+        if not role:
+            continue
+        
+        # create a new session chat row
+        now = turn_time + timedelta(microseconds=len(conversation_history_trs))
+        conversation_history_trs.append({
+            "id": uuid4(),
+            "session_id": session_id,
+            "message": message_content,
+            "role": role,
+            "is_final_message": (index == (len(latest_message) - 1) or index == 0 ),
+            "result_handle": last_handle if index == len(latest_message) - 1 else None,
+            "created_at": now,
+            "updated_at": now,
+        })
+
+    return conversation_history_trs
+
+async def save_latest_messages(session_id: UUID, latest_message: List, result_handles: Optional[List[str]] = None):
+    """
+    Persist the messages of a chat turn.
+
+    In "async" persistence mode the rows are handed to the write-behind queue
+    and written in the background; otherwise, or when the queue is full, they
+    are inserted and committed before returning.
+
+    Args:
+        session_id (UUID): The ID of the session.
+        latest_message (List): The messages returned by `extract_latest_messages`.
+        result_handles (Optional[List[str]]): Handles of the query results stored during the turn.
+    """
+    
+    rows = build_message_rows(session_id, latest_message, result_handles)
+    if not rows:
+        return
+    
+    if config["CHAT_PERSISTENCE_MODE"] == "async" and chat_write_behind.enqueue(rows):
+        return
+    
+    # insert the new messages into the session chat in one round trip
+    async with async_engine.begin() as conn:
+        await conn.execute(insert(SessionChat.__table__), rows)
+
+async def checkpoint_turn(session_id: UUID, result: dict):
+    """
+    Prune the checkpoints of a finished turn, or drop the session's checkpoint
+    when its messages outgrew the history token budget or message limit, so
+    the next turn is rebuilt (and summarized) from the stored messages.
+
+    Args:
+        session_id (UUID): The ID of the session.
+        result (dict): The final supervisor state.
+    """
+    if chat_checkpointer is None:
+        return
+    
+    try:
+        messages = (result or {}).get("messages", [])
+        tokens = sum(message_tokens(str(message.content)) for message in messages)
+        
+        # the state also holds the hand-off messages, about half of every turn
+        if tokens > config["HISTORY_TOKEN_BUDGET"] or len(messages) > 2 * config["HISTORY_MAX_MESSAGES"]:
+            await chat_checkpointer.adelete_thread(session_id)
+            logger.info({
+                "action": "checkpoint_turn - reset",
+                "session_id": str(session_id),
+                "messages": len(messages),
+                "history_tokens": tokens,
+                "token_budget": config["HISTORY_TOKEN_BUDGET"],
+            })
+        else:
+            await chat_checkpointer.aprune(session_id)
+    except Exception as e:
+        logger.error({
+            "action": "checkpoint_turn - error",
+            "session_id": str(session_id),
+            "error": str(e)
+        })
+
+@asynccontextmanager
+async def discard_checkpoint_on_error(session_id: UUID) -> AsyncIterator[None]:
+    """
+    Drop the session's checkpoint when the wrapped part of a turn fails, then
+    re-raise. A failed run still checkpoints its partial state, and a turn
+    whose messages were not stored must not be resumed from it; the next
+    turn is rebuilt from the stored messages instead.
+
+    Args:
+        session_id (UUID): The ID of the session.
+    """
+    try:
+        yield
+    except BaseException:
+        if chat_checkpointer is not None:
+            try:
+                await chat_checkpointer.adelete_thread(session_id)
+                logger.info({
+                    "action": "discard_checkpoint_on_error - discarded",
+                    "session_id": str(session_id),
+                })
+            except Exception as e:
+                logger.error({
+                    "action": "discard_checkpoint_on_error - error",
+                    "session_id": str(session_id),
+                    "error": str(e)
+                })
+        raise
+
+def log_llm_cache_usage(action: str, session_id: UUID, cache_stats: dict):
+    """
+    Log the LLM cache hit rate and tokens saved for one chat turn.
+    """
+    if llm_cache is None:
+        return
+
+    lookups = cache_stats["hits"] + cache_stats["misses"]
+    logger.info({
+        "action": action,
+        "session_id": str(session_id),
+        "llm_cache_hits": cache_stats["hits"],
+        "llm_cache_misses": cache_stats["misses"],
+        "llm_cache_hit_rate": cache_stats["hits"] / lookups if lookups else 0.0,
+        "llm_tokens_saved": cache_stats["tokens_saved"],
+    })
+
+def log_token_usage(action: str, session_id: UUID, token_usage: TokenUsageCallback):
+    """
+    Log the LLM calls and prompt/completion tokens spent on one chat turn.
+    """
+    logger.info({
+        "action": action,
+        "session_id": str(session_id),
+        **token_usage.stats(),
+    })
+
+async def user_chat_controller(session_id: UUID, query: str):
+    """
+    Run a database query within the context of a session.
+
+    Args:
+        session_id (UUID): The ID of the session.
+        query (str): The SQL query to execute.
+
+    Returns:
+        The result of the query execution.
+
+    Raises:
+        AdmissionRejected: If the turn is refused by admission control.
+    """
+    
+    cache_stats = start_llm_cache_request()
+    result_handles = start_result_handles()
+    sql_plan = start_sql_plan(query)
+    token_usage = TokenUsageCallback()
+    
+    with stage_timer("history_load"):
+        old_conversation_history, conversation_history = await load_conversation_history(session_id, query)
+    
+    # generate a unique thread ID for the conversation
+    config = {"configurable": {"thread_id": str(session_id)}, "callbacks": [token_usage, *stage_timing_callbacks()]}
+    
+    # Invoke supervisor with conversation history once admitted; only the final state of the turn is checkpointed
+    supervisor = await aget_supervisor()
+    async with admit_turn(), discard_checkpoint_on_error(session_id):
+        with stage_timer("supervisor"), route_timer():
+            result = await supervisor.ainvoke(
+                {"messages": conversation_history}, 
+                config=config,
+                checkpoint_during=False,
+            )
+    
+    async with discard_checkpoint_on_error(session_id):
+        latest_message = extract_latest_messages(result, old_conversation_history, conversation_history)
+        
+        with stage_timer("persistence"):
+            await save_latest_messages(session_id, latest_message, result_handles)
+    
+    with stage_timer("checkpoint"):
+        await checkpoint_turn(session_id, result)
+
+    with stage_timer("sql_plan"):
+        await store_turn_sql_plan(sql_plan)
+    
+    log_llm_cache_usage("user_chat_controller - llm_cache", session_id, cache_stats)
+    log_token_usage("user_chat_controller - token_usage", session_id, token_usage)
     
     # return the latest message content
     return latest_message[-1].content if latest_message else "No response generated."
@@ -0,0 +1,159 @@
+import json
+from typing import AsyncIterator
+from uuid import UUID
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import ArgumentError
+
+from app.agents import aget_supervisor
+from app.agents.chat_agent.router import route_timer
+from app.db import start_result_handles
+from app.agents.db_agent.tools import start_sql_plan, store_turn_sql_plan
+from app.helper import logger, start_llm_cache_request, TokenUsageCallback, stage_timer, stage_timing_callbacks, AdmissionRejected
+from .user_chat import admit_turn, discard_checkpoint_on_error, load_conversation_history, extract_latest_messages, save_latest_messages, checkpoint_turn, log_llm_cache_usage, log_token_usage
+
+# graph nodes reported as agent hand-offs
+AGENT_NAMES = {"supervisor", "db_assistant", "graph_generation_agent"}
+
+# tool outputs are truncated in tool_end events, the full data stays in the final answer
+MAX_TOOL_OUTPUT_CHARS = 2000
+
+# arguments injected by the graph rather than chosen by the model
+INJECTED_TOOL_ARGS = {"state", "tool_call_id"}
+
+def public_tool_input(tool_input: dict) -> dict:
+    """
+    Drop graph-injected arguments and hide connection URL passwords from tool input.
+    """
+    public = {}
+    for key, value in (tool_input or {}).items():
+        if key in INJECTED_TOOL_ARGS:
+            continue
+        if key == "db_connection_url":
+            try:
+                value = make_url(value).render_as_string(hide_password=True)
+            except ArgumentError:
+                value = "***"
+        public[key] = value
+    return public
+
+def format_sse(event: str, data: dict) -> str:
+    """
+    Format a server-sent event.
+
+    Args:
+        event (str): The event name.
+        data (dict): JSON-serializable event payload.
+
+    Returns:
+        str: The encoded event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def user_chat_stream_controller(session_id: UUID, query: str) -> AsyncIterator[str]:
+    """
+    Run a chat turn and stream its progress as server-sent events.
+
+    Emits `agent` when control moves to another agent, `token` for every LLM
+    token, `tool_start`/`tool_end` around tool calls, `final` with the answer
+    and the handles of query results stored for download once the new
+    messages are persisted, and `error` if the turn fails (with `retry_after`
+    seconds when admission control refused it).
+
+    Args:
+        session_id (UUID): The ID of the session.
+        query (str): The user's message.
+
+    Yields:
+        str: Encoded server-sent events.
+    """
+    cache_stats = start_llm_cache_request()
+    result_handles = start_result_handles()
+    sql_plan = start_sql_plan(query)
+    token_usage = TokenUsageCallback()
+
+    try:
+        with stage_timer("history_load"):
+            old_conversation_history, conversation_history = await load_conversation_history(session_id, query)
+    except ValueError as e:
+        yield format_sse("error", {"message": str(e)})
+        return
+
+    config = {"configurable": {"thread_id": str(session_id)}, "callbacks": [token_usage, *stage_timing_callbacks()]}
+
+    current_agent = None
+    result = None
+
+    try:
+        supervisor = await aget_supervisor()
+        async with admit_turn(), discard_checkpoint_on_error(session_id):
+            with route_timer():
+                async for event in supervisor.astream_events(
+                    {"messages": conversation_history},
+                    config=config,
+                    version="v2",
+                    checkpoint_during=False,
+                ):
+                    kind = event["event"]
+                    name = event.get("name")
+
+                    if kind == "on_chain_start" and name in AGENT_NAMES and name != current_agent:
+                        yield format_sse("agent", {"from": current_agent, "to": name})
+                        current_agent = name
+
+                    elif kind == "on_chat_model_stream":
+                        chunk = event["data"].get("chunk")
+                        if chunk is not None and chunk.content:
+                            yield format_sse("token", {"agent": current_agent, "content": chunk.content})
+
+                    elif kind == "on_tool_start":
+                        yield format_sse("tool_start", {
+                            "agent": current_agent,
+                            "tool": name,
+                            "run_id": event["run_id"],
+                            "input": public_tool_input(event["data"].get("input")),
+                        })
+
+                    elif kind == "on_tool_end":
+                        output = event["data"].get("output")
+                        output = getattr(output, "content", output)
+                        yield format_sse("tool_end", {
+                            "agent": current_agent,
+                            "tool": name,
+                            "run_id": event["run_id"],
+                            "output": str(output)[:MAX_TOOL_OUTPUT_CHARS],
+                        })
+
+                    elif kind == "on_chain_end" and not event.get("parent_ids"):
+                        # the root graph finished, its output is the final state
+                        result = event["data"].get("output")
+
+        async with discard_checkpoint_on_error(session_id):
+            latest_message = extract_latest_messages(result, old_conversation_history, conversation_history)
+
+            with stage_timer("persistence"):
+                await save_latest_messages(session_id, latest_message, result_handles)
+
+        with stage_timer("checkpoint"):
+            await checkpoint_turn(session_id, result)
+
+        with stage_timer("sql_plan"):
+            await store_turn_sql_plan(sql_plan)
+
+        log_llm_cache_usage("user_chat_stream_controller - llm_cache", session_id, cache_stats)
+        log_token_usage("user_chat_stream_controller - token_usage", session_id, token_usage)
+
+        yield format_sse("final", {
+            "content": latest_message[-1].content if latest_message else "No response generated.",
+            "result_handles": result_handles,
+        })
+
+    except AdmissionRejected as e:
+        yield format_sse("error", {"message": str(e), "retry_after": e.retry_after})
+
+    except Exception as e:
+        logger.error({
+            "action": "user_chat_stream_controller - error",
+            "session_id": str(session_id),
+            "error": str(e)
+        })
+        yield format_sse("error", {"message": str(e)})
@@ -1,12 +1,14 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Optional
 from uuid import UUID
 
-from .functions import user_chat_controller
+from .functions import user_chat_controller, user_chat_stream_controller, get_chat_history_controller, ChatHistoryPage, InvalidHistoryCursorError, get_chat_persistence_stats_controller
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
 @router.get("")
-def chat_route(session_id: UUID, query: str):
+async def chat_route(session_id: UUID, query: str):
     """Route to handle chat queries.
     Args:
         session_id (UUID): The ID of the session.
@@ -14,4 +16,42 @@ def chat_route(session_id: UUID, query: str):
     Returns:
         The response from the chat controller.
     """
-    return user_chat_controller(session_id, query)
+    return await user_chat_controller(session_id, query)
+
+@router.get("/stream")
+async def chat_stream_route(session_id: UUID, query: str):
+    """Route to handle chat queries with a server-sent events response.
+    Args:
+        session_id (UUID): The ID of the session.
+        query (str): The chat query to process.
+    Returns:
+        A stream of agent, token, tool_start, tool_end, final and error events.
+    """
+    return StreamingResponse(
+        user_chat_stream_controller(session_id, query),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/history", response_model=ChatHistoryPage)
+async def chat_history_route(session_id: UUID, limit: int = 50, cursor: Optional[str] = None):
+    """Route to page through the messages of a session, newest first.
+    Args:
+        session_id (UUID): The ID of the session.
+        limit (int): Number of messages per page (at most 200).
+        cursor (Optional[str]): The next_cursor returned with the previous page.
+    Returns:
+        The response from the chat history controller.
+    """
+    try:
+        return await get_chat_history_controller(session_id, limit, cursor)
+    except InvalidHistoryCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/persistence/stats")
+def chat_persistence_stats_route():
+    """Route to get the chat persistence mode, write-behind queue depth and flush latency.
+    Returns:
+        The response from the chat persistence stats controller.
+    """
+    return get_chat_persistence_stats_controller()
@@ -0,0 +1 @@
+from .get_metrics import get_metrics_controller
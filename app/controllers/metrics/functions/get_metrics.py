@@ -0,0 +1,52 @@
+from app.db import engine_registry, chat_write_behind, chat_checkpointer, result_store
+from app.agents.db_agent.tools import schema_cache, query_cache, sql_plan_cache
+from app.agents.chat_agent.router import router_stats
+from app.helper import llm_cache, metrics_registry, stats_metrics, turn_admission, provider_limits, logging_stats
+
+def _component_stats():
+    engines = engine_registry.stats()
+    engines.pop("per_engine", None)
+
+    # keys not listed as gauges are cumulative and exported as `_total` counters
+    samples = [
+        *stats_metrics("db_agent_target_engines", engines, "Target database engine registry",
+                       gauges=("engines", "active_queries")),
+        *stats_metrics("db_agent_schema_cache", schema_cache.stats(), "Schema cache",
+                       gauges=("entries", "hit_rate")),
+        *stats_metrics("db_agent_query_cache", query_cache.stats(), "Query result cache",
+                       gauges=("entries", "bytes", "hit_rate")),
+        *stats_metrics("db_agent_sql_plan_cache", sql_plan_cache.stats(), "SQL plan cache",
+                       gauges=("entries", "hit_rate")),
+        *stats_metrics("db_agent_chat_write_behind", chat_write_behind.stats(), "Chat write-behind queue",
+                       gauges=("queue_depth", "last_flush_seconds", "max_flush_seconds", "avg_flush_seconds")),
+        *stats_metrics("db_agent_result_store", result_store.stats(), "Query result store"),
+        *stats_metrics("db_agent_router", router_stats.stats(), "Chat fast-path router",
+                       gauges=("fast_path_hit_rate",)),
+        *stats_metrics("db_agent_turn_admission", turn_admission.stats(), "Chat turn admission control",
+                       gauges=("active", "peak", "queued", "users_waiting", "wait_max_seconds")),
+        *stats_metrics("db_agent_llm_admission", provider_limits.stats(), "LLM provider call slots",
+                       gauges=("active", "queued")),
+        *stats_metrics("db_agent_logging", logging_stats(), "Log queue",
+                       gauges=("queued",)),
+    ]
+
+    if chat_checkpointer is not None:
+        samples.extend(stats_metrics("db_agent_checkpointer", chat_checkpointer.stats(), "Chat supervisor checkpointer"))
+
+    # the LLM response cache only exists when it is enabled
+    if llm_cache is not None:
+        samples.extend(stats_metrics("db_agent_llm_cache", llm_cache.stats(), "LLM response cache",
+                                     gauges=("entries", "hit_rate")))
+
+    return samples
+
+metrics_registry.register_collector(_component_stats)
+
+def get_metrics_controller() -> str:
+    """
+    Controller function to render the in-process metrics and the cache, pool
+    and write-behind counters in the Prometheus text exposition format.
+    Returns:
+        str: The metrics exposition.
+    """
+    return metrics_registry.render()
@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from .functions import get_metrics_controller
+
+router = APIRouter(tags=["Metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics_route():
+    """Route to scrape the application metrics in the Prometheus text format.
+    Returns:
+        The metrics exposition.
+    """
+    return PlainTextResponse(get_metrics_controller(), media_type="text/plain; version=0.0.4; charset=utf-8")
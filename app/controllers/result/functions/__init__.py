@@ -0,0 +1 @@
+from .download_result import *
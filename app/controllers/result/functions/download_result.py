@@ -0,0 +1,116 @@
+import re
+from typing import Iterator, Optional, Tuple
+from pydantic import BaseModel
+
+from app.constants import config
+from app.db import result_store
+from app.helper import logger
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+class ResultNotFoundError(ValueError):
+    """Raised when a result handle is unknown or has expired."""
+
+class RangeNotSatisfiableError(ValueError):
+    """Raised when a requested byte range lies outside the stored result."""
+
+    def __init__(self, size: int):
+        super().__init__(f"Requested range is not satisfiable for a result of {size} bytes.")
+        self.size = size
+
+class ResultDownload(BaseModel):
+    """
+    A byte range of a stored result, ready to be streamed.
+    """
+    handle: str
+    start: int
+    end: int
+    size: int
+    partial: bool
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range: bytes=...` header.
+
+    Args:
+        range_header (Optional[str]): The header value.
+        size (int): Size of the stored result in bytes.
+    Returns:
+        Optional[Tuple[int, int]]: The inclusive byte range, or None to send the whole result
+        (no header, or a form that is not supported such as multiple ranges).
+    Raises:
+        RangeNotSatisfiableError: If the range starts past the end of the result.
+    """
+    if not range_header:
+        return None
+
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiableError(size)
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiableError(size)
+    return start, min(end, size - 1)
+
+def get_result_meta_controller(handle: str) -> dict:
+    """
+    Controller function to describe a stored query result.
+    Args:
+        handle (str): The result handle reported by run_query.
+    Returns:
+        dict: The columns, column types, row count, size in bytes and whether the row or byte limit of the store cut it off.
+    Raises:
+        ResultNotFoundError: If the handle is unknown or has expired.
+    """
+    meta = result_store.meta(handle)
+    if meta is None:
+        raise ResultNotFoundError(f"Result {handle} not found.")
+    return meta
+
+def prepare_result_download_controller(handle: str, range_header: Optional[str] = None) -> ResultDownload:
+    """
+    Controller function to resolve the byte range of a stored result to send.
+    Args:
+        handle (str): The result handle reported by run_query.
+        range_header (Optional[str]): The request's Range header.
+    Returns:
+        ResultDownload: The range to stream and whether it is a partial response.
+    Raises:
+        ResultNotFoundError: If the handle is unknown or has expired.
+        RangeNotSatisfiableError: If the range lies outside the result.
+    """
+    meta = get_result_meta_controller(handle)
+    size = meta["bytes"]
+
+    byte_range = parse_range(range_header, size)
+    start, end = byte_range if byte_range is not None else (0, size - 1)
+
+    logger.info({
+        "action": "prepare_result_download_controller",
+        "handle": handle,
+        "start": start,
+        "end": end,
+        "size": size,
+    })
+
+    return ResultDownload(handle=handle, start=start, end=end, size=size, partial=byte_range is not None)
+
+def stream_result_controller(download: ResultDownload) -> Iterator[bytes]:
+    """
+    Controller function to stream a byte range of a stored result in chunks read from a memory map.
+    Args:
+        download (ResultDownload): The range returned by `prepare_result_download_controller`.
+    Yields:
+        bytes: Chunks of at most RESULT_STORE_CHUNK_BYTES bytes.
+    """
+    yield from result_store.read_range(download.handle, download.start, download.end, config["RESULT_STORE_CHUNK_BYTES"])
@@ -0,0 +1,51 @@
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
+
+from .functions import get_result_meta_controller, prepare_result_download_controller, stream_result_controller, ResultNotFoundError, RangeNotSatisfiableError
+
+router = APIRouter(prefix="/result", tags=["Result"])
+
+@router.get("/{handle}/meta")
+def get_result_meta_route(handle: str):
+    """Route to describe a stored query result.
+    Args:
+        handle (str): The result handle reported by run_query.
+    Returns:
+        The response from the result meta controller.
+    """
+    try:
+        return get_result_meta_controller(handle)
+    except ResultNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/{handle}")
+def download_result_route(handle: str, range: Optional[str] = Header(default=None)):
+    """Route to download a stored query result as CSV, with support for single byte ranges.
+    Args:
+        handle (str): The result handle reported by run_query.
+        range (Optional[str]): The Range header, e.g. "bytes=0-1048575".
+    Returns:
+        The CSV bytes, 206 with Content-Range for range requests.
+    """
+    try:
+        download = prepare_result_download_controller(handle, range)
+    except ResultNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RangeNotSatisfiableError as e:
+        raise HTTPException(status_code=416, detail=str(e), headers={"Content-Range": f"bytes */{e.size}"})
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(download.end - download.start + 1 if download.size else 0),
+        "Content-Disposition": f'attachment; filename="{handle}.csv"',
+    }
+    if download.partial:
+        headers["Content-Range"] = f"bytes {download.start}-{download.end}/{download.size}"
+
+    return StreamingResponse(
+        stream_result_controller(download),
+        status_code=206 if download.partial else 200,
+        media_type="text/csv",
+        headers=headers,
+    )
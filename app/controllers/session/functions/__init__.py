@@ -1,2 +1,5 @@
 from .create_session import *
 from .get_user_session import *
+from .invalidate_schema_cache import *
+from .query_cache import *
+from .query_guard import *
@@ -31,7 +31,8 @@ def create_session_controller(payload: CreateSessionPayload) -> UUID:
     try:
         logger.info({
             "action": "create_session_controller",
-            "payload": payload.dict()
+            # serialized by the log writer, off the request path
+            "payload": payload
         })
         
         # Create a new session instance
@@ -0,0 +1,69 @@
+from uuid import UUID
+from sqlmodel import Session, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models import Session as UserSession
+from app.db import engine
+from app.helper import logger
+from app.agents.db_agent.tools import schema_cache
+
+def invalidate_session_schema_controller(session_id: UUID) -> dict:
+    """
+    Controller function to drop the cached database schema of a session so the
+    next fetch_schema call re-inspects the database.
+    Args:
+        session_id (UUID): The ID of the session whose schema cache is invalidated.
+    Returns:
+        dict: The session ID and the number of cache entries removed.
+    Raises:
+        ValueError: If the session does not exist.
+        SQLAlchemyError: If there is an error during the database operation.
+        Exception: For any other unexpected errors.
+    """
+    try:
+        logger.info({
+            "action": "invalidate_session_schema_controller",
+            "session_id": str(session_id)
+        })
+
+        with Session(engine) as session:
+            chat_session = session.exec(
+                select(UserSession).where(UserSession.id == session_id)
+            ).first()
+
+        if not chat_session:
+            raise ValueError(f"Session with ID {session_id} not found.")
+
+        removed = schema_cache.invalidate(chat_session.db_connection_url)
+
+        logger.info({
+            "action": "invalidate_session_schema_controller - success",
+            "session_id": str(session_id),
+            "removed": removed
+        })
+
+        return {"session_id": session_id, "removed": removed}
+
+    except SQLAlchemyError as e:
+        logger.error({
+            "action": "invalidate_session_schema_controller - error",
+            "session_id": str(session_id),
+            "error": str(e)
+        })
+        raise e
+
+    except Exception as e:
+        logger.error({
+            "action": "invalidate_session_schema_controller - unexpected error",
+            "session_id": str(session_id),
+            "error": str(e)
+        })
+        raise e
+
+def get_schema_cache_stats_controller() -> dict:
+    """
+    Controller function to report schema cache hit, miss and rebuild counters.
+    Returns:
+        dict: The current schema cache statistics.
+    """
+    return schema_cache.stats()
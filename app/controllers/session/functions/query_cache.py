@@ -0,0 +1,127 @@
+from typing import Optional
+from uuid import UUID
+from pydantic import BaseModel
+from sqlmodel import Session, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models import Session as UserSession
+from app.db import engine
+from app.helper import logger
+from app.agents.db_agent.tools import query_cache
+
+class QueryCacheTTLPayload(BaseModel):
+    """
+    Payload for overriding the run_query result cache TTL of a session's database.
+    A TTL of 0 disables result caching, null restores the default.
+    """
+    ttl_seconds: Optional[float] = None
+
+def _get_session_db_url(session_id: UUID) -> str:
+    with Session(engine) as session:
+        chat_session = session.exec(
+            select(UserSession).where(UserSession.id == session_id)
+        ).first()
+
+    if not chat_session:
+        raise ValueError(f"Session with ID {session_id} not found.")
+
+    return chat_session.db_connection_url
+
+def set_session_query_cache_ttl_controller(session_id: UUID, payload: QueryCacheTTLPayload) -> dict:
+    """
+    Controller function to override the result cache TTL for the database of a session.
+    Args:
+        session_id (UUID): The ID of the session.
+        payload (QueryCacheTTLPayload): The new TTL in seconds.
+    Returns:
+        dict: The session ID and the TTL now in effect.
+    Raises:
+        ValueError: If the session does not exist or the TTL is negative.
+        SQLAlchemyError: If there is an error during the database operation.
+        Exception: For any other unexpected errors.
+    """
+    try:
+        logger.info({
+            "action": "set_session_query_cache_ttl_controller",
+            "session_id": str(session_id),
+            "ttl_seconds": payload.ttl_seconds
+        })
+
+        if payload.ttl_seconds is not None and payload.ttl_seconds < 0:
+            raise ValueError("ttl_seconds must not be negative.")
+
+        db_connection_url = _get_session_db_url(session_id)
+        query_cache.set_ttl(db_connection_url, payload.ttl_seconds)
+
+        if payload.ttl_seconds == 0:
+            query_cache.invalidate(db_connection_url)
+
+        return {"session_id": session_id, "ttl_seconds": query_cache.ttl(db_connection_url)}
+
+    except SQLAlchemyError as e:
+        logger.error({
+            "action": "set_session_query_cache_ttl_controller - error",
+            "session_id": str(session_id),
+            "error": str(e)
+        })
+        raise e
+
+    except Exception as e:
+        logger.error({
+            "action": "set_session_query_cache_ttl_controller - unexpected error",
+            "session_id": str(session_id),
+            "error": str(e)
+        })
+        raise e
+
+def invalidate_session_query_cache_controller(session_id: UUID) -> dict:
+    """
+    Controller function to drop the cached run_query results of a session's database.
+    Args:
+        session_id (UUID): The ID of the session whose cached results are dropped.
+    Returns:
+        dict: The session ID and the number of cache entries removed.
+    Raises:
+        ValueError: If the session does not exist.
+        SQLAlchemyError: If there is an error during the database operation.
+        Exception: For any other unexpected errors.
+    """
+    try:
+        logger.info({
+            "action": "invalidate_session_query_cache_controller",
+            "session_id": str(session_id)
+        })
+
+        removed = query_cache.invalidate(_get_session_db_url(session_id))
+
+        logger.info({
+            "action": "invalidate_session_query_cache_controller - success",
+            "session_id": str(session_id),
+            "removed": removed
+        })
+
+        return {"session_id": session_id, "removed": removed}
+
+    except SQLAlchemyError as e:
+        logger.error({
+            "action": "invalidate_session_query_cache_controller - error",
+            "session_id": str(session_id),
+            "error": str(e)
+        })
+        raise e
+
+    except Exception as e:
+        logger.error({
+            "action": "invalidate_session_query_cache_controller - unexpected error",
+            "session_id": str(session_id),
+            "error": str(e)
+        })
+        raise e
+
+def get_query_cache_stats_controller() -> dict:
+    """
+    Controller function to report run_query result cache counters.
+    Returns:
+        dict: The current result cache statistics.
+    """
+    return query_cache.stats()
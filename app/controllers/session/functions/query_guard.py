@@ -0,0 +1,77 @@
+from typing import Optional
+from uuid import UUID
+from pydantic import BaseModel
+from sqlmodel import Session, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models import Session as UserSession
+from app.db import engine
+from app.helper import logger
+from app.agents.db_agent.tools import query_guard_limits
+
+class QueryGuardPayload(BaseModel):
+    """
+    Payload for the run_query guard thresholds of a session.
+    A null value restores the configured default.
+    """
+    max_cost: Optional[float] = None
+    max_plan_rows: Optional[int] = None
+    statement_timeout_ms: Optional[int] = None
+
+def set_session_query_guard_controller(session_id: UUID, payload: QueryGuardPayload) -> dict:
+    """
+    Controller function to set the EXPLAIN cost, row estimate and statement timeout
+    thresholds applied to queries the agent runs for a session.
+    Args:
+        session_id (UUID): The ID of the session.
+        payload (QueryGuardPayload): The new thresholds.
+    Returns:
+        dict: The session ID and the thresholds now in effect.
+    Raises:
+        ValueError: If the session does not exist or a threshold is negative.
+        SQLAlchemyError: If there is an error during the database operation.
+        Exception: For any other unexpected errors.
+    """
+    try:
+        logger.info({
+            "action": "set_session_query_guard_controller",
+            "session_id": str(session_id),
+            **payload.model_dump()
+        })
+
+        if any(value is not None and value < 0 for value in payload.model_dump().values()):
+            raise ValueError("Query guard thresholds must not be negative.")
+
+        with Session(engine) as session:
+            chat_session = session.exec(
+                select(UserSession).where(UserSession.id == session_id)
+            ).first()
+
+            if not chat_session:
+                raise ValueError(f"Session with ID {session_id} not found.")
+
+            chat_session.query_max_cost = payload.max_cost
+            chat_session.query_max_plan_rows = payload.max_plan_rows
+            chat_session.query_statement_timeout_ms = payload.statement_timeout_ms
+            session.add(chat_session)
+            session.commit()
+
+        limits = query_guard_limits(payload.max_cost, payload.max_plan_rows, payload.statement_timeout_ms)
+
+        return {"session_id": session_id, **limits.model_dump()}
+
+    except SQLAlchemyError as e:
+        logger.error({
+            "action": "set_session_query_guard_controller - error",
+            "session_id": str(session_id),
+            "error": str(e)
+        })
+        raise e
+
+    except Exception as e:
+        logger.error({
+            "action": "set_session_query_guard_controller - unexpected error",
+            "session_id": str(session_id),
+            "error": str(e)
+        })
+        raise e
@@ -1,5 +1,6 @@
 from fastapi import APIRouter
-from .functions import create_session_controller, CreateSessionPayload, get_user_session_controller
+from uuid import UUID
+from .functions import create_session_controller, CreateSessionPayload, get_user_session_controller, invalidate_session_schema_controller, get_schema_cache_stats_controller, QueryCacheTTLPayload, set_session_query_cache_ttl_controller, invalidate_session_query_cache_controller, get_query_cache_stats_controller, QueryGuardPayload, set_session_query_guard_controller
 
 router = APIRouter(prefix="/session", tags=["Session"])
 
@@ -14,6 +15,70 @@ def create_session_route(session_data: CreateSessionPayload):
 
     return create_session_controller(session_data)
 
+@router.get("/schema-cache/stats")
+def get_schema_cache_stats_route():
+    """Route to get schema cache hit, miss and rebuild counters.
+    Returns:
+        The response from the schema cache stats controller.
+    """
+
+    return get_schema_cache_stats_controller()
+
+@router.post("/{session_id}/schema-cache/invalidate")
+def invalidate_session_schema_route(session_id: UUID):
+    """Route to drop the cached database schema of a session.
+    Args:
+        session_id (UUID): The ID of the session whose cached schema is dropped.
+    Returns:
+        The response from the schema cache invalidation controller.
+    """
+
+    return invalidate_session_schema_controller(session_id)
+
+@router.get("/query-cache/stats")
+def get_query_cache_stats_route():
+    """Route to get run_query result cache hit, miss and eviction counters.
+    Returns:
+        The response from the query cache stats controller.
+    """
+
+    return get_query_cache_stats_controller()
+
+@router.put("/{session_id}/query-cache/ttl")
+def set_session_query_cache_ttl_route(session_id: UUID, payload: QueryCacheTTLPayload):
+    """Route to override the result cache TTL for the database of a session.
+    Args:
+        session_id (UUID): The ID of the session.
+        payload (QueryCacheTTLPayload): The new TTL in seconds.
+    Returns:
+        The response from the query cache TTL controller.
+    """
+
+    return set_session_query_cache_ttl_controller(session_id, payload)
+
+@router.post("/{session_id}/query-cache/invalidate")
+def invalidate_session_query_cache_route(session_id: UUID):
+    """Route to drop the cached query results of a session's database.
+    Args:
+        session_id (UUID): The ID of the session whose cached results are dropped.
+    Returns:
+        The response from the query cache invalidation controller.
+    """
+
+    return invalidate_session_query_cache_controller(session_id)
+
+@router.put("/{session_id}/query-guard")
+def set_session_query_guard_route(session_id: UUID, payload: QueryGuardPayload):
+    """Route to set the query cost, row estimate and statement timeout thresholds of a session.
+    Args:
+        session_id (UUID): The ID of the session.
+        payload (QueryGuardPayload): The new thresholds.
+    Returns:
+        The response from the query guard controller.
+    """
+
+    return set_session_query_guard_controller(session_id, payload)
+
 @router.get("/{user_id}")
 def get_user_session_route(user_id: str):
     """Route to get all sessions for a user.
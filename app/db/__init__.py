@@ -1 +1,5 @@
 from .connection import *
+from .engine_registry import engine_registry, EngineRegistry
+from .write_behind import chat_write_behind, ChatWriteBehind
+from .result_store import result_store, ResultStore, start_result_handles, record_result_handle
+from .checkpointer import chat_checkpointer, SQLCheckpointSaver
@@ -0,0 +1,480 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from sqlalchemy import delete, event, func, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import SQLModel, create_engine
+
+from app.constants import config
+from app.helper import logger, record_stage
+from app.models import chat_checkpoints, chat_checkpoint_blobs, chat_checkpoint_writes
+from .connection import engine, async_engine
+
+CHECKPOINT_TABLES = [chat_checkpoints, chat_checkpoint_blobs, chat_checkpoint_writes]
+
+def _insert(conn: Connection, table):
+    # both dialects share the ON CONFLICT API
+    dialect = postgresql if conn.dialect.name == "postgresql" else sqlite
+    return dialect.insert(table)
+
+class SQLCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpoint saver backed by SQL tables on the application
+    database (PostgreSQL) or a local SQLite file.
+
+    Channel values are stored apart from the checkpoints and only written when
+    their version changes, so a checkpoint after a chat turn writes the new
+    messages channel once instead of the whole graph state per step. Async
+    methods use the async engine when one is given and run the sync methods
+    in a worker thread otherwise.
+    """
+
+    def __init__(self, engine: Engine, async_engine: Optional[AsyncEngine] = None, keep_last: int = 1, ttl: float = 604800, sweep_interval: float = 3600):
+        super().__init__()
+        self.engine = engine
+        self.async_engine = async_engine
+        self.keep_last = keep_last
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+        self.checkpoints_written = 0
+        self.blobs_written = 0
+        self.writes_written = 0
+        self.bytes_written = 0
+        self.checkpoints_loaded = 0
+        self.checkpoints_pruned = 0
+        self.threads_expired = 0
+
+    def setup(self):
+        """
+        Create the checkpoint tables if they do not exist (the PostgreSQL
+        application database gets them from the Alembic migrations).
+        """
+        SQLModel.metadata.create_all(self.engine, tables=CHECKPOINT_TABLES)
+
+    def _count(self, checkpoints: int = 0, blobs: int = 0, writes: int = 0, size: int = 0):
+        with self._lock:
+            self.checkpoints_written += checkpoints
+            self.blobs_written += blobs
+            self.writes_written += writes
+            self.bytes_written += size
+
+    def _run(self, method, *args):
+        with self.engine.begin() as conn:
+            return method(conn, *args)
+
+    async def _arun(self, method, *args):
+        if self.async_engine is None:
+            return await asyncio.to_thread(self._run, method, *args)
+
+        async with self.async_engine.begin() as conn:
+            return await conn.run_sync(method, *args)
+
+    # reads
+
+    def _load_tuple(self, conn: Connection, row) -> CheckpointTuple:
+        checkpoint: Checkpoint = self.serde.loads_typed((row.checkpoint_type, row.checkpoint))
+        versions = checkpoint["channel_versions"]
+
+        channel_values: Dict[str, Any] = {}
+        if versions:
+            blobs = conn.execute(
+                select(chat_checkpoint_blobs.c.channel, chat_checkpoint_blobs.c.type, chat_checkpoint_blobs.c.blob).where(
+                    chat_checkpoint_blobs.c.thread_id == row.thread_id,
+                    chat_checkpoint_blobs.c.checkpoint_ns == row.checkpoint_ns,
+                    tuple_(chat_checkpoint_blobs.c.channel, chat_checkpoint_blobs.c.version).in_(
+                        [(channel, str(version)) for channel, version in versions.items()]
+                    ),
+                )
+            )
+            for channel, value_type, blob in blobs:
+                if value_type != "empty":
+                    channel_values[channel] = self.serde.loads_typed((value_type, blob))
+
+        writes = conn.execute(
+            select(chat_checkpoint_writes.c.task_id, chat_checkpoint_writes.c.channel, chat_checkpoint_writes.c.type, chat_checkpoint_writes.c.blob)
+            .where(
+                chat_checkpoint_writes.c.thread_id == row.thread_id,
+                chat_checkpoint_writes.c.checkpoint_ns == row.checkpoint_ns,
+                chat_checkpoint_writes.c.checkpoint_id == row.checkpoint_id,
+            )
+            .order_by(chat_checkpoint_writes.c.task_id, chat_checkpoint_writes.c.idx)
+        )
+
+        with self._lock:
+            self.checkpoints_loaded += 1
+
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": row.thread_id, "checkpoint_ns": row.checkpoint_ns, "checkpoint_id": row.checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self.serde.loads_typed((row.metadata_type, row.metadata)),
+            parent_config=(
+                {"configurable": {"thread_id": row.thread_id, "checkpoint_ns": row.checkpoint_ns, "checkpoint_id": row.parent_checkpoint_id}}
+                if row.parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((value_type, blob))) for task_id, channel, value_type, blob in writes],
+        )
+
+    def _get_tuple(self, conn: Connection, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        statement = select(chat_checkpoints).where(
+            chat_checkpoints.c.thread_id == str(config["configurable"]["thread_id"]),
+            chat_checkpoints.c.checkpoint_ns == config["configurable"].get("checkpoint_ns", ""),
+        )
+
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id:
+            statement = statement.where(chat_checkpoints.c.checkpoint_id == checkpoint_id)
+        else:
+            statement = statement.order_by(chat_checkpoints.c.checkpoint_id.desc()).limit(1)
+
+        row = conn.execute(statement).first()
+        return self._load_tuple(conn, row) if row is not None else None
+
+    def _list(self, conn: Connection, config: Optional[RunnableConfig], filter: Optional[Dict[str, Any]], before: Optional[RunnableConfig], limit: Optional[int]) -> List[CheckpointTuple]:
+        statement = select(chat_checkpoints)
+        if config:
+            statement = statement.where(chat_checkpoints.c.thread_id == str(config["configurable"]["thread_id"]))
+            if config["configurable"].get("checkpoint_ns") is not None:
+                statement = statement.where(chat_checkpoints.c.checkpoint_ns == config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                statement = statement.where(chat_checkpoints.c.checkpoint_id == get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            statement = statement.where(chat_checkpoints.c.checkpoint_id < get_checkpoint_id(before))
+
+        # metadata is serialized, so its filter is applied after loading
+        if limit is not None and not filter:
+            statement = statement.limit(limit)
+
+        tuples = []
+        for row in conn.execute(statement.order_by(chat_checkpoints.c.checkpoint_id.desc())):
+            if limit is not None and len(tuples) >= limit:
+                break
+            if filter:
+                metadata = self.serde.loads_typed((row.metadata_type, row.metadata))
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            tuples.append(self._load_tuple(conn, row))
+        return tuples
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self._run(self._get_tuple, config)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await self._arun(self._get_tuple, config)
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        yield from self._run(self._list, config, filter, before, limit)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        for checkpoint_tuple in await self._arun(self._list, config, filter, before, limit):
+            yield checkpoint_tuple
+
+    def _has_thread(self, conn: Connection, thread_id: str) -> bool:
+        return conn.execute(
+            select(chat_checkpoints.c.checkpoint_id).where(
+                chat_checkpoints.c.thread_id == str(thread_id),
+                chat_checkpoints.c.checkpoint_ns == "",
+            ).limit(1)
+        ).first() is not None
+
+    async def ahas_thread(self, thread_id: str) -> bool:
+        """
+        Whether the thread has a checkpoint, without loading it.
+        """
+        return await self._arun(self._has_thread, thread_id)
+
+    # writes
+
+    def _put(self, conn: Connection, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        start = time.perf_counter()
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+
+        stored = checkpoint.copy()
+        values = stored.pop("channel_values")
+
+        blobs = []
+        for channel, version in new_versions.items():
+            value_type, blob = self.serde.dumps_typed(values[channel]) if channel in values else ("empty", None)
+            blobs.append({
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "channel": channel,
+                "version": str(version),
+                "type": value_type,
+                "blob": blob,
+            })
+        if blobs:
+            conn.execute(_insert(conn, chat_checkpoint_blobs).on_conflict_do_nothing(), blobs)
+
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(stored)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        row = {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint["id"],
+            "parent_checkpoint_id": config["configurable"].get("checkpoint_id"),
+            "checkpoint_type": checkpoint_type,
+            "checkpoint": checkpoint_blob,
+            "metadata_type": metadata_type,
+            "metadata": metadata_blob,
+            "created_at": datetime.utcnow(),
+        }
+        statement = _insert(conn, chat_checkpoints)
+        conn.execute(
+            statement.on_conflict_do_update(
+                index_elements=["thread_id", "checkpoint_ns", "checkpoint_id"],
+                set_={"checkpoint": statement.excluded.checkpoint, "metadata": statement.excluded.metadata},
+            ),
+            row,
+        )
+
+        self._count(
+            checkpoints=1,
+            blobs=len(blobs),
+            size=len(checkpoint_blob) + len(metadata_blob) + sum(len(blob["blob"] or b"") for blob in blobs),
+        )
+        record_stage("checkpoint_write", time.perf_counter() - start)
+
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def _put_writes(self, conn: Connection, config: RunnableConfig, writes: Sequence[tuple], task_id: str, task_path: str):
+        start = time.perf_counter()
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            value_type, blob = self.serde.dumps_typed(value)
+            rows.append({
+                "thread_id": str(config["configurable"]["thread_id"]),
+                "checkpoint_ns": config["configurable"].get("checkpoint_ns", ""),
+                "checkpoint_id": config["configurable"]["checkpoint_id"],
+                "task_id": task_id,
+                "idx": WRITES_IDX_MAP.get(channel, idx),
+                "channel": channel,
+                "type": value_type,
+                "blob": blob,
+                "task_path": task_path,
+            })
+        if not rows:
+            return
+
+        # special writes (errors, interrupts) replace earlier ones, regular writes are kept once
+        statement = _insert(conn, chat_checkpoint_writes)
+        if all(channel in WRITES_IDX_MAP for channel, _ in writes):
+            statement = statement.on_conflict_do_update(
+                index_elements=["thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx"],
+                set_={"channel": statement.excluded.channel, "type": statement.excluded.type, "blob": statement.excluded.blob},
+            )
+        else:
+            statement = statement.on_conflict_do_nothing()
+        conn.execute(statement, rows)
+
+        self._count(writes=len(rows), size=sum(len(row["blob"] or b"") for row in rows))
+        record_stage("checkpoint_write", time.perf_counter() - start)
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        return self._run(self._put, config, checkpoint, metadata, new_versions)
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        return await self._arun(self._put, config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple], task_id: str, task_path: str = "") -> None:
+        self._run(self._put_writes, config, writes, task_id, task_path)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[tuple], task_id: str, task_path: str = "") -> None:
+        await self._arun(self._put_writes, config, writes, task_id, task_path)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # zero-padded so versions sort as strings, random suffix against concurrent writers
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # retention
+
+    def _delete_threads(self, conn: Connection, thread_ids: List[str]):
+        for table in CHECKPOINT_TABLES:
+            conn.execute(delete(table).where(table.c.thread_id.in_(thread_ids)))
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._run(self._delete_threads, [str(thread_id)])
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self._arun(self._delete_threads, [str(thread_id)])
+
+    def _prune(self, conn: Connection, thread_id: str, keep_last: int) -> int:
+        thread_id = str(thread_id)
+
+        kept = conn.execute(
+            select(chat_checkpoints.c.checkpoint_id, chat_checkpoints.c.checkpoint_type, chat_checkpoints.c.checkpoint)
+            .where(chat_checkpoints.c.thread_id == thread_id, chat_checkpoints.c.checkpoint_ns == "")
+            .order_by(chat_checkpoints.c.checkpoint_id.desc())
+            .limit(keep_last)
+        ).all()
+        kept_ids = [row.checkpoint_id for row in kept]
+
+        # subgraph checkpoints (namespaced by agent and task) only matter while their turn runs
+        pruned = conn.execute(
+            delete(chat_checkpoints).where(
+                chat_checkpoints.c.thread_id == thread_id,
+                (chat_checkpoints.c.checkpoint_ns != "") | chat_checkpoints.c.checkpoint_id.not_in(kept_ids),
+            )
+        ).rowcount
+        conn.execute(
+            delete(chat_checkpoint_writes).where(
+                chat_checkpoint_writes.c.thread_id == thread_id,
+                (chat_checkpoint_writes.c.checkpoint_ns != "") | chat_checkpoint_writes.c.checkpoint_id.not_in(kept_ids),
+            )
+        )
+
+        # channel versions still referenced by the kept checkpoints
+        referenced = set()
+        for row in kept:
+            for channel, version in self.serde.loads_typed((row.checkpoint_type, row.checkpoint))["channel_versions"].items():
+                referenced.add((channel, str(version)))
+
+        stale = [
+            (blob.checkpoint_ns, blob.channel, blob.version)
+            for blob in conn.execute(
+                select(chat_checkpoint_blobs.c.checkpoint_ns, chat_checkpoint_blobs.c.channel, chat_checkpoint_blobs.c.version)
+                .where(chat_checkpoint_blobs.c.thread_id == thread_id)
+            )
+            if blob.checkpoint_ns != "" or (blob.channel, blob.version) not in referenced
+        ]
+        if stale:
+            conn.execute(
+                delete(chat_checkpoint_blobs).where(
+                    chat_checkpoint_blobs.c.thread_id == thread_id,
+                    tuple_(chat_checkpoint_blobs.c.checkpoint_ns, chat_checkpoint_blobs.c.channel, chat_checkpoint_blobs.c.version).in_(stale),
+                )
+            )
+
+        with self._lock:
+            self.checkpoints_pruned += pruned
+        return pruned
+
+    def _sweep(self, conn: Connection, cutoff: datetime) -> int:
+        expired = [
+            row.thread_id
+            for row in conn.execute(
+                select(chat_checkpoints.c.thread_id)
+                .group_by(chat_checkpoints.c.thread_id)
+                .having(func.max(chat_checkpoints.c.created_at) < cutoff)
+            )
+        ]
+        if expired:
+            self._delete_threads(conn, expired)
+        return len(expired)
+
+    def prune(self, thread_id: str, keep_last: Optional[int] = None) -> int:
+        """
+        Drop all but the latest `keep_last` checkpoints of a thread, the
+        checkpoints of its finished subgraph runs and the channel values no
+        longer referenced, then expire idle threads when a sweep is due.
+
+        Args:
+            thread_id (str): The thread (chat session) id.
+            keep_last (Optional[int]): Root checkpoints to keep, defaults to the saver's setting.
+        Returns:
+            int: Number of checkpoints removed from the thread.
+        """
+        pruned = self._run(self._prune, thread_id, keep_last or self.keep_last)
+        if self._sweep_due():
+            self._record_sweep(self._run(self._sweep, datetime.utcnow() - timedelta(seconds=self.ttl)))
+        return pruned
+
+    async def aprune(self, thread_id: str, keep_last: Optional[int] = None) -> int:
+        pruned = await self._arun(self._prune, thread_id, keep_last or self.keep_last)
+        if self._sweep_due():
+            self._record_sweep(await self._arun(self._sweep, datetime.utcnow() - timedelta(seconds=self.ttl)))
+        return pruned
+
+    def _sweep_due(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep < self.sweep_interval:
+                return False
+            self._last_sweep = now
+            return True
+
+    def _record_sweep(self, expired: int):
+        if expired:
+            with self._lock:
+                self.threads_expired += expired
+            logger.info({"action": "checkpoint_sweep", "expired_threads": expired})
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "checkpoints_written": self.checkpoints_written,
+                "blobs_written": self.blobs_written,
+                "writes_written": self.writes_written,
+                "bytes_written": self.bytes_written,
+                "checkpoints_loaded": self.checkpoints_loaded,
+                "checkpoints_pruned": self.checkpoints_pruned,
+                "threads_expired": self.threads_expired,
+            }
+
+def create_checkpointer(backend: str) -> Optional[SQLCheckpointSaver]:
+    """
+    Build the checkpointer of the chat supervisor.
+
+    Args:
+        backend (str): "postgres" for the application database, "sqlite" for
+            a local file at CHECKPOINT_SQLITE_PATH, or "none" to run without
+            checkpoints and rebuild every turn from the stored messages.
+    Returns:
+        Optional[SQLCheckpointSaver]: The saver, or None when disabled.
+    """
+    options = {
+        "keep_last": config["CHECKPOINT_KEEP_LAST"],
+        "ttl": config["CHECKPOINT_TTL"],
+        "sweep_interval": config["CHECKPOINT_SWEEP_INTERVAL"],
+    }
+
+    if backend == "postgres":
+        return SQLCheckpointSaver(engine, async_engine, **options)
+
+    if backend == "sqlite":
+        path = config["CHECKPOINT_SQLITE_PATH"]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        sqlite_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+
+        @event.listens_for(sqlite_engine, "connect")
+        def _enable_wal(dbapi_connection, connection_record):
+            dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+        saver = SQLCheckpointSaver(sqlite_engine, **options)
+        saver.setup()
+        return saver
+
+    return None
+
+# shared checkpointer of the chat supervisor, None when CHECKPOINTER is "none"
+chat_checkpointer = create_checkpointer(config["CHECKPOINTER"])
@@ -1,10 +1,19 @@
 from sqlmodel import SQLModel, create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
 from app.constants import config
+from app.helper import instrument_engine
 
 # Create a database connection
 DATABASE_URL = f"postgresql://{config['DB_USER']}:{config['DB_PASSWORD']}@{config['DB_HOST']}:{config['DB_PORT']}/{config['DB_NAME']}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{config['DB_USER']}:{config['DB_PASSWORD']}@{config['DB_HOST']}:{config['DB_PORT']}/{config['DB_NAME']}"
 
 engine = create_engine(DATABASE_URL, echo=False)
 
+# async engine used by the chat pipeline
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False, pool_pre_ping=True)
+
+instrument_engine(engine, "app")
+instrument_engine(async_engine.sync_engine, "app")
+
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
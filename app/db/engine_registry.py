@@ -0,0 +1,486 @@
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, FrozenSet, Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as SQLAlchemyTimeoutError
+from sqlalchemy.engine import URL, Connection, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+from sqlmodel import create_engine
+
+from app.constants import config
+from app.helper import logger, instrument_engine, ConcurrencySlots, admission_wait
+
+# async drivers used for target databases, by backend name
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+}
+
+def to_async_url(db_connection_url: str) -> Optional[URL]:
+    """
+    Translate a sync connection URL to the equivalent async driver URL.
+
+    Args:
+        db_connection_url (str): SQLAlchemy connection URL of the target database.
+    Returns:
+        Optional[URL]: The async URL, or None when no async driver is known for the backend.
+    """
+    url = make_url(db_connection_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        return None
+
+    url = url.set(drivername=f"{url.get_backend_name()}+{driver}")
+
+    # asyncpg takes `ssl` instead of libpq's `sslmode`
+    if "sslmode" in url.query:
+        query = dict(url.query)
+        query["ssl"] = query.pop("sslmode")
+        url = url.set(query=query)
+
+    return url
+
+class _EngineEntry:
+    """
+    Book-keeping for a single pooled engine held by the registry.
+    """
+
+    def __init__(self, engine: Union[Engine, AsyncEngine]):
+        self.engine = engine
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.pool_connects = 0
+        self.pool_checkouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+
+    @property
+    def sync_engine(self) -> Engine:
+        return self.engine.sync_engine if isinstance(self.engine, AsyncEngine) else self.engine
+
+EntryKey = Tuple[str, bool]
+
+# connection URLs whose query slot is held by the current task or thread,
+# so nested connections and worker threads started under a slot reuse it
+_held_slots: ContextVar[FrozenSet[str]] = ContextVar("held_query_slots", default=frozenset())
+
+class EngineRegistry:
+    """
+    Process-wide registry of SQLAlchemy engines for the target databases the
+    agents talk to, keyed by connection URL.
+
+    Every engine gets a bounded connection pool with pre-ping enabled, so the
+    tool calls of a chat turn reuse warm connections instead of paying a fresh
+    TCP/TLS/auth handshake each time. Engines nobody has used for
+    `idle_ttl` seconds are disposed, and the total number of engines is capped
+    at `max_engines` (least recently used idle engines go first).
+
+    Sync engines serve the blocking tool path; async engines (where an async
+    driver exists for the backend) serve the async tool path.
+
+    Independent tool calls run concurrently, so connections to one database
+    also take one of its `max_concurrent_queries` query slots (shared by
+    the sync and async engines of the URL); further callers wait for a slot,
+    up to `pool_timeout` seconds, instead of piling onto the database.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 5,
+        max_overflow: int = 5,
+        pool_timeout: float = 30,
+        pool_recycle: int = 1800,
+        idle_ttl: float = 600,
+        max_engines: int = 64,
+        max_concurrent_queries: int = 4,
+    ):
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self.idle_ttl = idle_ttl
+        self.max_engines = max_engines
+        self.max_concurrent_queries = max_concurrent_queries
+
+        self._engines: Dict[EntryKey, _EngineEntry] = {}
+        self._slots: Dict[str, ConcurrencySlots] = {}
+        self._lock = threading.RLock()
+        self._last_sweep = time.monotonic()
+
+        # async engines can only be disposed from a running event loop
+        self._pending_async_dispose: List[AsyncEngine] = []
+
+        # registry level counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _engine_kwargs(self, url: URL) -> dict:
+        kwargs = {"echo": False, "pool_pre_ping": True}
+
+        # sqlite uses a singleton/static pool which rejects the sizing arguments
+        if url.get_backend_name() != "sqlite":
+            kwargs.update(
+                pool_size=self.pool_size,
+                max_overflow=self.max_overflow,
+                pool_timeout=self.pool_timeout,
+                pool_recycle=self.pool_recycle,
+            )
+
+        return kwargs
+
+    def _create_engine(self, db_connection_url: str, is_async: bool) -> _EngineEntry:
+        if is_async:
+            url = to_async_url(db_connection_url)
+            entry = _EngineEntry(create_async_engine(url, **self._engine_kwargs(url)))
+        else:
+            url = make_url(db_connection_url)
+            entry = _EngineEntry(create_engine(db_connection_url, **self._engine_kwargs(url)))
+
+        # count new DBAPI connections vs. checkouts to derive pool hits/misses
+        @event.listens_for(entry.sync_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            entry.pool_connects += 1
+
+        @event.listens_for(entry.sync_engine, "checkout")
+        def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+            entry.pool_checkouts += 1
+
+        instrument_engine(entry.sync_engine, "target")
+
+        logger.debug({
+            "action": "engine_registry_create_engine",
+            "db": url.render_as_string(hide_password=True),
+            "async": is_async,
+        })
+
+        return entry
+
+    def _get_entry(self, db_connection_url: str, is_async: bool) -> _EngineEntry:
+        key = (db_connection_url, is_async)
+
+        with self._lock:
+            self._maybe_sweep()
+
+            entry = self._engines.get(key)
+            if entry is None:
+                self.misses += 1
+                entry = self._create_engine(db_connection_url, is_async)
+                self._engines[key] = entry
+                self._enforce_max_engines()
+            else:
+                self.hits += 1
+
+            entry.last_used = time.monotonic()
+            return entry
+
+    def get_engine(self, db_connection_url: str) -> Engine:
+        """
+        Return the pooled engine for the given connection URL, creating it on
+        first use.
+
+        Args:
+            db_connection_url (str): SQLAlchemy connection URL of the target database.
+        Returns:
+            Engine: A shared engine with a bounded, pre-pinged connection pool.
+        """
+        return self._get_entry(db_connection_url, False).engine
+
+    def supports_async(self, db_connection_url: str) -> bool:
+        """
+        Whether an async driver is available for the URL's backend.
+        """
+        return to_async_url(db_connection_url) is not None
+
+    def get_async_engine(self, db_connection_url: str) -> Optional[AsyncEngine]:
+        """
+        Return the pooled async engine for the given connection URL, creating
+        it on first use.
+
+        Args:
+            db_connection_url (str): SQLAlchemy connection URL of the target database.
+        Returns:
+            Optional[AsyncEngine]: A shared async engine, or None when the backend has no async driver.
+        """
+        if not self.supports_async(db_connection_url):
+            return None
+
+        return self._get_entry(db_connection_url, True).engine
+
+    def _get_slots(self, db_connection_url: str) -> ConcurrencySlots:
+        with self._lock:
+            slots = self._slots.get(db_connection_url)
+            if slots is None:
+                slots = self._slots[db_connection_url] = ConcurrencySlots(
+                    self.max_concurrent_queries,
+                    timeout_error=SQLAlchemyTimeoutError,
+                    on_wait=lambda waited: admission_wait.observe(waited, gate="database"),
+                )
+            return slots
+
+    @contextmanager
+    def query_slot(self, db_connection_url: str) -> Iterator[None]:
+        """
+        Hold one of the database's query slots for the block, waiting up to
+        `pool_timeout` seconds for one to free up. Re-entrant within a task
+        or thread, and inherited by worker threads started from the block.
+
+        Args:
+            db_connection_url (str): SQLAlchemy connection URL of the target database.
+        Raises:
+            sqlalchemy.exc.TimeoutError: If no slot frees up in time.
+        """
+        held = _held_slots.get()
+        if db_connection_url in held:
+            yield
+            return
+
+        slots = self._get_slots(db_connection_url)
+        slots.acquire(self.pool_timeout)
+        token = _held_slots.set(held | {db_connection_url})
+        try:
+            yield
+        finally:
+            _held_slots.reset(token)
+            slots.release()
+
+    @asynccontextmanager
+    async def aquery_slot(self, db_connection_url: str) -> AsyncIterator[None]:
+        """
+        Async counterpart of `query_slot`; waiting does not block a thread.
+        Wrap blocking database work handed to a worker thread in it, so the
+        thread starts with the slot already held.
+
+        Args:
+            db_connection_url (str): SQLAlchemy connection URL of the target database.
+        Raises:
+            sqlalchemy.exc.TimeoutError: If no slot frees up in time.
+        """
+        held = _held_slots.get()
+        if db_connection_url in held:
+            yield
+            return
+
+        slots = self._get_slots(db_connection_url)
+        await slots.aacquire(self.pool_timeout)
+        token = _held_slots.set(held | {db_connection_url})
+        try:
+            yield
+        finally:
+            _held_slots.reset(token)
+            slots.release()
+
+    @contextmanager
+    def connect(self, db_connection_url: str) -> Iterator[Connection]:
+        """
+        Check a connection out of the pool for the given URL and return it to
+        the pool when the block exits. The connection holds one of the
+        database's query slots (see `query_slot`). Time spent waiting for the
+        checkout is recorded in the registry stats.
+
+        Args:
+            db_connection_url (str): SQLAlchemy connection URL of the target database.
+        Yields:
+            Connection: A pooled connection to the target database.
+        """
+        key = (db_connection_url, False)
+        engine = self.get_engine(db_connection_url)
+
+        with self.query_slot(db_connection_url):
+            started = time.perf_counter()
+            conn = engine.connect()
+            self._record_checkout_wait(key, time.perf_counter() - started)
+
+            try:
+                yield conn
+            finally:
+                conn.close()
+                self._touch(key)
+
+    @asynccontextmanager
+    async def async_connect(self, db_connection_url: str) -> AsyncIterator[AsyncConnection]:
+        """
+        Async counterpart of `connect`. Sync helpers written against a
+        `Connection` can be reused with `await conn.run_sync(fn, ...)`.
+
+        Args:
+            db_connection_url (str): SQLAlchemy connection URL of the target database.
+        Yields:
+            AsyncConnection: A pooled async connection to the target database.
+        Raises:
+            ValueError: If the backend has no async driver.
+        """
+        key = (db_connection_url, True)
+        engine = self.get_async_engine(db_connection_url)
+        if engine is None:
+            raise ValueError("No async driver is available for this database.")
+
+        await self._dispose_pending_async()
+
+        async with self.aquery_slot(db_connection_url):
+            started = time.perf_counter()
+            conn = await engine.connect()
+            self._record_checkout_wait(key, time.perf_counter() - started)
+
+            try:
+                yield conn
+            finally:
+                await conn.close()
+                self._touch(key)
+
+    def _record_checkout_wait(self, key: EntryKey, waited: float):
+        entry = self._engines.get(key)
+        if entry is None:
+            return
+        entry.checkout_wait_total += waited
+        entry.checkout_wait_max = max(entry.checkout_wait_max, waited)
+
+    def _touch(self, key: EntryKey):
+        entry = self._engines.get(key)
+        if entry is not None:
+            entry.last_used = time.monotonic()
+
+    def _maybe_sweep(self):
+        # sweeping is cheap but there is no point doing it on every call
+        now = time.monotonic()
+        if now - self._last_sweep < min(self.idle_ttl, 60):
+            return
+        self._last_sweep = now
+        self.evict_idle()
+
+    def _is_idle(self, entry: _EngineEntry) -> bool:
+        checkedout = getattr(entry.sync_engine.pool, "checkedout", None)
+        return checkedout is None or checkedout() == 0
+
+    def _dispose(self, key: EntryKey, reason: str):
+        entry = self._engines.pop(key)
+        if isinstance(entry.engine, AsyncEngine):
+            self._pending_async_dispose.append(entry.engine)
+        else:
+            entry.engine.dispose()
+        self.evictions += 1
+
+        # slots of a URL without engines are only kept while in use
+        slots = self._slots.get(key[0])
+        if slots is not None and slots.is_idle() and (key[0], not key[1]) not in self._engines:
+            del self._slots[key[0]]
+
+        logger.debug({
+            "action": "engine_registry_dispose_engine",
+            "db": make_url(key[0]).render_as_string(hide_password=True),
+            "async": key[1],
+            "reason": reason,
+        })
+
+    async def _dispose_pending_async(self):
+        with self._lock:
+            pending, self._pending_async_dispose = self._pending_async_dispose, []
+
+        for engine in pending:
+            await engine.dispose()
+
+    def _enforce_max_engines(self):
+        if len(self._engines) <= self.max_engines:
+            return
+
+        by_last_use = sorted(self._engines.items(), key=lambda item: item[1].last_used)
+        for key, entry in by_last_use:
+            if len(self._engines) <= self.max_engines:
+                break
+            if self._is_idle(entry):
+                self._dispose(key, "max_engines")
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """
+        Dispose every engine that has not been used for `idle_ttl` seconds and
+        has no connection checked out. Async engines are closed on the next
+        `async_connect` or `adispose` call.
+
+        Returns:
+            int: The number of engines disposed.
+        """
+        now = time.monotonic() if now is None else now
+        evicted = 0
+
+        with self._lock:
+            for key, entry in list(self._engines.items()):
+                if now - entry.last_used >= self.idle_ttl and self._is_idle(entry):
+                    self._dispose(key, "idle")
+                    evicted += 1
+
+        return evicted
+
+    def dispose(self, db_connection_url: Optional[str] = None):
+        """
+        Dispose the engines for one URL, or every engine when no URL is given.
+        """
+        with self._lock:
+            keys = [key for key in self._engines if db_connection_url is None or key[0] == db_connection_url]
+            for key in keys:
+                self._dispose(key, "manual")
+
+    async def adispose(self, db_connection_url: Optional[str] = None):
+        """
+        Dispose sync and async engines for one URL, or every engine when no
+        URL is given, closing async pools on the running event loop.
+        """
+        self.dispose(db_connection_url)
+        await self._dispose_pending_async()
+
+    def stats(self) -> dict:
+        """
+        Snapshot of registry and per-engine pool counters.
+
+        Pool hits are checkouts served by an already open DBAPI connection,
+        pool misses are checkouts that had to open a new one.
+        """
+        with self._lock:
+            engines = {}
+            for (db_connection_url, is_async), entry in self._engines.items():
+                pool = entry.sync_engine.pool
+                name = make_url(db_connection_url).render_as_string(hide_password=True)
+                engines[f"{name} (async)" if is_async else name] = {
+                    "pool_hits": max(entry.pool_checkouts - entry.pool_connects, 0),
+                    "pool_misses": entry.pool_connects,
+                    "checkouts": entry.pool_checkouts,
+                    "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+                    "checkout_wait_total_seconds": entry.checkout_wait_total,
+                    "checkout_wait_max_seconds": entry.checkout_wait_max,
+                    "idle_seconds": time.monotonic() - entry.last_used,
+                }
+
+            slots = list(self._slots.values())
+            for db_connection_url, url_slots in self._slots.items():
+                name = make_url(db_connection_url).render_as_string(hide_password=True)
+                engines.setdefault(name, {}).update({
+                    "active_queries": url_slots.active,
+                    "peak_queries": url_slots.peak,
+                    "query_slot_waits": url_slots.waits,
+                    "query_slot_wait_max_seconds": url_slots.wait_max,
+                })
+
+            return {
+                "engines": len(self._engines),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "active_queries": sum(url_slots.active for url_slots in slots),
+                "query_slot_waits": sum(url_slots.waits for url_slots in slots),
+                "query_slot_wait_total_seconds": sum(url_slots.wait_total for url_slots in slots),
+                "query_slot_timeouts": sum(url_slots.timeouts for url_slots in slots),
+                "per_engine": engines,
+            }
+
+
+# shared registry used by the db agent tools
+engine_registry = EngineRegistry(
+    pool_size=config["TARGET_DB_POOL_SIZE"],
+    max_overflow=config["TARGET_DB_MAX_OVERFLOW"],
+    pool_timeout=config["TARGET_DB_POOL_TIMEOUT"],
+    pool_recycle=config["TARGET_DB_POOL_RECYCLE"],
+    idle_ttl=config["TARGET_DB_IDLE_TTL"],
+    max_engines=config["TARGET_DB_MAX_ENGINES"],
+    max_concurrent_queries=config["TARGET_DB_MAX_CONCURRENT_QUERIES"],
+)
@@ -0,0 +1,245 @@
+import csv
+import json
+import mmap
+import os
+import re
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from app.constants import config
+from app.helper import logger
+
+# handles of the results stored during the current chat turn, see `start_result_handles`
+_turn_result_handles: ContextVar[Optional[List[str]]] = ContextVar("turn_result_handles", default=None)
+
+def start_result_handles() -> List[str]:
+    """
+    Start collecting the handles of results stored during the current request.
+
+    Returns:
+        List[str]: The handles, appended to in place by run_query.
+    """
+    handles: List[str] = []
+    _turn_result_handles.set(handles)
+    return handles
+
+def record_result_handle(handle: str):
+    handles = _turn_result_handles.get()
+    if handles is not None and handle not in handles:
+        handles.append(handle)
+
+# handles are uuid4 hex strings, which also keeps them safe to use as file names
+HANDLE_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+class _CountingFile:
+    # text sink for csv.writer that encodes to the binary file and counts bytes
+    def __init__(self, file):
+        self.file = file
+        self.bytes = 0
+
+    def write(self, text: str):
+        data = text.encode("utf-8")
+        self.file.write(data)
+        self.bytes += len(data)
+
+class ResultWriter:
+    """
+    Writes the rows of one query result to a CSV file in the store. The file
+    only becomes visible under its handle once `close` succeeds.
+    """
+
+    def __init__(self, store: "ResultStore", handle: str, columns: List[str], column_types: Optional[List[str]] = None):
+        self.store = store
+        self.handle = handle
+        self.columns = columns
+        self.column_types = column_types or []
+        self.rows = 0
+        self.truncated = False
+
+        self._partial = os.path.join(store.path, f"{handle}.csv.partial")
+        self._file = open(self._partial, "wb")
+        self._sink = _CountingFile(self._file)
+        self._writer = csv.writer(self._sink, lineterminator="\n")
+        self._writer.writerow(columns)
+
+    def write(self, values: List[str]) -> bool:
+        """
+        Append one row of formatted values.
+
+        Returns:
+            bool: False once the store's row or byte limit is reached; the row is not written.
+        """
+        if self.rows >= self.store.max_rows or self._sink.bytes >= self.store.max_bytes:
+            self.truncated = True
+            return False
+
+        self._writer.writerow(values)
+        self.rows += 1
+        return True
+
+    def close(self) -> dict:
+        """
+        Finish the file and publish it under the writer's handle.
+
+        Returns:
+            dict: The result metadata (handle, columns, rows, bytes, truncated).
+        """
+        self._file.close()
+
+        meta = {
+            "handle": self.handle,
+            "columns": self.columns,
+            "column_types": self.column_types,
+            "rows": self.rows,
+            "bytes": os.path.getsize(self._partial),
+            "truncated": self.truncated,
+            "created_at": time.time(),
+        }
+
+        with open(self.store._meta_path(self.handle), "w") as f:
+            json.dump(meta, f)
+        os.replace(self._partial, self.store._data_path(self.handle))
+
+        self.store._record_write(meta)
+        return meta
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._partial):
+            os.remove(self._partial)
+
+class ResultStore:
+    """
+    Local on-disk store of full query results.
+
+    Results are written as uncompressed CSV so byte ranges of the file map
+    directly onto HTTP range requests and can be served from a memory map
+    without loading the file. Each result has a JSON metadata file next to
+    it. Results older than `ttl` seconds are removed by a periodic sweep.
+    """
+
+    def __init__(self, path: str, ttl: float = 86400, max_rows: int = 100000, max_bytes: int = 67108864, sweep_interval: float = 300):
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+        self.results_written = 0
+        self.rows_written = 0
+        self.bytes_written = 0
+        self.expired = 0
+
+    def _data_path(self, handle: str) -> str:
+        return os.path.join(self.path, f"{handle}.csv")
+
+    def _meta_path(self, handle: str) -> str:
+        return os.path.join(self.path, f"{handle}.json")
+
+    def _record_write(self, meta: dict):
+        with self._lock:
+            self.results_written += 1
+            self.rows_written += meta["rows"]
+            self.bytes_written += meta["bytes"]
+
+    def create(self, columns: List[str], column_types: Optional[List[str]] = None) -> ResultWriter:
+        """
+        Start a new result file.
+
+        Args:
+            columns (List[str]): Column names, written as the CSV header.
+            column_types (Optional[List[str]]): Type names of the columns, kept in the metadata.
+        Returns:
+            ResultWriter: The writer for the rows of the result.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        self._maybe_sweep()
+        return ResultWriter(self, uuid.uuid4().hex, columns, column_types)
+
+    def meta(self, handle: str) -> Optional[dict]:
+        """
+        Metadata of a stored result, or None when the handle is unknown or expired.
+        """
+        if not HANDLE_PATTERN.match(handle or ""):
+            return None
+
+        try:
+            with open(self._meta_path(handle)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not os.path.exists(self._data_path(handle)):
+            return None
+        return meta
+
+    def read_range(self, handle: str, start: int, end: int, chunk_size: int = 65536) -> Iterator[bytes]:
+        """
+        Yield the bytes `start..end` (inclusive) of a stored result in chunks,
+        read through a memory map.
+
+        Args:
+            handle (str): The result handle.
+            start (int): First byte offset.
+            end (int): Last byte offset, inclusive.
+            chunk_size (int): Size of the yielded chunks.
+        Yields:
+            bytes: Consecutive chunks of the range.
+        """
+        with open(self._data_path(handle), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0 or start > end:
+                return
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                position = start
+                end = min(end, size - 1)
+                while position <= end:
+                    stop = min(position + chunk_size, end + 1)
+                    yield mapped[position:stop]
+                    position = stop
+
+    def _maybe_sweep(self):
+        now = time.time()
+        with self._lock:
+            if now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+
+        removed = 0
+        for name in os.listdir(self.path):
+            file_path = os.path.join(self.path, name)
+            try:
+                if now - os.path.getmtime(file_path) > self.ttl:
+                    os.remove(file_path)
+                    removed += name.endswith(".json")
+            except OSError:
+                continue
+
+        if removed:
+            with self._lock:
+                self.expired += removed
+            logger.debug({"action": "result_store_sweep", "removed": removed})
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "results_written": self.results_written,
+                "rows_written": self.rows_written,
+                "bytes_written": self.bytes_written,
+                "expired": self.expired,
+            }
+
+# shared store of query results too large to pass through the model
+result_store = ResultStore(
+    path=config["RESULT_STORE_PATH"],
+    ttl=config["RESULT_STORE_TTL"],
+    max_rows=config["RESULT_STORE_MAX_ROWS"],
+    max_bytes=config["RESULT_STORE_MAX_BYTES"],
+)
@@ -0,0 +1,179 @@
+import queue
+import threading
+import time
+from typing import List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from app.constants import config
+from app.helper import logger
+from app.models import SessionChat
+from .connection import engine
+
+# marks the end of the queue when draining
+_STOP = object()
+
+class ChatWriteBehind:
+    """
+    Background writer that persists chat message rows in batches.
+
+    Turns hand their rows to `enqueue` and return immediately; a worker thread
+    collects rows for up to `flush_interval` seconds or `batch_size` rows and
+    writes them with a single executemany INSERT, falling back to one INSERT
+    per turn when the batch fails. The queue holds at most `max_queue` turns,
+    so at most the rows queued plus one batch in flight can be lost if the
+    process dies before `drain`.
+    """
+
+    def __init__(self, engine: Engine, batch_size: int = 500, flush_interval: float = 0.2, max_queue: int = 1000):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.flushes = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.rejected = 0
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+        self.last_flush_seconds = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="chat-write-behind", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, rows: List[dict]) -> bool:
+        """
+        Queue the rows of one turn for writing.
+
+        Args:
+            rows (List[dict]): session_chats rows, as built by the chat controller.
+        Returns:
+            bool: False when the queue is full and the caller has to write the rows itself.
+        """
+        if not rows:
+            return True
+
+        self.start()
+
+        try:
+            self._queue.put_nowait(rows)
+            return True
+        except queue.Full:
+            self.rejected += 1
+            return False
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+
+            # rows of each turn, kept apart so a failed write only loses its own turn
+            turns = [item]
+            rows = len(item)
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+
+            while rows < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                turns.append(item)
+                rows += len(item)
+
+            self._flush(turns)
+
+            if stop:
+                return
+
+    def _insert(self, rows: List[dict]):
+        with self.engine.begin() as conn:
+            conn.execute(insert(SessionChat.__table__), rows)
+
+    def _flush(self, turns: List[List[dict]]):
+        start = time.perf_counter()
+        rows = [row for turn in turns for row in turn]
+        try:
+            self._insert(rows)
+            self.rows_written += len(rows)
+        except Exception as e:
+            logger.error({
+                "action": "chat_write_behind - flush error",
+                "rows": len(rows),
+                "turns": len(turns),
+                "error": str(e)
+            })
+            # e.g. a session deleted meanwhile: retry turn by turn, so only its own rows are lost
+            for turn in turns:
+                try:
+                    self._insert(turn)
+                    self.rows_written += len(turn)
+                except Exception as e:
+                    self.rows_failed += len(turn)
+                    logger.error({
+                        "action": "chat_write_behind - turn error",
+                        "session_id": str(turn[0]["session_id"]),
+                        "rows": len(turn),
+                        "error": str(e)
+                    })
+
+        elapsed = time.perf_counter() - start
+        self.flushes += 1
+        self.last_flush_seconds = elapsed
+        self.flush_seconds_total += elapsed
+        self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+
+    def drain(self, timeout: Optional[float] = None):
+        """
+        Write every queued row and stop the worker.
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+
+        if thread is None or not thread.is_alive():
+            return
+
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+        logger.info({
+            "action": "chat_write_behind - drained",
+            "pending_turns": self._queue.qsize(),
+            **self.stats()
+        })
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "rejected": self.rejected,
+            "last_flush_seconds": self.last_flush_seconds,
+            "max_flush_seconds": self.flush_seconds_max,
+            "avg_flush_seconds": self.flush_seconds_total / self.flushes if self.flushes else 0.0,
+        }
+
+# shared writer used when CHAT_PERSISTENCE_MODE is "async"
+chat_write_behind = ChatWriteBehind(
+    engine,
+    batch_size=config["CHAT_WRITE_BATCH_SIZE"],
+    flush_interval=config["CHAT_WRITE_FLUSH_INTERVAL"],
+    max_queue=config["CHAT_WRITE_MAX_QUEUE"],
+)
@@ -1,2 +1,16 @@
-from .model import llm
-from .logger import logger
\ No newline at end of file
+from .model import get_llm, use_llm, llm_cache, ShortcutChatModel
+from .llm_cache import start_llm_cache_request
+from .logger import logger, logging_stats
+from .tokens import count_tokens, TokenUsageCallback
+from .timing import start_stage_timing, stage_timer, record_stage, stage_timing_callbacks
+from .metrics import metrics_registry, stats_metrics, instrument_engine, RequestMetricsMiddleware
+from .admission import (
+    AdmissionRejected, ConcurrencySlots, TurnAdmission, ProviderLimits,
+    turn_admission, provider_limits, start_admission, admission_wait,
+)
+
+def __getattr__(name):
+    # `llm` is built on first use, see `get_llm`
+    if name == "llm":
+        return get_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,476 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from functools import partial
+from typing import AsyncIterator, Callable, Deque, Dict, Iterator, Optional, Tuple, Union
+
+from app.constants import config
+from .logger import logger
+from .metrics import metrics_registry
+
+admission_wait = metrics_registry.histogram(
+    "db_agent_admission_wait_seconds", "Time spent queued for a slot, by gate (turn, llm, database).", ["gate"])
+admission_rejections_total = metrics_registry.counter(
+    "db_agent_admission_rejections_total", "Work refused by admission control, by gate and reason.", ["gate", "reason"])
+
+class AdmissionRejected(Exception):
+    """
+    Raised when work is refused because its queue is full or it waited too
+    long; clients should retry after `retry_after` seconds.
+    """
+
+    def __init__(self, message: str, retry_after: float = 1, reason: str = "queue_full"):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+
+class ConcurrencySlots:
+    """
+    Cap on the units of work running at once, shared by worker threads and
+    coroutines. Slots are handed to waiters in arrival order; async waiters
+    wait on the event loop without holding a thread.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        name: str = "query",
+        timeout_error: Callable[[str], Exception] = TimeoutError,
+        on_wait: Optional[Callable[[float], None]] = None,
+    ):
+        self.limit = limit
+        self.name = name
+        self.timeout_error = timeout_error
+        self.on_wait = on_wait
+        self.active = 0
+        self.peak = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+        # threading.Event for threads, (loop, future) for coroutines
+        self._waiters: Deque[Union[threading.Event, Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = deque()
+
+    def _try_acquire(self) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            return True
+        return False
+
+    def _record_wait(self, waited: float):
+        with self._lock:
+            self.waits += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        if self.on_wait is not None:
+            self.on_wait(waited)
+
+    def _timeout(self, timeout: float) -> Exception:
+        return self.timeout_error(f"No {self.name} slot free within {timeout}s ({self.limit} already running).")
+
+    def acquire(self, timeout: float):
+        with self._lock:
+            if self._try_acquire():
+                return
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+
+        started = time.perf_counter()
+        granted = waiter.wait(timeout)
+        if not granted:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    self.timeouts += 1
+                    raise self._timeout(timeout)
+            # the slot was handed over right after the timeout
+
+        self._record_wait(time.perf_counter() - started)
+
+    async def aacquire(self, timeout: float):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_acquire():
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+
+        started = time.perf_counter()
+        acquired = False
+        try:
+            await asyncio.wait([future], timeout=timeout)
+            acquired = future.done()
+        finally:
+            if not future.done():
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                # a slot already on its way is given back by `_grant`
+                future.cancel()
+            elif not acquired:
+                # cancelled after the slot was handed over
+                self.release()
+
+        if not acquired:
+            with self._lock:
+                self.timeouts += 1
+            raise self._timeout(timeout)
+
+        self._record_wait(time.perf_counter() - started)
+
+    def _grant(self, future: asyncio.Future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def release(self):
+        with self._lock:
+            # hand the slot straight to the next waiter, keeping it counted as active
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, future = waiter
+                try:
+                    loop.call_soon_threadsafe(self._grant, future)
+                    return
+                except RuntimeError:
+                    # the waiter's event loop is closed
+                    continue
+            self.active -= 1
+
+    @contextmanager
+    def hold(self, timeout: float) -> Iterator[None]:
+        self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def ahold(self, timeout: float) -> AsyncIterator[None]:
+        await self.aacquire(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def is_idle(self) -> bool:
+        return self.active == 0 and not self._waiters
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "active": self.active,
+                "peak": self.peak,
+                "queued": len(self._waiters),
+                "waits": self.waits,
+                "wait_total_seconds": self.wait_total,
+                "wait_max_seconds": self.wait_max,
+                "timeouts": self.timeouts,
+            }
+
+class ProviderLimits:
+    """
+    Per-provider caps on the LLM calls in flight, so a burst of chats queues
+    in the process instead of drawing 429s from the provider. Calls that
+    wait longer than `timeout` seconds fail with AdmissionRejected; a limit
+    of 0 disables the cap.
+    """
+
+    def __init__(self, limit: int = 16, timeout: float = 30):
+        self.limit = limit
+        self.timeout = timeout
+        self._slots: Dict[str, ConcurrencySlots] = {}
+        self._lock = threading.Lock()
+
+    def slots(self, provider: str) -> ConcurrencySlots:
+        with self._lock:
+            slots = self._slots.get(provider)
+            if slots is None:
+                slots = self._slots[provider] = ConcurrencySlots(
+                    self.limit,
+                    name=f"{provider} call",
+                    timeout_error=partial(self._rejected, provider),
+                    on_wait=lambda waited: admission_wait.observe(waited, gate="llm"),
+                )
+            return slots
+
+    @contextmanager
+    def hold(self, provider: str) -> Iterator[None]:
+        if self.limit <= 0:
+            yield
+            return
+        with self.slots(provider).hold(self.timeout):
+            yield
+
+    @asynccontextmanager
+    async def ahold(self, provider: str) -> AsyncIterator[None]:
+        if self.limit <= 0:
+            yield
+            return
+        async with self.slots(provider).ahold(self.timeout):
+            yield
+
+    def _rejected(self, provider: str, message: str) -> AdmissionRejected:
+        admission_rejections_total.inc(gate="llm", reason="queue_timeout")
+        logger.warning({"action": "admission - llm slot timeout", "provider": provider})
+        return AdmissionRejected(message, retry_after=self.timeout, reason="llm_busy")
+
+    def stats(self) -> dict:
+        with self._lock:
+            slots = dict(self._slots)
+
+        per_provider = {provider: provider_slots.stats() for provider, provider_slots in slots.items()}
+        return {
+            "active": sum(stats["active"] for stats in per_provider.values()),
+            "queued": sum(stats["queued"] for stats in per_provider.values()),
+            "waits": sum(stats["waits"] for stats in per_provider.values()),
+            "wait_total_seconds": sum(stats["wait_total_seconds"] for stats in per_provider.values()),
+            "timeouts": sum(stats["timeouts"] for stats in per_provider.values()),
+            "per_provider": per_provider,
+        }
+
+class _TurnWaiter:
+    __slots__ = ("db_connection_url", "loop", "future")
+
+    def __init__(self, db_connection_url: str, loop: asyncio.AbstractEventLoop):
+        self.db_connection_url = db_connection_url
+        self.loop = loop
+        self.future = loop.create_future()
+
+class TurnAdmission:
+    """
+    Admission control in front of the chat supervisor.
+
+    At most `max_active` turns run at once, and at most
+    `max_active_per_database` against one target database. Turns over the
+    limits wait in a queue per user; freed slots go to the users in turn
+    (round robin), so one user's burst does not starve the others. A turn
+    is refused at once with AdmissionRejected when its user already has
+    `max_queued_per_user` turns waiting or `max_queued` turns wait in total,
+    and after waiting `queue_timeout` seconds. The Retry-After hint is the
+    average turn time scaled by the queue length.
+    """
+
+    def __init__(
+        self,
+        max_active: int = 32,
+        max_active_per_database: int = 8,
+        max_queued: int = 256,
+        max_queued_per_user: int = 4,
+        queue_timeout: float = 30,
+    ):
+        self.max_active = max_active
+        self.max_active_per_database = max_active_per_database
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()
+        self._active_by_url: Dict[str, int] = {}
+        # users with waiting turns, in the order they are served
+        self._queues: "OrderedDict[str, Deque[_TurnWaiter]]" = OrderedDict()
+
+        self.active = 0
+        self.peak = 0
+        self.queued = 0
+        self.admitted = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.rejected = 0
+        self.timeouts = 0
+        # moving average of the turn time, for Retry-After
+        self.turn_seconds: Optional[float] = None
+
+    def _can_start(self, db_connection_url: str) -> bool:
+        return self.active < self.max_active and self._active_by_url.get(db_connection_url, 0) < self.max_active_per_database
+
+    def _start(self, db_connection_url: str):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        self._active_by_url[db_connection_url] = self._active_by_url.get(db_connection_url, 0) + 1
+
+    def _retry_after(self) -> float:
+        return (self.turn_seconds or 1.0) * (self.queued + 1) / self.max_active
+
+    def _reject(self, message: str, reason: str) -> AdmissionRejected:
+        admission_rejections_total.inc(gate="turn", reason=reason)
+        logger.warning({"action": "admission - turn rejected", "reason": reason, "active": self.active, "queued": self.queued})
+        return AdmissionRejected(message, retry_after=self._retry_after(), reason=reason)
+
+    def _grant_waiters(self):
+        # one turn per user per round, skipping users whose database is at its cap
+        granted = True
+        while granted and self._queues and self.active < self.max_active:
+            granted = False
+            for user_id in list(self._queues):
+                queue = self._queues[user_id]
+                waiter = queue[0]
+                if not self._can_start(waiter.db_connection_url):
+                    continue
+
+                queue.popleft()
+                self.queued -= 1
+                if queue:
+                    self._queues.move_to_end(user_id)
+                else:
+                    del self._queues[user_id]
+
+                self._start(waiter.db_connection_url)
+                try:
+                    waiter.loop.call_soon_threadsafe(self._grant, waiter)
+                except RuntimeError:
+                    # the waiter's event loop is closed
+                    self._finish(waiter.db_connection_url)
+                granted = True
+                if self.active >= self.max_active:
+                    break
+
+    def _grant(self, waiter: _TurnWaiter):
+        if waiter.future.cancelled():
+            self._release(waiter.db_connection_url, None)
+        else:
+            waiter.future.set_result(None)
+
+    def _finish(self, db_connection_url: str):
+        self.active -= 1
+        remaining = self._active_by_url.get(db_connection_url, 1) - 1
+        if remaining > 0:
+            self._active_by_url[db_connection_url] = remaining
+        else:
+            self._active_by_url.pop(db_connection_url, None)
+
+    def _release(self, db_connection_url: str, seconds: Optional[float]):
+        with self._lock:
+            self._finish(db_connection_url)
+            if seconds is not None:
+                self.turn_seconds = seconds if self.turn_seconds is None else 0.9 * self.turn_seconds + 0.1 * seconds
+            self._grant_waiters()
+
+    async def _wait(self, user_id: str, waiter: _TurnWaiter):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait([waiter.future], timeout=self.queue_timeout)
+        finally:
+            if not waiter.future.done():
+                with self._lock:
+                    queue = self._queues.get(user_id)
+                    if queue is not None and waiter in queue:
+                        queue.remove(waiter)
+                        self.queued -= 1
+                        if not queue:
+                            del self._queues[user_id]
+                # a slot already on its way is given back by `_grant`
+                waiter.future.cancel()
+
+        if waiter.future.cancelled():
+            with self._lock:
+                self.timeouts += 1
+                self.rejected += 1
+                raise self._reject(f"The chat turn waited {self.queue_timeout}s without a free slot.", "queue_timeout")
+
+        waited = time.perf_counter() - started
+        admission_wait.observe(waited, gate="turn")
+        with self._lock:
+            self.waits += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    @asynccontextmanager
+    async def admit(self, user_id: Optional[str] = None, db_connection_url: Optional[str] = None) -> AsyncIterator[None]:
+        """
+        Hold a turn slot for the block, queueing fairly per user when the
+        limits are reached. Defaults to the user and database recorded by
+        `start_admission` for the current turn.
+
+        Raises:
+            AdmissionRejected: If the queue is full or the turn waited too long.
+        """
+        if user_id is None or db_connection_url is None:
+            target = _turn_target.get() or ("", "")
+            user_id = user_id if user_id is not None else target[0]
+            db_connection_url = db_connection_url if db_connection_url is not None else target[1]
+
+        waiter = None
+        with self._lock:
+            if self._can_start(db_connection_url):
+                self._start(db_connection_url)
+            else:
+                queue = self._queues.get(user_id)
+                if self.queued >= self.max_queued or (queue is not None and len(queue) >= self.max_queued_per_user):
+                    self.rejected += 1
+                    raise self._reject("Too many chat turns are waiting, retry later.", "queue_full")
+
+                waiter = _TurnWaiter(db_connection_url, asyncio.get_running_loop())
+                if queue is None:
+                    queue = self._queues[user_id] = deque()
+                queue.append(waiter)
+                self.queued += 1
+
+        if waiter is not None:
+            try:
+                await self._wait(user_id, waiter)
+            except asyncio.CancelledError:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    self._release(db_connection_url, None)
+                raise
+
+        with self._lock:
+            self.admitted += 1
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(db_connection_url, time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active": self.active,
+                "peak": self.peak,
+                "queued": self.queued,
+                "users_waiting": len(self._queues),
+                "admitted": self.admitted,
+                "waits": self.waits,
+                "wait_total_seconds": self.wait_total,
+                "wait_max_seconds": self.wait_max,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "turn_seconds": self.turn_seconds,
+            }
+
+# shared limits for the chat supervisor and the LLM provider calls
+turn_admission = TurnAdmission(
+    max_active=config["ADMISSION_MAX_CONCURRENT_TURNS"],
+    max_active_per_database=config["ADMISSION_MAX_TURNS_PER_DATABASE"],
+    max_queued=config["ADMISSION_MAX_QUEUED"],
+    max_queued_per_user=config["ADMISSION_MAX_QUEUED_PER_USER"],
+    queue_timeout=config["ADMISSION_QUEUE_TIMEOUT"],
+)
+provider_limits = ProviderLimits(
+    limit=config["LLM_MAX_CONCURRENT_CALLS"],
+    timeout=config["LLM_QUEUE_TIMEOUT"],
+)
+
+# user and target database of the current chat turn, see `start_admission`
+_turn_target: ContextVar[Optional[Tuple[str, str]]] = ContextVar("turn_admission_target", default=None)
+
+def start_admission(user_id: str, db_connection_url: str):
+    """
+    Record who the current chat turn is for and which database it queries,
+    for `TurnAdmission.admit`.
+    """
+    _turn_target.set((user_id, db_connection_url))
@@ -0,0 +1,35 @@
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_openai import ChatOpenAI
+from .admission import provider_limits
+
+class ProviderLimitedChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI holding one of the provider's call slots (see `ProviderLimits`)
+    for every request it sends. Responses served by the LLM cache never
+    reach the request methods, so they do not take a slot.
+    """
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.streaming:
+            # generated from `_stream`, which holds the slot
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        with provider_limits.hold(self._llm_type):
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.streaming:
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        async with provider_limits.ahold(self._llm_type):
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        with provider_limits.hold(self._llm_type):
+            yield from super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        async with provider_limits.ahold(self._llm_type):
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+# per-request counters, see `start_llm_cache_request`
+_request_stats: ContextVar[Optional[dict]] = ContextVar("llm_cache_request_stats", default=None)
+
+def start_llm_cache_request() -> dict:
+    """
+    Start collecting LLM cache counters for the current request.
+
+    Returns:
+        dict: The counters (hits, misses, tokens_saved), updated in place by the cache.
+    """
+    stats = {"hits": 0, "misses": 0, "tokens_saved": 0}
+    _request_stats.set(stats)
+    return stats
+
+def _generation_tokens(generation: Any) -> int:
+    message = getattr(generation, "message", None)
+    usage = getattr(message, "usage_metadata", None) or {}
+    return int(usage.get("total_tokens", 0))
+
+class LLMResponseCache(BaseCache):
+    """
+    Persistent, size-bounded LLM response cache stored in a local SQLite file.
+
+    LangChain keys lookups by the serialized message list (`prompt`) and the
+    model configuration (`llm_string`, which includes the model id,
+    temperature and bound tools); both are hashed into the cache key. When the
+    cache holds more than `max_entries` rows the least recently used ones are
+    deleted.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+              key TEXT PRIMARY KEY,
+              value TEXT NOT NULL,
+              tokens INTEGER NOT NULL DEFAULT 0,
+              last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)")
+        self._conn.commit()
+
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def _record(self, hit: bool, tokens: int = 0):
+        if hit:
+            self.hits += 1
+            self.tokens_saved += tokens
+        else:
+            self.misses += 1
+
+        stats = _request_stats.get()
+        if stats is not None:
+            stats["hits" if hit else "misses"] += 1
+            stats["tokens_saved"] += tokens
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+
+        with self._lock:
+            row = self._conn.execute("SELECT value, tokens FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._record(hit=False)
+                return None
+
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+        self._record(hit=True, tokens=row[1])
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", LangChainBetaWarning)
+            return loads(row[0])
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        tokens = sum(_generation_tokens(generation) for generation in return_val)
+
+        value, now = dumps(list(return_val)), time.time()
+
+        with self._lock:
+            # only a new key adds an entry; an existing one is overwritten in place
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO llm_cache (key, value, tokens, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, tokens, now),
+            )
+            if cursor.rowcount:
+                self._entries += 1
+            else:
+                self._conn.execute(
+                    "UPDATE llm_cache SET value = ?, tokens = ?, last_access = ? WHERE key = ?",
+                    (value, tokens, now, key),
+                )
+
+            if self._entries > self.max_entries:
+                self._evict()
+
+            self._conn.commit()
+
+    def _evict(self):
+        # drop 10% below the bound so eviction does not run on every insert
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        excess = self._entries - int(self.max_entries * 0.9)
+        if excess <= 0:
+            return
+
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)",
+            (excess,),
+        )
+        self._entries -= excess
+        self.evictions += excess
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._entries = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "tokens_saved": self.tokens_saved,
+            "evictions": self.evictions,
+        }
@@ -1,27 +1,193 @@
+import atexit
+import json
 import logging
 import os
+import queue
+import random
+from contextvars import ContextVar
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, List, Optional, Tuple
+
+from app.constants import config
+
+# id of the HTTP request being handled, set by RequestMetricsMiddleware
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s'
+
+class RequestIdFilter(logging.Filter):
+    """
+    Add the current request id to every log record as `request_id`.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+class DebugSampler(logging.Filter):
+    """
+    Keep a `rate` fraction of the DEBUG records; INFO and above always pass.
+    """
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate:
+            return True
+        self.dropped += 1
+        return False
+
+def _json_default(value: Any) -> Any:
+    # pydantic models (request payloads) and anything else json cannot encode
+    model_dump = getattr(value, "model_dump", None)
+    if callable(model_dump):
+        return model_dump(mode="json")
+    return str(value)
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record with its time, level, logger and request id.
+    The keys of dict messages are written as fields, other messages as
+    `message`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        if isinstance(record.msg, dict) and not record.args:
+            entry.update(record.msg)
+        else:
+            entry["message"] = record.getMessage()
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=_json_default)
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Queue handler that leaves formatting and I/O to the listener thread.
+
+    Records are queued as they are, with their message unformatted (dict
+    messages are copied, so later changes to the dict do not leak into the
+    log line). When the queue is full the record is dropped and counted
+    rather than blocking the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if isinstance(record.msg, dict):
+            record.msg = dict(record.msg)
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class LogQueueListener(QueueListener):
+    """
+    QueueListener whose stop waits for room in a full queue instead of failing.
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+def log_formatter(log_format: str) -> logging.Formatter:
+    """
+    Formatter for LOG_FORMAT: "json" (one object per line) or "text".
+    """
+    return JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+
+def log_handlers(log_file: Optional[str], formatter: logging.Formatter) -> List[logging.Handler]:
+    """
+    Console handler, plus a size-rotated `<LOG_DIR>/<log_file>.log` when a
+    log file name is given.
+    """
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+
+    if log_file:
+        os.makedirs(config["LOG_DIR"], exist_ok=True)
+        handlers.append(RotatingFileHandler(
+            os.path.join(config["LOG_DIR"], f"{log_file}.log"),
+            maxBytes=config["LOG_FILE_MAX_BYTES"],
+            backupCount=config["LOG_FILE_BACKUPS"],
+            encoding="utf-8",
+        ))
+
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+def start_log_queue(handlers: List[logging.Handler], queue_size: int) -> Tuple[LazyQueueHandler, LogQueueListener]:
+    """
+    Put a bounded queue in front of `handlers`, drained by a background
+    listener thread, and return the handler to attach to loggers.
+    """
+    log_queue: queue.Queue = queue.Queue(queue_size)
+    listener = LogQueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return LazyQueueHandler(log_queue), listener
+
+def parse_log_levels(levels: str) -> List[Tuple[str, str]]:
+    """
+    Parse LOG_LEVELS, e.g. "httpx=WARNING,sqlalchemy.engine=INFO".
+    """
+    parsed = []
+    for item in levels.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            parsed.append((name.strip(), level.strip().upper()))
+    return parsed
+
+_queue_handler: Optional[LazyQueueHandler] = None
+_sampler = DebugSampler(config["LOG_DEBUG_SAMPLE_RATE"])
 
 def setup_logger(log_file=None):
+    global _queue_handler
+
     logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)
-    
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # File handler (if log_file is provided)
-    if log_file:
-        if not os.path.exists('logs'):
-            os.makedirs('logs')
-        file_handler = logging.FileHandler(f'logs/{log_file}_{datetime.now().strftime("%Y%m%d")}.log')
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-    
+    logger.setLevel(config["LOG_LEVEL"])
+    for name, level in parse_log_levels(config["LOG_LEVELS"]):
+        logging.getLogger(name).setLevel(level)
+
+    handlers = log_handlers(log_file, log_formatter(config["LOG_FORMAT"]))
+
+    # without a queue the handlers write in the calling thread
+    if config["LOG_QUEUE_SIZE"] > 0:
+        _queue_handler, listener = start_log_queue(handlers, config["LOG_QUEUE_SIZE"])
+        # queued records are written before the process exits
+        atexit.register(listener.stop)
+        handlers = [_queue_handler]
+
+    # filters run in the calling thread, where the request id is set
+    for handler in handlers:
+        handler.addFilter(RequestIdFilter())
+        handler.addFilter(_sampler)
+        logger.addHandler(handler)
+
     return logger
 
+def logging_stats() -> dict:
+    """
+    Records waiting to be written, dropped because the queue was full, and
+    DEBUG records left out by sampling.
+    """
+    return {
+        "queued": _queue_handler.queue.qsize() if _queue_handler is not None else 0,
+        "dropped": _queue_handler.dropped if _queue_handler is not None else 0,
+        "sampled_out": _sampler.dropped,
+    }
+
 # setup logger
 logger = setup_logger('app')
@@ -0,0 +1,288 @@
+import math
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.constants import config
+from .logger import request_id_var
+
+# Prometheus client library default buckets, extended for slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    """
+    Monotonic counter with optional labels.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+class Histogram(_Metric):
+    """
+    Cumulative histogram with fixed upper bounds, exported as the usual
+    `_bucket`, `_sum` and `_count` series.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # per label set: bucket counts, sum, count
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+
+        lines = self.header()
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class MetricsRegistry:
+    """
+    In-process metrics registry rendered in the Prometheus text exposition
+    format, so `/metrics` can be scraped without an external collector.
+
+    Collectors registered with `register_collector` are called on every
+    scrape and return `(name, documentation, value, kind)` samples, with kind
+    "counter" or "gauge", which is how the counters already kept by the
+    caches and pools are exported.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, float, str]]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, float, str]]]):
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        for collector in collectors:
+            for name, documentation, value, kind in collector():
+                if value is None:
+                    continue
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {_format_value(float(value))}")
+
+        return "\n".join(lines) + "\n"
+
+def stats_metrics(prefix: str, stats: dict, documentation: str, gauges: Sequence[str] = ()) -> List[Tuple[str, str, float, str]]:
+    """
+    Turn the numeric top-level values of a `stats()` snapshot into samples
+    named `<prefix>_<key>`. Keys listed in `gauges` are point-in-time values
+    (sizes, in-flight work, rates); every other key is a cumulative count
+    since startup and is exported as a counter named `<prefix>_<key>_total`
+(a `_total` already inside the key, as in `wait_total_seconds`, moves to
+the end).
+    Nested values are skipped to keep label cardinality (e.g. per connection
+    URL) out of the export.
+    """
+    samples = []
+    for key, value in stats.items():
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            continue
+        doc = f"{documentation} ({key.replace('_', ' ')})"
+        if key in gauges:
+            samples.append((f"{prefix}_{key}", doc, value, "gauge"))
+        else:
+            samples.append((f"{prefix}_{key.replace('_total', '')}_total", doc, value, "counter"))
+    return samples
+
+# shared registry exported on /metrics
+metrics_registry = MetricsRegistry()
+
+http_requests_total = metrics_registry.counter(
+    "db_agent_http_requests_total", "HTTP requests by route and status code.", ["method", "route", "status"])
+http_request_duration = metrics_registry.histogram(
+    "db_agent_http_request_duration_seconds", "Time until the HTTP response is complete.", ["method", "route"])
+stage_duration = metrics_registry.histogram(
+    "db_agent_stage_duration_seconds", "Chat pipeline stages (history load, supervisor, agent hops, persistence).", ["stage"])
+llm_call_duration = metrics_registry.histogram(
+    "db_agent_llm_call_duration_seconds", "LLM calls by calling agent.", ["agent"])
+llm_calls_total = metrics_registry.counter(
+    "db_agent_llm_calls_total", "LLM calls by calling agent and outcome.", ["agent", "status"])
+llm_tokens_total = metrics_registry.counter(
+    "db_agent_llm_tokens_total", "Tokens reported by LLM calls.", ["agent", "type"])
+tool_call_duration = metrics_registry.histogram(
+    "db_agent_tool_call_duration_seconds", "Agent tool calls by tool.", ["tool"])
+tool_calls_total = metrics_registry.counter(
+    "db_agent_tool_calls_total", "Agent tool calls by tool and outcome.", ["tool", "status"])
+db_statement_duration = metrics_registry.histogram(
+    "db_agent_db_statement_duration_seconds", "SQL statements by database role (app or target).", ["database"])
+db_statement_errors_total = metrics_registry.counter(
+    "db_agent_db_statement_errors_total", "SQL statements that raised, by database role.", ["database"])
+
+def instrument_engine(sync_engine: Engine, database: str):
+    """
+    Time every statement executed on an engine. For async engines pass
+    `async_engine.sync_engine`.
+
+    Args:
+        sync_engine (Engine): The engine to instrument.
+        database (str): Value of the `database` label, "app" or "target".
+    """
+    if not config["METRICS_ENABLED"]:
+        return
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_statement_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_statement_start")
+        if starts:
+            db_statement_duration.observe(time.perf_counter() - starts.pop(), database=database)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("metrics_statement_start") if conn is not None else None
+        if starts:
+            starts.pop()
+        db_statement_errors_total.inc(database=database)
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware that assigns every HTTP request a request id, taken from
+    the `X-Request-ID` header or generated, echoes it on the response and
+    makes it available to log records, and records request counts and
+    durations by route template. Streaming responses are timed until their
+    last chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        status = {"code": 500}
+        start = time.perf_counter()
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            if config["METRICS_ENABLED"]:
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                method = scope.get("method", "")
+                http_request_duration.observe(time.perf_counter() - start, method=method, route=route)
+                http_requests_total.inc(method=method, route=route, status=str(status["code"]))
+            request_id_var.reset(token)
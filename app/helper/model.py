@@ -1,8 +1,105 @@
-from langchain_openai import ChatOpenAI
+import inspect
+import threading
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+from langchain_core.runnables import RunnableBinding
 from app.constants import config
+from .llm_cache import LLMResponseCache
+
+def build_llm_cache(temperature: float):
+    """
+    Build the persistent LLM response cache when it is enabled.
+
+    Responses sampled at a non-zero temperature are not reproducible, so the
+    cache is bypassed for them unless LLM_CACHE_ALLOW_NONZERO_TEMPERATURE is set.
+    """
+    if not config["LLM_CACHE_ENABLED"]:
+        return None
+
+    if temperature != 0 and not config["LLM_CACHE_ALLOW_NONZERO_TEMPERATURE"]:
+        return None
+
+    return LLMResponseCache(
+        path=config["LLM_CACHE_PATH"],
+        max_entries=config["LLM_CACHE_MAX_ENTRIES"],
+    )
+
+llm_cache = build_llm_cache(config["OPENAI_TEMPERATURE"])
+
+# the shared chat model, see `get_llm`
+_llm: Optional[BaseChatModel] = None
+_llm_lock = threading.Lock()
+
+def get_llm() -> BaseChatModel:
+    """
+    The chat model shared by the agents, built on first use so that
+    importing the app does not load the OpenAI client.
+    """
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                from .chat_openai import ProviderLimitedChatOpenAI
+
+                _llm = ProviderLimitedChatOpenAI(
+                    model=config["OPENAI_MODEL_ID"],
+                    temperature=config["OPENAI_TEMPERATURE"],
+                    api_key=config["OPENAI_API_KEY"],
+                    cache=llm_cache,
+                )
+    return _llm
+
+def use_llm(model: BaseChatModel):
+    """
+    Use `model` in place of the OpenAI chat model, e.g. a scripted model in
+    the benchmarks. Agents built before the call keep the previous model.
+    """
+    global _llm
+    with _llm_lock:
+        _llm = model
+
+class ShortcutChatModel(BaseChatModel):
+    """
+    Base for chat models that answer some calls locally and hand every other
+    call to the wrapped model.
+
+    Subclasses implement `shortcut` (and `ashortcut` when the decision needs
+    I/O), returning a ChatResult to skip the model or None to call it.
+    Results produced locally should carry a "fast_path" entry in their
+    generation_info, so timing and token accounting do not count them as
+    LLM calls. Calls that reach the wrapped model go through its response
+    cache and stream through this model's run.
+    """
+
+    model: Any
+
+    def bind_tools(self, tools, *, parallel_tool_calls: Optional[bool] = None, **kwargs):
+        if parallel_tool_calls is not None and "parallel_tool_calls" in inspect.signature(self.model.bind_tools).parameters:
+            kwargs["parallel_tool_calls"] = parallel_tool_calls
+        bound = self.model.bind_tools(tools, **kwargs)
+
+        # the wrapped model's own generate is called with the bound tool options
+        if isinstance(bound, RunnableBinding):
+            return self.bind(**bound.kwargs)
+        return self.model_copy(update={"model": bound})
+
+    def shortcut(self, messages: List[BaseMessage]) -> Optional[ChatResult]:
+        return None
+
+    async def ashortcut(self, messages: List[BaseMessage]) -> Optional[ChatResult]:
+        return self.shortcut(messages)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        result = self.shortcut(messages)
+        if result is not None:
+            return result
+        return self.model._generate_with_cache(messages, stop=stop, run_manager=run_manager, **kwargs)
 
-llm = ChatOpenAI(
-    model=config["OPENAI_MODEL_ID"],
-    temperature=0.9,
-    api_key=config["OPENAI_API_KEY"],
-)
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        result = await self.ashortcut(messages)
+        if result is not None:
+            return result
+        return await self.model._agenerate_with_cache(messages, stop=stop, run_manager=run_manager, **kwargs)
@@ -0,0 +1,160 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from app.constants import config
+from .tokens import is_fast_path_result
+from .metrics import stage_duration, llm_call_duration, llm_calls_total, llm_tokens_total, tool_call_duration, tool_calls_total
+
+# per-request stage durations, see `start_stage_timing`
+_stage_timings: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("stage_timings", default=None)
+
+# graph nodes timed as supervisor / agent hops
+TIMED_AGENTS = {"supervisor", "db_assistant", "graph_generation_agent"}
+
+def start_stage_timing() -> Dict[str, List[float]]:
+    """
+    Start collecting stage durations for the current request. Until this is
+    called, `stage_timer` and `stage_timing_callbacks` only feed the
+    `/metrics` histograms (or are no-ops when METRICS_ENABLED is false).
+
+    Returns:
+        Dict[str, List[float]]: Durations in seconds by stage name, filled in place.
+    """
+    timings: Dict[str, List[float]] = {}
+    _stage_timings.set(timings)
+    return timings
+
+def record_stage(stage: str, seconds: float):
+    timings = _stage_timings.get()
+    if timings is not None:
+        timings.setdefault(stage, []).append(seconds)
+    if config["METRICS_ENABLED"]:
+        stage_duration.observe(seconds, stage=stage)
+
+@contextmanager
+def stage_timer(stage: str):
+    """
+    Time a block of code as one occurrence of a stage.
+    """
+    if _stage_timings.get() is None and not config["METRICS_ENABLED"]:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+class StageTimingCallback(BaseCallbackHandler):
+    """
+    Callback handler that records agent hops, tool calls and LLM calls of a
+    run as stages ("agent:<name>", "tool:<name>", "llm", or "fast_path" for
+    router steps that skipped the model) and, when metrics are enabled, as
+    `/metrics` histograms with LLM calls labelled by the agent that made them.
+    """
+
+    # record on the calling thread so the request's context is used
+    run_inline = True
+
+    def __init__(self, timings: Optional[Dict[str, List[float]]] = None):
+        self.timings = timings
+        self.metrics = config["METRICS_ENABLED"]
+        self._started: Dict[UUID, tuple] = {}
+        # nearest timed agent of every open chain, so nested graph nodes of
+        # the same agent are not counted twice
+        self._agent_of: Dict[UUID, Optional[str]] = {}
+
+    def _start(self, run_id: UUID, stage: str, agent: Optional[str] = None):
+        self._started[run_id] = (stage, agent, time.perf_counter())
+
+    def _end(self, run_id: UUID, error: bool = False) -> Optional[tuple]:
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return None
+
+        stage, agent, start = started
+        seconds = time.perf_counter() - start
+        if self.timings is not None:
+            self.timings.setdefault(stage, []).append(seconds)
+
+        if self.metrics:
+            status = "error" if error else "ok"
+            if stage == "llm":
+                llm_call_duration.observe(seconds, agent=agent or "none")
+                llm_calls_total.inc(agent=agent or "none", status=status)
+            elif stage.startswith("tool:"):
+                tool_call_duration.observe(seconds, tool=stage[len("tool:"):])
+                tool_calls_total.inc(tool=stage[len("tool:"):], status=status)
+            else:
+                stage_duration.observe(seconds, stage=stage)
+
+        return started
+
+    def on_chain_start(self, serialized: Optional[Dict[str, Any]], inputs: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name")
+        agent = self._agent_of.get(parent_run_id)
+
+        if name in TIMED_AGENTS and name != agent:
+            agent = name
+            self._start(run_id, f"agent:{name}")
+
+        self._agent_of[run_id] = agent
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._agent_of.pop(run_id, None)
+        self._end(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._agent_of.pop(run_id, None)
+        self._end(run_id, error=True)
+
+    def on_tool_start(self, serialized: Optional[Dict[str, Any]], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name")
+        self._start(run_id, f"tool:{name}")
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error=True)
+
+    def on_chat_model_start(self, serialized: Optional[Dict[str, Any]], messages: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self._start(run_id, "llm", self._agent_of.get(parent_run_id))
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        if run_id in self._started and is_fast_path_result(response):
+            _, agent, start = self._started[run_id]
+            self._started[run_id] = ("fast_path", agent, start)
+            self._end(run_id)
+            return
+
+        started = self._end(run_id)
+        if started is None or not self.metrics:
+            return
+
+        agent = started[1] or "none"
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                llm_tokens_total.inc(int(usage.get("input_tokens", 0)), agent=agent, type="prompt")
+                llm_tokens_total.inc(int(usage.get("output_tokens", 0)), agent=agent, type="completion")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error=True)
+
+def stage_timing_callbacks() -> list:
+    """
+    Callbacks to attach to a graph run so its stages are timed, or an empty
+    list when neither stage timing was started for the current request nor
+    metrics are enabled.
+    """
+    timings = _stage_timings.get()
+    if timings is None and not config["METRICS_ENABLED"]:
+        return []
+    return [StageTimingCallback(timings)]
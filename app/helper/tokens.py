@@ -0,0 +1,81 @@
+from functools import lru_cache
+from typing import Any
+
+import tiktoken
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from app.constants import config
+
+# rough characters-per-token ratio used when no tokenizer can be loaded
+FALLBACK_CHARS_PER_TOKEN = 4
+
+@lru_cache(maxsize=None)
+def _encoding():
+    # tiktoken downloads its BPE files on first use; offline hosts fall back to an estimate
+    try:
+        return tiktoken.encoding_for_model(config["OPENAI_MODEL_ID"])
+    except KeyError:
+        try:
+            return tiktoken.get_encoding("o200k_base")
+        except Exception:
+            return None
+    except Exception:
+        return None
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with the tokenizer of the configured OpenAI model.
+
+    Args:
+        text (str): The text to measure.
+    Returns:
+        int: The token count, estimated from the text length when the tokenizer is unavailable.
+    """
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + FALLBACK_CHARS_PER_TOKEN - 1) // FALLBACK_CHARS_PER_TOKEN
+
+    return len(encoding.encode(text, disallowed_special=()))
+
+def is_fast_path_result(response: LLMResult) -> bool:
+    """
+    Whether an LLM result was produced by the chat router's fast path instead
+    of a model call (see app/agents/chat_agent/router.py).
+    """
+    return any(
+        (generation.generation_info or {}).get("fast_path")
+        for generations in response.generations
+        for generation in generations
+    )
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """
+    Callback handler that adds up the token usage reported by every LLM call
+    of a run, including the calls made by sub-agents. Steps answered by the
+    chat router's fast path are not counted as calls.
+    """
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        if is_fast_path_result(response):
+            return
+
+        self.llm_calls += 1
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                self.prompt_tokens += int(usage.get("input_tokens", 0))
+                self.completion_tokens += int(usage.get("output_tokens", 0))
+
+    def stats(self) -> dict:
+        return {
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
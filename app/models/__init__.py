@@ -2,3 +2,4 @@ from .base import BaseModel
 from .user import User
 from .session import Session
 from .session_chat import SessionChat, MessageRole
+from .checkpoint import chat_checkpoints, chat_checkpoint_blobs, chat_checkpoint_writes
@@ -0,0 +1,49 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String, Table
+from sqlmodel import SQLModel
+
+# Tables of the LangGraph checkpointer (see app/db/checkpointer.py). They hold
+# serialized graph state keyed by thread and checkpoint ids rather than
+# application records, so they are plain tables instead of SQLModel models.
+
+# one row per checkpoint, without its channel values
+chat_checkpoints = Table(
+    "chat_checkpoints",
+    SQLModel.metadata,
+    Column("thread_id", String, primary_key=True),
+    Column("checkpoint_ns", String, primary_key=True, default=""),
+    Column("checkpoint_id", String, primary_key=True),
+    Column("parent_checkpoint_id", String, nullable=True),
+    Column("checkpoint_type", String, nullable=False),
+    Column("checkpoint", LargeBinary, nullable=False),
+    Column("metadata_type", String, nullable=False),
+    Column("metadata", LargeBinary, nullable=False),
+    Column("created_at", DateTime, nullable=False, default=datetime.utcnow, index=True),
+)
+
+# channel values by version, only written when a channel changes
+chat_checkpoint_blobs = Table(
+    "chat_checkpoint_blobs",
+    SQLModel.metadata,
+    Column("thread_id", String, primary_key=True),
+    Column("checkpoint_ns", String, primary_key=True, default=""),
+    Column("channel", String, primary_key=True),
+    Column("version", String, primary_key=True),
+    Column("type", String, nullable=False),
+    Column("blob", LargeBinary, nullable=True),
+)
+
+# pending writes of the tasks of a checkpoint
+chat_checkpoint_writes = Table(
+    "chat_checkpoint_writes",
+    SQLModel.metadata,
+    Column("thread_id", String, primary_key=True),
+    Column("checkpoint_ns", String, primary_key=True, default=""),
+    Column("checkpoint_id", String, primary_key=True),
+    Column("task_id", String, primary_key=True),
+    Column("idx", Integer, primary_key=True),
+    Column("channel", String, nullable=False),
+    Column("type", String, nullable=True),
+    Column("blob", LargeBinary, nullable=True),
+    Column("task_path", String, nullable=False, default=""),
+)
@@ -1,5 +1,7 @@
+from datetime import datetime
+from typing import Optional
 from uuid import UUID
-from sqlmodel import Field
+from sqlmodel import Field, Column, Text
 
 from .base import BaseModel
 
@@ -30,3 +32,31 @@ class Session(BaseModel, table=True):
         max_length=255,
         index=True
     )
+    
+    # rolling summary of the conversation up to history_summary_until
+    history_summary: Optional[str] = Field(
+        default=None,
+        sa_column=Column(Text, nullable=True),
+        description="Summary of the session messages older than history_summary_until"
+    )
+    
+    history_summary_until: Optional[datetime] = Field(
+        default=None,
+        description="Creation time of the newest message folded into the history summary"
+    )
+    
+    # run_query guard thresholds, None uses the configured defaults
+    query_max_cost: Optional[float] = Field(
+        default=None,
+        description="Maximum planner cost of queries run by the agent"
+    )
+    
+    query_max_plan_rows: Optional[int] = Field(
+        default=None,
+        description="Maximum planner row estimate of queries run by the agent"
+    )
+    
+    query_statement_timeout_ms: Optional[int] = Field(
+        default=None,
+        description="Statement timeout of queries run by the agent, in milliseconds"
+    )
@@ -1,5 +1,6 @@
+from typing import Optional
 from uuid import UUID
-from sqlmodel import Field
+from sqlmodel import Field, Index, text
 from enum import Enum
 
 from .base import BaseModel
@@ -19,6 +20,11 @@ class SessionChat(BaseModel, table=True):
     
     __tablename__ = "session_chats"
     
+    # serves "latest messages of a session" reads and keyset pagination
+    __table_args__ = (
+        Index("ix_session_chats_session_id_created_at", "session_id", text("created_at DESC"), text("id DESC")),
+    )
+    
     # Foreign keys
     session_id: UUID = Field(
         foreign_key="sessions.id",
@@ -39,3 +45,10 @@ class SessionChat(BaseModel, table=True):
         default=False,
         description="Indicates if this is the final message in the session chat"
     )
+    
+    # stored query result referenced by this message, see GET /result/{handle}
+    result_handle: Optional[str] = Field(
+        default=None,
+        max_length=32,
+        description="Handle of the full query result in the result store"
+    )
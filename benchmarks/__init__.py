@@ -0,0 +1,6 @@
+"""
+Benchmarks for the chat pipeline that run without OpenAI, using a scripted
+chat model and a locally seeded target database.
+
+Run `python -m benchmarks.chat_pipeline --help` for the options.
+"""
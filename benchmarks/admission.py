@@ -0,0 +1,167 @@
+"""
+Benchmark of the admission control in front of the chat supervisor.
+
+Fires a burst of chat turns from many sessions of several users through
+`user_chat_controller` with the scripted chat model, which slows down like a
+saturated provider once more than `--llm-capacity` calls are in flight. The
+burst runs once with admission control disabled and once enabled, and the
+report compares turn latency (admitted turns), the turns refused with
+Retry-After, and the time admitted turns spent queued.
+
+The application database configured through DB_* must be reachable and
+migrated; the target database defaults to a local SQLite file.
+
+Example:
+    python -m benchmarks.admission --users 4 --sessions-per-user 16 --max-active 8 --output admission.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import List
+
+from .chat_pipeline import SCRIPT, create_sessions, delete_sessions, git_revision, summarize
+from .datasets import seed_schema, bench_table
+
+from app.constants import config
+from app.db import chat_write_behind
+from app.helper import AdmissionRejected, turn_admission
+from app.controllers.chat.functions.user_chat import user_chat_controller
+
+async def run_client(session_id, turns: int, latencies: List[float], rejections: Counter, retry_after: List[float], errors: List[str]):
+    for turn in range(turns):
+        start = time.perf_counter()
+        try:
+            await user_chat_controller(session_id, f"What is the total amount per category? (turn {turn})")
+        except AdmissionRejected as e:
+            rejections[e.reason] += 1
+            retry_after.append(e.retry_after)
+            continue
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+
+async def run_burst(args, db_url: str, enabled: bool) -> dict:
+    config["ADMISSION_ENABLED"] = enabled
+    users = [create_sessions(db_url, args.sessions_per_user) for _ in range(args.users)]
+
+    latencies: List[float] = []
+    rejections: Counter = Counter()
+    retry_after: List[float] = []
+    errors: List[str] = []
+    before = turn_admission.stats()
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*[
+            run_client(session_id, args.turns, latencies, rejections, retry_after, errors)
+            for _, session_ids in users
+            for session_id in session_ids
+        ])
+    finally:
+        elapsed = time.perf_counter() - start
+        await asyncio.to_thread(chat_write_behind.drain)
+        if not args.keep_sessions:
+            for user_id, session_ids in users:
+                delete_sessions(user_id, session_ids)
+
+    after = turn_admission.stats()
+    waits = after["waits"] - before["waits"]
+
+    return {
+        "admission": "on" if enabled else "off",
+        "turns": len(latencies),
+        "rejected": sum(rejections.values()),
+        "rejected_by_reason": dict(rejections),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "elapsed_seconds": elapsed,
+        "throughput_turns_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "turn_latency": summarize(latencies),
+        "retry_after": summarize(retry_after),
+        "peak_active_turns": after["peak"] if enabled else None,
+        "queued_turns": waits,
+        "mean_queue_wait_seconds": (after["wait_total_seconds"] - before["wait_total_seconds"]) / waits if waits else 0.0,
+    }
+
+async def main(args) -> dict:
+    SCRIPT["latency"] = args.llm_latency
+    SCRIPT["capacity"] = args.llm_capacity
+    config["QUERY_CACHE_ENABLED"] = False
+    config["PLAN_CACHE_ENABLED"] = False
+
+    turn_admission.max_active = args.max_active
+    turn_admission.max_active_per_database = args.max_active
+    turn_admission.max_queued = args.max_queued
+    turn_admission.max_queued_per_user = args.max_queued_per_user
+    turn_admission.queue_timeout = args.queue_timeout
+
+    db_url = args.target_db
+    SCRIPT["schema_name"] = seed_schema(db_url, args.tables, rows=args.rows)
+    SCRIPT["query"] = f"SELECT category, count(*) AS n FROM {bench_table(db_url, args.tables)} GROUP BY category"
+
+    results = []
+    for enabled in (False, True):
+        result = await run_burst(args, db_url, enabled)
+        results.append(result)
+        print(
+            f"admission={result['admission']} turns={result['turns']} rejected={result['rejected']} errors={result['errors']} "
+            f"p50={result['turn_latency'].get('p50', 0):.3f}s p95={result['turn_latency'].get('p95', 0):.3f}s "
+            f"max={result['turn_latency'].get('max', 0):.3f}s queue_wait={result['mean_queue_wait_seconds']:.3f}s",
+            file=sys.stderr,
+        )
+
+    return {
+        "benchmark": "admission",
+        "revision": git_revision(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "settings": {
+            "target_db": db_url,
+            "tables": args.tables,
+            "rows": args.rows,
+            "users": args.users,
+            "sessions_per_user": args.sessions_per_user,
+            "turns_per_session": args.turns,
+            "llm_latency": args.llm_latency,
+            "llm_capacity": args.llm_capacity,
+            "max_active": args.max_active,
+            "max_queued": args.max_queued,
+            "max_queued_per_user": args.max_queued_per_user,
+            "queue_timeout": args.queue_timeout,
+        },
+        "results": results,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the admission control in front of the chat supervisor.")
+    parser.add_argument("--target-db", default="sqlite:////tmp/db_agent_bench_admission.sqlite3", help="target database URL")
+    parser.add_argument("--tables", type=int, default=10, help="synthetic schema size")
+    parser.add_argument("--rows", type=int, default=1000, help="rows in the queried table")
+    parser.add_argument("--users", type=int, default=4, help="users in the burst")
+    parser.add_argument("--sessions-per-user", type=int, default=16, help="concurrent sessions of each user")
+    parser.add_argument("--turns", type=int, default=1, help="chat turns per session")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="simulated seconds per LLM call")
+    parser.add_argument("--llm-capacity", type=int, default=8, help="LLM calls in flight before the simulated provider slows down")
+    parser.add_argument("--max-active", type=int, default=8, help="turns run at once with admission control")
+    parser.add_argument("--max-queued", type=int, default=256, help="turns waiting in total")
+    parser.add_argument("--max-queued-per-user", type=int, default=8, help="turns waiting per user")
+    parser.add_argument("--queue-timeout", type=float, default=30, help="longest wait of a queued turn")
+    parser.add_argument("--keep-sessions", action="store_true", help="do not delete the benchmark sessions")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
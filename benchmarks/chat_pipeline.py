@@ -0,0 +1,243 @@
+"""
+Benchmark of the chat pipeline with a scripted chat model.
+
+Seeds a target database with synthetic schemas, then drives chat turns
+through `user_chat_controller` (or the FastAPI app) from N concurrent
+clients and reports per-stage latency, throughput and peak memory as JSON.
+
+The application database configured through DB_* must be reachable; the
+target database defaults to a local SQLite file.
+
+Example:
+    python -m benchmarks.chat_pipeline --tables 10 100 1000 --concurrency 1 8 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List
+
+# the OpenAI client is built at import time but never called
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from app.helper import use_llm
+from .fake_llm import ScriptedChatModel
+from .datasets import seed_schema, bench_table
+
+# install the scripted model before the agents are built
+scripted_llm = ScriptedChatModel(script={"schema_name": "public", "query": "SELECT 1", "latency": 0.0, "relevant_schema": False})
+use_llm(scripted_llm)
+
+# shared with every copy of the model bound to tools; updated per scenario
+SCRIPT: Dict = scripted_llm.script
+
+from sqlmodel import Session, delete
+from app.constants import config
+from app.db import engine, chat_write_behind
+from app.models import User, Session as UserSession, SessionChat
+from app.helper import start_stage_timing
+from app.agents.db_agent.tools import schema_cache, query_cache, sql_plan_cache
+from app.controllers.chat.functions import user_chat_controller
+
+def summarize(values: List[float]) -> dict:
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+
+    def percentile(p: float) -> float:
+        return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+
+    return {
+        "count": len(values),
+        "total": sum(values),
+        "mean": statistics.fmean(values),
+        "p50": percentile(0.5),
+        "p95": percentile(0.95),
+        "max": values[-1],
+    }
+
+def create_sessions(db_url: str, count: int):
+    with Session(engine) as session:
+        user = User(email=f"benchmark-{time.time_ns()}@example.com", name="benchmark")
+        session.add(user)
+        session.commit()
+
+        sessions = [UserSession(name="benchmark", user_id=user.id, db_connection_url=db_url) for _ in range(count)]
+        session.add_all(sessions)
+        session.commit()
+
+        return user.id, [chat_session.id for chat_session in sessions]
+
+def delete_sessions(user_id, session_ids):
+    with Session(engine) as session:
+        session.exec(delete(SessionChat).where(SessionChat.session_id.in_(session_ids)))
+        session.exec(delete(UserSession).where(UserSession.id.in_(session_ids)))
+        session.exec(delete(User).where(User.id == user_id))
+        session.commit()
+
+async def run_client(send, session_id, turns: int, latencies: List[float], stages: Dict[str, List[float]], errors: List[str]):
+    for turn in range(turns):
+        timings = start_stage_timing()
+        start = time.perf_counter()
+        try:
+            await send(session_id, f"What is the total amount per category? (turn {turn})")
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+
+        for stage, durations in timings.items():
+            stages.setdefault(stage, []).extend(durations)
+
+async def run_scenario(args, db_url: str, tables: int, concurrency: int) -> dict:
+    user_id, session_ids = create_sessions(db_url, concurrency)
+
+    if args.mode == "api":
+        import httpx
+        import main
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark", timeout=None)
+
+        async def send(session_id, query):
+            response = await client.get("/api/v1/chat", params={"session_id": str(session_id), "query": query})
+            response.raise_for_status()
+    else:
+        client = None
+
+        async def send(session_id, query):
+            await user_chat_controller(session_id, query)
+
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    errors: List[str] = []
+
+    if args.trace_memory:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*[
+            run_client(send, session_id, args.turns, latencies, stages, errors)
+            for session_id in session_ids
+        ])
+    finally:
+        elapsed = time.perf_counter() - start
+        if client is not None:
+            await client.aclose()
+
+    peak_memory = {"max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    if args.trace_memory:
+        peak_memory["tracemalloc_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    await asyncio.to_thread(chat_write_behind.drain)
+    if not args.keep_sessions:
+        delete_sessions(user_id, session_ids)
+
+    return {
+        "tables": tables,
+        "mode": args.mode,
+        "concurrency": concurrency,
+        "turns": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "elapsed_seconds": elapsed,
+        "throughput_turns_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "turn_latency": summarize(latencies),
+        "stages": {stage: summarize(durations) for stage, durations in sorted(stages.items())},
+        "peak_memory": peak_memory,
+    }
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+async def main(args) -> dict:
+    SCRIPT["latency"] = args.llm_latency
+    SCRIPT["relevant_schema"] = args.relevant_schema
+    config["QUERY_CACHE_ENABLED"] = args.query_cache
+    config["PLAN_CACHE_ENABLED"] = args.plan_cache
+    # every session belongs to one user, whose queue would cap the concurrency
+    config["ADMISSION_ENABLED"] = False
+
+    results = []
+    for tables in args.tables:
+        db_url = args.target_db.format(tables=tables)
+        SCRIPT["schema_name"] = seed_schema(db_url, tables, rows=args.rows)
+        SCRIPT["query"] = args.query.format(table=bench_table(db_url, tables))
+
+        for concurrency in args.concurrency:
+            schema_cache.invalidate(db_url)
+            query_cache.invalidate(db_url)
+            sql_plan_cache.invalidate(db_url)
+
+            result = await run_scenario(args, db_url, tables, concurrency)
+            results.append(result)
+            print(
+                f"tables={tables} concurrency={concurrency} turns={result['turns']} "
+                f"p50={result['turn_latency'].get('p50', 0):.4f}s "
+                f"throughput={result['throughput_turns_per_second']:.1f}/s errors={result['errors']}",
+                file=sys.stderr,
+            )
+
+    return {
+        "benchmark": "chat_pipeline",
+        "revision": git_revision(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "settings": {
+            "mode": args.mode,
+            "target_db": args.target_db,
+            "turns_per_client": args.turns,
+            "rows": args.rows,
+            "query": args.query,
+            "llm_latency": args.llm_latency,
+            "relevant_schema": args.relevant_schema,
+            "query_cache": args.query_cache,
+            "plan_cache": args.plan_cache,
+            "chat_persistence_mode": config["CHAT_PERSISTENCE_MODE"],
+        },
+        "results": results,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the chat pipeline with a scripted chat model.")
+    parser.add_argument("--target-db", default="sqlite:////tmp/db_agent_bench_{tables}.sqlite3",
+                        help="target database URL, '{tables}' is replaced by the schema size")
+    parser.add_argument("--tables", type=int, nargs="+", default=[10, 100, 1000], help="synthetic schema sizes")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8], help="concurrent clients")
+    parser.add_argument("--turns", type=int, default=5, help="chat turns per client")
+    parser.add_argument("--rows", type=int, default=1000, help="rows in the queried table")
+    parser.add_argument("--query", default="SELECT category, count(*) AS n, sum(amount) AS total FROM {table} GROUP BY category",
+                        help="SQL run by the scripted agent, '{table}' is replaced by the queried table")
+    parser.add_argument("--mode", choices=["controller", "api"], default="controller",
+                        help="call user_chat_controller directly or go through the FastAPI app")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated seconds per LLM call")
+    parser.add_argument("--relevant-schema", action="store_true", help="use fetch_relevant_schema instead of fetch_schema")
+    parser.add_argument("--query-cache", action="store_true", help="keep the run_query result cache enabled")
+    parser.add_argument("--plan-cache", action="store_true", help="keep the SQL plan cache enabled")
+    parser.add_argument("--trace-memory", action="store_true", help="also report the tracemalloc peak (slower)")
+    parser.add_argument("--keep-sessions", action="store_true", help="do not delete the benchmark sessions")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
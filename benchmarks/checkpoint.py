@@ -0,0 +1,196 @@
+"""
+Benchmark of per-turn history assembly with and without the supervisor checkpointer.
+
+Runs long chat sessions through `user_chat_controller` with the scripted chat
+model once per checkpointer backend and reports, by turn depth, the time spent
+assembling the supervisor input (`history_load`), running the graph
+(`supervisor`, which includes loading and writing the checkpoint), writing
+checkpoints (`checkpoint_write`) and pruning them (`checkpoint`), plus the
+number of messages sent per turn and the checkpoint bytes written.
+
+The application database configured through DB_* must be reachable and
+migrated; the target database defaults to a local SQLite file.
+
+Example:
+    python -m benchmarks.checkpoint --checkpointers none postgres sqlite --turns 40 --output checkpoint.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from .chat_pipeline import SCRIPT, create_sessions, delete_sessions, git_revision, summarize
+from .datasets import seed_schema, bench_table
+
+from app.constants import config
+from app.db import chat_write_behind
+from app.db.checkpointer import create_checkpointer
+from app.helper import start_stage_timing
+from app.agents import get_workflow
+from app.controllers.chat.functions import user_chat
+from app.controllers.chat.functions.user_chat import user_chat_controller
+
+STAGES = ("history_load", "supervisor", "checkpoint_write", "checkpoint")
+
+def use_checkpointer(backend: str):
+    """
+    Point the chat controller at a supervisor compiled with the given backend.
+    """
+    saver = create_checkpointer(backend)
+    supervisor = get_workflow().compile(checkpointer=saver)
+
+    async def aget_supervisor():
+        return supervisor
+
+    user_chat.aget_supervisor = aget_supervisor
+    user_chat.chat_checkpointer = saver
+    return saver
+
+# messages sent to the supervisor by the last turn of each session
+SENT: Dict = {}
+
+def count_sent_messages():
+    """
+    Wrap the controller's history loading to record how many messages each turn sends.
+    """
+    load = user_chat.load_conversation_history
+
+    async def counting_load(session_id, query):
+        old_conversation_history, conversation_history = await load(session_id, query)
+        SENT[session_id] = len(conversation_history)
+        return old_conversation_history, conversation_history
+
+    user_chat.load_conversation_history = counting_load
+
+async def run_client(session_id, turns: int, by_depth: Dict[int, Dict[str, List[float]]], errors: List[str]):
+    for turn in range(turns):
+        timings = start_stage_timing()
+        try:
+            await user_chat_controller(session_id, f"What is the total amount per category? (turn {turn})")
+        except Exception as e:
+            errors.append(str(e))
+            continue
+
+        depth = by_depth.setdefault(turn, {})
+        depth.setdefault("messages_sent", []).append(SENT.get(session_id, 0))
+        for stage in STAGES:
+            depth.setdefault(stage, []).append(sum(timings.get(stage, [])))
+
+async def run_backend(args, db_url: str, backend: str) -> dict:
+    saver = use_checkpointer(backend)
+    user_id, session_ids = create_sessions(db_url, args.concurrency)
+
+    by_depth: Dict[int, Dict[str, List[float]]] = {}
+    errors: List[str] = []
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*[run_client(session_id, args.turns, by_depth, errors) for session_id in session_ids])
+    finally:
+        elapsed = time.perf_counter() - start
+        await asyncio.to_thread(chat_write_behind.drain)
+        if saver is not None:
+            for session_id in session_ids:
+                await saver.adelete_thread(session_id)
+        if not args.keep_sessions:
+            delete_sessions(user_id, session_ids)
+
+    # turns grouped into windows of increasing history depth
+    windows = []
+    for first in range(0, args.turns, args.window):
+        turns = range(first, min(first + args.window, args.turns))
+        windows.append({
+            "turns": f"{turns[0] + 1}-{turns[-1] + 1}",
+            **{
+                stage: summarize([value for turn in turns for value in by_depth.get(turn, {}).get(stage, [])])
+                for stage in ("messages_sent", *STAGES)
+            },
+        })
+
+    return {
+        "checkpointer": backend,
+        "turns": sum(len(depth["messages_sent"]) for depth in by_depth.values()),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "elapsed_seconds": elapsed,
+        "windows": windows,
+        "checkpoint_stats": saver.stats() if saver is not None else None,
+    }
+
+async def main(args) -> dict:
+    config["HISTORY_TOKEN_BUDGET"] = args.history_budget
+    config["HISTORY_MAX_MESSAGES"] = args.history_max_messages
+    config["QUERY_CACHE_ENABLED"] = False
+    config["PLAN_CACHE_ENABLED"] = False
+
+    db_url = args.target_db
+    SCRIPT["schema_name"] = seed_schema(db_url, args.tables, rows=args.rows)
+    SCRIPT["query"] = args.query.format(table=bench_table(db_url, args.tables))
+
+    count_sent_messages()
+
+    results = []
+    for backend in args.checkpointers:
+        result = await run_backend(args, db_url, backend)
+        results.append(result)
+
+        last = result["windows"][-1]
+        print(
+            f"checkpointer={backend} turns={result['turns']} errors={result['errors']} "
+            f"last window history_load p50={last['history_load'].get('p50', 0) * 1000:.2f}ms "
+            f"supervisor p50={last['supervisor'].get('p50', 0) * 1000:.2f}ms "
+            f"messages sent p50={last['messages_sent'].get('p50', 0)}",
+            file=sys.stderr,
+        )
+
+    return {
+        "benchmark": "checkpoint",
+        "revision": git_revision(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "settings": {
+            "target_db": db_url,
+            "tables": args.tables,
+            "rows": args.rows,
+            "turns_per_client": args.turns,
+            "concurrency": args.concurrency,
+            "history_budget": args.history_budget,
+            "history_max_messages": args.history_max_messages,
+            "checkpoint_keep_last": config["CHECKPOINT_KEEP_LAST"],
+        },
+        "results": results,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark history assembly with and without the supervisor checkpointer.")
+    parser.add_argument("--checkpointers", nargs="+", choices=["none", "postgres", "sqlite"], default=["none", "postgres"],
+                        help="checkpointer backends to compare")
+    parser.add_argument("--target-db", default="sqlite:////tmp/db_agent_bench_checkpoint.sqlite3", help="target database URL")
+    parser.add_argument("--tables", type=int, default=10, help="synthetic schema size")
+    parser.add_argument("--rows", type=int, default=1000, help="rows in the queried table")
+    parser.add_argument("--query", default="SELECT category, count(*) AS n, sum(amount) AS total FROM {table} GROUP BY category",
+                        help="SQL run by the scripted agent, '{table}' is replaced by the queried table")
+    parser.add_argument("--turns", type=int, default=40, help="chat turns per session")
+    parser.add_argument("--window", type=int, default=10, help="turns per reported window")
+    parser.add_argument("--concurrency", type=int, default=1, help="concurrent sessions")
+    parser.add_argument("--history-budget", type=int, default=200000,
+                        help="HISTORY_TOKEN_BUDGET for the run, large enough that sessions are not reset or summarized")
+    parser.add_argument("--history-max-messages", type=int, default=1000,
+                        help="HISTORY_MAX_MESSAGES for the run, so both paths send the whole session")
+    parser.add_argument("--keep-sessions", action="store_true", help="do not delete the benchmark sessions")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,64 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+def bench_schema_name(db_url: str, tables: int) -> str:
+    """
+    Schema holding the synthetic tables: one schema per size on PostgreSQL,
+    the default schema (reported as 'public') elsewhere.
+    """
+    if make_url(db_url).get_backend_name() == "postgresql":
+        return f"bench_{tables}"
+    return "public"
+
+def bench_table(db_url: str, tables: int, index: int = 0) -> str:
+    name = f"bench_t{index:04d}"
+    schema_name = bench_schema_name(db_url, tables)
+    return name if schema_name == "public" else f"{schema_name}.{name}"
+
+def seed_schema(db_url: str, tables: int, rows: int = 1000) -> str:
+    """
+    Create `tables` synthetic tables chained by foreign keys, and fill the
+    first one with `rows` rows. Existing benchmark tables of that size are
+    replaced.
+
+    Args:
+        db_url (str): Target database URL (PostgreSQL or SQLite).
+        tables (int): Number of tables to create.
+        rows (int): Rows inserted into the first table.
+    Returns:
+        str: The schema name to pass to fetch_schema.
+    """
+    schema_name = bench_schema_name(db_url, tables)
+    is_postgres = schema_name != "public"
+    engine = create_engine(db_url)
+
+    with engine.begin() as conn:
+        if is_postgres:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {schema_name} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {schema_name}"))
+        else:
+            for index in reversed(range(tables)):
+                conn.execute(text(f"DROP TABLE IF EXISTS {bench_table(db_url, tables, index)}"))
+
+        for index in range(tables):
+            parent = ""
+            if index > 0:
+                parent = f", parent_id INTEGER REFERENCES {bench_table(db_url, tables, index - 1)}(id)"
+
+            conn.execute(text(
+                f"CREATE TABLE {bench_table(db_url, tables, index)} ("
+                f"id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, category VARCHAR(20), "
+                f"amount NUMERIC(12, 2), created_at TIMESTAMP{parent})"
+            ))
+
+        conn.execute(
+            text(f"INSERT INTO {bench_table(db_url, tables)} (id, name, category, amount, created_at) "
+                 f"VALUES (:id, :name, :category, :amount, CURRENT_TIMESTAMP)"),
+            [
+                {"id": i, "name": f"item {i}", "category": f"c{i % 7}", "amount": i % 1000}
+                for i in range(rows)
+            ],
+        )
+
+    engine.dispose()
+    return schema_name
@@ -0,0 +1,128 @@
+import asyncio
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+URL_PATTERN = re.compile(r"Use this DB Connection URL to connect to the database:\s*(\S+)")
+
+SCHEMA_TOOLS = {"fetch_schema", "fetch_relevant_schema"}
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for the OpenAI chat model.
+
+    The role it plays is inferred from the tools bound to it: the supervisor
+    hands every new user message to db_assistant and answers with its result,
+    db_assistant fetches the schema, runs `script["query"]` and reports the
+    rows, and the graph agent returns a fixed chart. With `script["query_for"]`,
+    a function of the user's question, every question gets its own query.
+    Copies bound to tools share the model's `script` dict, so updating it
+    changes the schema and query for every agent between runs.
+    """
+
+    script: Dict[str, Any]
+    tool_names: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        names = []
+        for tool in tools:
+            name = getattr(tool, "name", None) or getattr(tool, "__name__", None)
+            if name is None and isinstance(tool, dict):
+                name = tool.get("name") or tool.get("function", {}).get("name")
+            names.append(name)
+        return self.model_copy(update={"tool_names": names})
+
+    def _tool_call(self, name: str, args: dict) -> AIMessage:
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}])
+
+    def _query(self, messages: List[BaseMessage]) -> str:
+        query_for = self.script.get("query_for")
+        if query_for is None:
+            return self.script["query"]
+        question = next(m for m in reversed(messages) if isinstance(m, HumanMessage))
+        return query_for(str(question.content))
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        last = messages[-1]
+
+        if "OutputSchema" in self.tool_names:
+            return self._tool_call("OutputSchema", {"results": "<div>chart</div>"})
+
+        if "transfer_to_db_assistant" in self.tool_names:
+            if isinstance(last, HumanMessage):
+                return self._tool_call("transfer_to_db_assistant", {})
+
+            answers = [m for m in messages if isinstance(m, AIMessage) and getattr(m, "name", None) == "db_assistant" and m.content]
+            return AIMessage(content=answers[-1].content if answers else "No data.")
+
+        if "run_query" in self.tool_names:
+            url = None
+            for message in messages:
+                match = URL_PATTERN.search(str(message.content))
+                if match:
+                    url = match.group(1)
+
+            turn_tools = []
+            for message in reversed(messages):
+                if isinstance(message, HumanMessage):
+                    break
+                if isinstance(message, ToolMessage) and message.name in SCHEMA_TOOLS | {"run_query"}:
+                    turn_tools.append(message.name)
+
+            if not turn_tools:
+                schema_args = {"db_connection_url": url, "schema_name": self.script["schema_name"]}
+                if self.script.get("relevant_schema") and "fetch_relevant_schema" in self.tool_names:
+                    return self._tool_call("fetch_relevant_schema", {**schema_args, "question": str(last.content)})
+                return self._tool_call("fetch_schema", schema_args)
+
+            if turn_tools[0] in SCHEMA_TOOLS:
+                return self._tool_call("run_query", {"db_connection_url": url, "query": self._query(messages)})
+
+            rows = next(m for m in reversed(messages) if isinstance(m, ToolMessage) and m.name == "run_query")
+            return AIMessage(content=f"data: {str(rows.content)[:500]}\nquery: {self._query(messages)}")
+
+        # history summaries and other plain completions
+        return AIMessage(content="Summary of the benchmark conversation.")
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        message = self._respond(messages)
+        prompt_chars = sum(len(str(m.content)) for m in messages)
+        message.usage_metadata = {
+            "input_tokens": prompt_chars // 4,
+            "output_tokens": len(str(message.content)) // 4,
+            "total_tokens": prompt_chars // 4 + len(str(message.content)) // 4,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _latency(self) -> float:
+        capacity = self.script.get("capacity")
+        if not capacity:
+            return self.script["latency"]
+        return self.script["latency"] * max(1.0, self.script.get("in_flight", 0) / capacity)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        if self.script.get("latency"):
+            self.script["in_flight"] = self.script.get("in_flight", 0) + 1
+            try:
+                time.sleep(self._latency())
+            finally:
+                self.script["in_flight"] -= 1
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        if self.script.get("latency"):
+            self.script["in_flight"] = self.script.get("in_flight", 0) + 1
+            try:
+                await asyncio.sleep(self._latency())
+            finally:
+                self.script["in_flight"] -= 1
+        return self._result(messages)
@@ -0,0 +1,155 @@
+"""
+Benchmark of the logging overhead on the request path.
+
+Simulates requests that each log a few INFO payloads (dicts like the
+controllers', one holding a request model) and DEBUG events, through:
+
+- sync: the former set-up, DEBUG level with console and file handlers
+  writing in the calling thread
+- queue: the queued handler with text lines, DEBUG level
+- queue-json: the same with JSON lines
+- queue-sampled: text lines, keeping `--sample-rate` of the DEBUG records
+- queue-info: text lines at INFO level, DEBUG calls filtered out
+
+and reports the time the caller spends logging per request, and how long
+the listener thread needs afterwards to write the queued records (records
+dropped because the queue was full are counted). Console output goes to
+/dev/null and files to a temporary directory.
+
+Example:
+    python -m benchmarks.logging_overhead --requests 500 --output logging.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import List
+from uuid import uuid4
+
+# the OpenAI client is built at import time but never called
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from .chat_pipeline import git_revision, summarize
+
+from app.constants import config
+from app.helper.logger import TEXT_FORMAT, RequestIdFilter, DebugSampler, log_formatter, log_handlers, start_log_queue
+from app.controllers.session.functions.create_session import CreateSessionPayload
+
+MODES = ["sync", "queue", "queue-json", "queue-sampled", "queue-info"]
+
+def build_logger(mode: str, log_dir: str, devnull, sample_rate: float):
+    """
+    Isolated logger for one mode, and the listener of its queue (if any).
+    """
+    logger = logging.getLogger(f"benchmark.logging.{mode}")
+    logger.propagate = False
+    logger.handlers.clear()
+    logger.setLevel(logging.INFO if mode == "queue-info" else logging.DEBUG)
+
+    if mode == "sync":
+        formatter = logging.Formatter(TEXT_FORMAT)
+        handlers = [logging.StreamHandler(devnull), logging.FileHandler(os.path.join(log_dir, "sync.log"))]
+        for handler in handlers:
+            handler.setFormatter(formatter)
+            handler.addFilter(RequestIdFilter())
+            logger.addHandler(handler)
+        return logger, None
+
+    config["LOG_DIR"] = log_dir
+    handlers = log_handlers(mode, log_formatter("json" if mode == "queue-json" else "text"))
+    handlers[0].setStream(devnull)
+
+    queue_handler, listener = start_log_queue(handlers, config["LOG_QUEUE_SIZE"])
+    queue_handler.addFilter(RequestIdFilter())
+    queue_handler.addFilter(DebugSampler(sample_rate if mode == "queue-sampled" else 1.0))
+    logger.addHandler(queue_handler)
+    return logger, listener
+
+def run_mode(args, mode: str, log_dir: str, devnull) -> dict:
+    logger, listener = build_logger(mode, log_dir, devnull, args.sample_rate)
+    payload = CreateSessionPayload(name="benchmark", user_id=uuid4(), db_connection_url="sqlite:////tmp/benchmark.sqlite3")
+
+    latencies: List[float] = []
+    for request in range(args.requests):
+        session_id = uuid4()
+        start = time.perf_counter()
+        logger.info({"action": "create_session_controller", "payload": payload})
+        for call in range(args.info_calls - 1):
+            logger.info({"action": "user_chat_controller - token_usage", "session_id": session_id, "call": call, "prompt_tokens": 1200, "completion_tokens": 80})
+        for call in range(args.debug_calls):
+            logger.debug({"action": "engine_registry_checkout", "session_id": session_id, "call": call})
+        latencies.append(time.perf_counter() - start)
+
+    dropped = sum(getattr(handler, "dropped", 0) for handler in logger.handlers)
+    start = time.perf_counter()
+    if listener is not None:
+        listener.stop()
+    drain = time.perf_counter() - start
+
+    for handler in list(logger.handlers):
+        handler.close()
+        logger.removeHandler(handler)
+    if listener is not None:
+        for handler in listener.handlers:
+            handler.close()
+
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "request_overhead": summarize(latencies),
+        "drain_seconds": drain,
+        "dropped_records": dropped,
+    }
+
+def main(args) -> dict:
+    results = []
+    with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, "w") as devnull:
+        for mode in args.modes:
+            result = run_mode(args, mode, log_dir, devnull)
+            results.append(result)
+            overhead = result["request_overhead"]
+            print(
+                f"mode={mode} p50={overhead['p50'] * 1e6:.1f}us p95={overhead['p95'] * 1e6:.1f}us "
+                f"mean={overhead['mean'] * 1e6:.1f}us drain={result['drain_seconds']:.3f}s dropped={result['dropped_records']}",
+                file=sys.stderr,
+            )
+
+    return {
+        "benchmark": "logging_overhead",
+        "revision": git_revision(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "settings": {
+            "requests": args.requests,
+            "info_calls": args.info_calls,
+            "debug_calls": args.debug_calls,
+            "sample_rate": args.sample_rate,
+            "queue_size": config["LOG_QUEUE_SIZE"],
+        },
+        "results": results,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the logging overhead on the request path.")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES, help="logging set-ups to compare")
+    parser.add_argument("--requests", type=int, default=500, help="simulated requests per mode")
+    parser.add_argument("--info-calls", type=int, default=6, help="INFO records per request")
+    parser.add_argument("--debug-calls", type=int, default=4, help="DEBUG records per request")
+    parser.add_argument("--sample-rate", type=float, default=0.1, help="kept share of DEBUG records in queue-sampled")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = main(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,122 @@
+"""
+Benchmark of independent run_query calls issued in one db_assistant step.
+
+Sends one AI message with N run_query tool calls through the agent's tool
+node, as the model does for multi-query questions, once per per-database
+concurrency cap, and reports the wall time of the step against the sum of
+the individual query times.
+
+No application database or model is needed; the target database defaults to
+a local SQLite file, where each query is a recursive CTE that keeps SQLite
+busy for a while (CPU bound, so these only overlap on a multi-core host). On
+PostgreSQL, `--query "SELECT pg_sleep(0.5), {i}"` gives queries of a known
+duration that wait on the server like slow analytic queries do.
+
+Example:
+    python -m benchmarks.parallel_tools --calls 4 --caps 1 4 --output parallel_tools.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import uuid
+from datetime import datetime
+
+# the OpenAI client is built at import time but never called
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from langchain_core.messages import AIMessage
+from langgraph.prebuilt import ToolNode
+
+from .chat_pipeline import git_revision, summarize
+from app.constants import config
+from app.db import engine_registry
+from app.agents.db_agent.tools import run_query
+
+async def run_step(node: ToolNode, db_url: str, query: str, calls: int) -> float:
+    message = AIMessage(content="", tool_calls=[
+        # a distinct literal per call keeps the queries apart in every cache
+        {"name": "run_query", "args": {"db_connection_url": db_url, "query": query.format(i=i)}, "id": f"call_{uuid.uuid4().hex[:12]}"}
+        for i in range(calls)
+    ])
+
+    start = time.perf_counter()
+    result = await node.ainvoke({"messages": [message]})
+    elapsed = time.perf_counter() - start
+
+    errors = [m.content for m in result["messages"] if m.status == "error"]
+    if errors:
+        raise RuntimeError(errors[0])
+    return elapsed
+
+async def main(args) -> dict:
+    config["QUERY_CACHE_ENABLED"] = False
+    config["RESULT_STORE_ENABLED"] = False
+
+    db_url = args.target_db
+    query = args.query
+    node = ToolNode([run_query])
+
+    # one query on its own, the baseline for the sequential sum
+    await run_step(node, db_url, query, 1)
+    single = [await run_step(node, db_url, query, 1) for _ in range(args.repeat)]
+
+    results = []
+    for cap in args.caps:
+        await engine_registry.adispose(db_url)
+        engine_registry.max_concurrent_queries = cap
+
+        steps = [await run_step(node, db_url, query, args.calls) for _ in range(args.repeat)]
+        stats = engine_registry.stats()
+        result = {
+            "max_concurrent_queries": cap,
+            "calls": args.calls,
+            "step": summarize(steps),
+            "sequential_estimate_seconds": summarize(single)["p50"] * args.calls,
+            "query_slot_waits": stats["query_slot_waits"],
+        }
+        results.append(result)
+        print(
+            f"cap={cap} calls={args.calls} step p50={result['step']['p50']:.3f}s "
+            f"sequential estimate={result['sequential_estimate_seconds']:.3f}s",
+            file=sys.stderr,
+        )
+
+    return {
+        "benchmark": "parallel_tools",
+        "revision": git_revision(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "settings": {
+            "target_db": db_url,
+            "query": query,
+            "calls": args.calls,
+            "repeat": args.repeat,
+        },
+        "single_query": summarize(single),
+        "results": results,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark concurrent run_query calls in one agent step.")
+    parser.add_argument("--target-db", default="sqlite:////tmp/db_agent_bench_parallel.sqlite3", help="target database URL")
+    parser.add_argument("--query", default="SELECT (WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000 + {i}) SELECT count(*) FROM c) AS n",
+                        help="SQL of every call, '{i}' is replaced by the call index")
+    parser.add_argument("--calls", type=int, default=4, help="run_query calls in the step")
+    parser.add_argument("--caps", type=int, nargs="+", default=[1, 4], help="per-database concurrency caps to compare")
+    parser.add_argument("--repeat", type=int, default=3, help="steps per cap")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,166 @@
+"""
+Benchmark of the SQL plan cache of the db_assistant agent.
+
+Drives questions that share a shape but differ in their literals (a category
+name, a threshold) through `user_chat_controller` with the scripted chat
+model, once with the plan cache disabled and once enabled, and reports the
+plan hit rate, LLM calls per turn, turn latency and the latency the cache
+estimates it saved.
+
+The application database configured through DB_* must be reachable and
+migrated; the target database defaults to a local SQLite file.
+
+Example:
+    python -m benchmarks.plan_cache --llm-latency 0.5 --turns 20 --output plan_cache.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import re
+import sys
+import time
+from datetime import datetime
+from typing import List
+
+from .chat_pipeline import SCRIPT, create_sessions, delete_sessions, git_revision, summarize
+from .datasets import seed_schema, bench_table
+
+from app.constants import config
+from app.db import chat_write_behind
+from app.helper import start_stage_timing
+from app.agents.db_agent.tools import sql_plan_cache
+from app.controllers.chat.functions.user_chat import user_chat_controller
+
+# question templates and the SQL the scripted agent writes for them
+QUESTIONS = [
+    (
+        "What is the total amount for category c{k}?",
+        re.compile(r"category (\S+?)\?$"),
+        "SELECT sum(amount) AS total FROM {table} WHERE category = '{value}'",
+    ),
+    (
+        "How many rows have an amount over {n}?",
+        re.compile(r"over (\d+)\?$"),
+        "SELECT count(*) AS n FROM {table} WHERE amount > {value}",
+    ),
+]
+
+def question(turn: int) -> str:
+    template = QUESTIONS[turn % len(QUESTIONS)][0]
+    return template.format(k=turn % 7, n=100 * (turn % 9))
+
+def query_for(table: str):
+    def query(text: str) -> str:
+        for _, pattern, sql in QUESTIONS:
+            match = pattern.search(text)
+            if match is not None:
+                return sql.format(table=table, value=match.group(1))
+        return f"SELECT count(*) AS n FROM {table}"
+    return query
+
+async def run_client(session_id, turns: int, latencies: List[float], llm_calls: List[int], errors: List[str]):
+    for turn in range(turns):
+        timings = start_stage_timing()
+        start = time.perf_counter()
+        try:
+            await user_chat_controller(session_id, question(turn))
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+        llm_calls.append(len(timings.get("llm", [])))
+
+async def run_cache(args, db_url: str, enabled: bool) -> dict:
+    config["PLAN_CACHE_ENABLED"] = enabled
+    user_id, session_ids = create_sessions(db_url, args.concurrency)
+
+    latencies: List[float] = []
+    llm_calls: List[int] = []
+    errors: List[str] = []
+    before = sql_plan_cache.stats()
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*[run_client(session_id, args.turns, latencies, llm_calls, errors) for session_id in session_ids])
+    finally:
+        elapsed = time.perf_counter() - start
+        await asyncio.to_thread(chat_write_behind.drain)
+        if not args.keep_sessions:
+            delete_sessions(user_id, session_ids)
+
+    after = sql_plan_cache.stats()
+    hits = after["hits"] - before["hits"]
+    lookups = hits + after["misses"] - before["misses"]
+
+    return {
+        "plan_cache": "on" if enabled else "off",
+        "turns": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "elapsed_seconds": elapsed,
+        "plan_hit_rate": hits / lookups if lookups else 0.0,
+        "plans_stored": after["stores"] - before["stores"],
+        "turn_latency": summarize(latencies),
+        "llm_calls_per_turn": sum(llm_calls) / len(llm_calls) if llm_calls else 0.0,
+        "llm_calls_saved": after["llm_calls_saved"] - before["llm_calls_saved"],
+        "latency_saved_seconds": after["latency_saved_seconds"] - before["latency_saved_seconds"],
+    }
+
+async def main(args) -> dict:
+    SCRIPT["latency"] = args.llm_latency
+    config["QUERY_CACHE_ENABLED"] = False
+
+    db_url = args.target_db
+    SCRIPT["schema_name"] = seed_schema(db_url, args.tables, rows=args.rows)
+    SCRIPT["query_for"] = query_for(bench_table(db_url, args.tables))
+
+    results = []
+    for enabled in (False, True):
+        result = await run_cache(args, db_url, enabled)
+        results.append(result)
+        print(
+            f"plan_cache={result['plan_cache']} turns={result['turns']} errors={result['errors']} "
+            f"hit_rate={result['plan_hit_rate']:.2f} p50={result['turn_latency'].get('p50', 0):.4f}s "
+            f"llm_calls/turn={result['llm_calls_per_turn']:.2f} saved={result['latency_saved_seconds']:.2f}s",
+            file=sys.stderr,
+        )
+
+    return {
+        "benchmark": "plan_cache",
+        "revision": git_revision(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "settings": {
+            "target_db": db_url,
+            "tables": args.tables,
+            "rows": args.rows,
+            "turns_per_client": args.turns,
+            "concurrency": args.concurrency,
+            "llm_latency": args.llm_latency,
+            "questions": [template for template, _, _ in QUESTIONS],
+        },
+        "results": results,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the SQL plan cache of the db_assistant agent.")
+    parser.add_argument("--target-db", default="sqlite:////tmp/db_agent_bench_plan_cache.sqlite3", help="target database URL")
+    parser.add_argument("--tables", type=int, default=10, help="synthetic schema size")
+    parser.add_argument("--rows", type=int, default=1000, help="rows in the queried table")
+    parser.add_argument("--turns", type=int, default=12, help="chat turns per session")
+    parser.add_argument("--concurrency", type=int, default=1, help="concurrent sessions")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="simulated seconds per LLM call")
+    parser.add_argument("--keep-sessions", action="store_true", help="do not delete the benchmark sessions")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
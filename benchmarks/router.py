@@ -0,0 +1,164 @@
+"""
+Benchmark of the fast-path router in front of the chat supervisor.
+
+Drives a mix of data questions, chart requests and follow-ups through
+`user_chat_controller` with the scripted chat model, once with the router
+disabled and once enabled, and reports the fast-path hit rate, turn latency
+per route and the LLM calls per turn.
+
+The application database configured through DB_* must be reachable and
+migrated; the target database defaults to a local SQLite file.
+
+Example:
+    python -m benchmarks.router --llm-latency 0.5 --turns 20 --output router.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from .chat_pipeline import SCRIPT, create_sessions, delete_sessions, git_revision, summarize
+from .datasets import seed_schema, bench_table
+
+from app.constants import config
+from app.db import chat_write_behind
+from app.helper import start_stage_timing
+from app.agents.chat_agent.router import router_stats
+from app.controllers.chat.functions.user_chat import user_chat_controller
+
+# questions cycled through by every session, with the route they are expected to take
+QUESTIONS = [
+    "What is the total amount per category?",
+    "How many rows are in the table per category?",
+    "Plot the total amount per category as a bar chart",
+    "Why is that category so high?",
+    "Show me the top 5 categories by amount",
+    "Can you explain these numbers?",
+]
+
+async def run_client(session_id, turns: int, by_route: Dict[str, Dict[str, List[float]]], errors: List[str]):
+    for turn in range(turns):
+        timings = start_stage_timing()
+        start = time.perf_counter()
+        try:
+            await user_chat_controller(session_id, QUESTIONS[turn % len(QUESTIONS)])
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        latency = time.perf_counter() - start
+
+        route = next((stage[len("route:"):] for stage in timings if stage.startswith("route:")), "unknown")
+        stats = by_route.setdefault(route, {"turn_latency": [], "llm_calls": [], "fast_path_steps": []})
+        stats["turn_latency"].append(latency)
+        stats["llm_calls"].append(len(timings.get("llm", [])))
+        stats["fast_path_steps"].append(len(timings.get("fast_path", [])))
+
+async def run_router(args, db_url: str, enabled: bool) -> dict:
+    config["ROUTER_ENABLED"] = enabled
+    user_id, session_ids = create_sessions(db_url, args.concurrency)
+
+    by_route: Dict[str, Dict[str, List[float]]] = {}
+    errors: List[str] = []
+    before = router_stats.stats()
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*[run_client(session_id, args.turns, by_route, errors) for session_id in session_ids])
+    finally:
+        elapsed = time.perf_counter() - start
+        await asyncio.to_thread(chat_write_behind.drain)
+        if not args.keep_sessions:
+            delete_sessions(user_id, session_ids)
+
+    after = router_stats.stats()
+    turns = after["turns"] - before["turns"]
+    hits = (after["data_turns"] - before["data_turns"]) + (after["chart_turns"] - before["chart_turns"])
+    latencies = [value for stats in by_route.values() for value in stats["turn_latency"]]
+    llm_calls = [value for stats in by_route.values() for value in stats["llm_calls"]]
+
+    return {
+        "router": "on" if enabled else "off",
+        "turns": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "elapsed_seconds": elapsed,
+        "fast_path_hit_rate": hits / turns if turns else 0.0,
+        "fallbacks": after["fallback_turns"] - before["fallback_turns"],
+        "turn_latency": summarize(latencies),
+        "llm_calls_per_turn": sum(llm_calls) / len(llm_calls) if llm_calls else 0.0,
+        "routes": {
+            route: {
+                "turns": len(stats["turn_latency"]),
+                "turn_latency": summarize(stats["turn_latency"]),
+                "llm_calls_per_turn": sum(stats["llm_calls"]) / len(stats["llm_calls"]),
+                "fast_path_steps_per_turn": sum(stats["fast_path_steps"]) / len(stats["fast_path_steps"]),
+            }
+            for route, stats in sorted(by_route.items())
+        },
+    }
+
+async def main(args) -> dict:
+    SCRIPT["latency"] = args.llm_latency
+    config["QUERY_CACHE_ENABLED"] = False
+    config["PLAN_CACHE_ENABLED"] = False
+
+    db_url = args.target_db
+    SCRIPT["schema_name"] = seed_schema(db_url, args.tables, rows=args.rows)
+    SCRIPT["query"] = args.query.format(table=bench_table(db_url, args.tables))
+
+    results = []
+    for enabled in (False, True):
+        result = await run_router(args, db_url, enabled)
+        results.append(result)
+        print(
+            f"router={result['router']} turns={result['turns']} errors={result['errors']} "
+            f"hit_rate={result['fast_path_hit_rate']:.2f} p50={result['turn_latency'].get('p50', 0):.4f}s "
+            f"llm_calls/turn={result['llm_calls_per_turn']:.2f}",
+            file=sys.stderr,
+        )
+
+    return {
+        "benchmark": "router",
+        "revision": git_revision(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "settings": {
+            "target_db": db_url,
+            "tables": args.tables,
+            "rows": args.rows,
+            "turns_per_client": args.turns,
+            "concurrency": args.concurrency,
+            "llm_latency": args.llm_latency,
+            "router_min_confidence": config["ROUTER_MIN_CONFIDENCE"],
+            "questions": QUESTIONS,
+        },
+        "results": results,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the fast-path router in front of the chat supervisor.")
+    parser.add_argument("--target-db", default="sqlite:////tmp/db_agent_bench_router.sqlite3", help="target database URL")
+    parser.add_argument("--tables", type=int, default=10, help="synthetic schema size")
+    parser.add_argument("--rows", type=int, default=1000, help="rows in the queried table")
+    parser.add_argument("--query", default="SELECT category, count(*) AS n, sum(amount) AS total FROM {table} GROUP BY category",
+                        help="SQL run by the scripted agent, '{table}' is replaced by the queried table")
+    parser.add_argument("--turns", type=int, default=12, help="chat turns per session")
+    parser.add_argument("--concurrency", type=int, default=1, help="concurrent sessions")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="simulated seconds per LLM call")
+    parser.add_argument("--keep-sessions", action="store_true", help="do not delete the benchmark sessions")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,97 @@
+"""
+Benchmark of worker cold-start time.
+
+Starts fresh Python processes and times, in each, importing the application
+(`import main`, what a worker pays before serving any route) and then
+building the chat supervisor with its agents and LLM client (what the first
+chat turn, or the start-up warm-up, pays). Processes are started with the
+environment of this one, so .env and DB_* settings apply; nothing is sent to
+OpenAI.
+
+`--repo` points at another checkout (e.g. a `git worktree` of an earlier
+revision), so cold starts can be compared across revisions; trees where the
+agents are built at import report the whole cost under `import_main`.
+
+Example:
+    python -m benchmarks.startup --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+from .chat_pipeline import summarize
+
+# run in a fresh interpreter; prints the phase timings as JSON
+PROBE = """
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+import app.agents as agents
+build = getattr(agents, "get_supervisor", None)
+supervisor = build() if build is not None else agents.supervisor
+built = time.perf_counter()
+print(json.dumps({"import_main": imported - start, "build_supervisor": built - imported, "total": built - start}))
+"""
+
+def git_revision(repo: str) -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def probe(repo: str) -> dict:
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "benchmark")}
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=repo, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main(args) -> dict:
+    repo = os.path.abspath(args.repo)
+
+    # the first start also compiles bytecode; it is not counted
+    probe(repo)
+
+    phases: dict = {"import_main": [], "build_supervisor": [], "total": []}
+    for _ in range(args.runs):
+        timings = probe(repo)
+        for phase, values in phases.items():
+            values.append(timings[phase])
+
+    results = {phase: summarize(values) for phase, values in phases.items()}
+    print(
+        " ".join(f"{phase}_p50={stats['p50']:.3f}s" for phase, stats in results.items()),
+        file=sys.stderr,
+    )
+
+    return {
+        "benchmark": "startup",
+        "revision": git_revision(repo),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "settings": {
+            "repo": repo,
+            "runs": args.runs,
+        },
+        "results": results,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark worker cold-start time.")
+    parser.add_argument("--repo", default=".", help="checkout to start the application from")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes to time")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = main(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
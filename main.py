@@ -1,14 +1,60 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
 
 from app.controllers.chat import router as chat_router
 from app.controllers.session import router as session_router
 from app.controllers.user import router as user_router
+from app.controllers.result import router as result_router
+from app.controllers.metrics import router as metrics_router
+from app.constants import config
+from app.db import async_engine, engine_registry, chat_write_behind
+from app.agents import warm_up_agents
+from app.helper import logger, RequestMetricsMiddleware, AdmissionRejected
 
-load_dotenv()
+async def open_app_connection():
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
 
-app = FastAPI(title="DB Retrieval", version="1.0")
+async def warm_up():
+    """
+    Build the agent graphs and open application database connections in the
+    background, so the first chat turn does not pay for them.
+    """
+    start = time.perf_counter()
+    try:
+        if config["WARMUP_AGENTS"]:
+            await asyncio.to_thread(warm_up_agents)
+        # held at once, so the pool keeps that many open connections
+        await asyncio.gather(*[open_app_connection() for _ in range(config["WARMUP_DB_CONNECTIONS"])])
+        logger.info({"action": "warm_up", "seconds": time.perf_counter() - start})
+    except Exception as e:
+        logger.error({"action": "warm_up - error", "error": str(e)})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config["CHAT_PERSISTENCE_MODE"] == "async":
+        chat_write_behind.start()
+
+    # requests are served while the warm-up runs; an early turn builds what it needs itself
+    warm_up_task = asyncio.create_task(warm_up())
+
+    yield
+
+    warm_up_task.cancel()
+
+    # write queued chat messages before the database pools are closed
+    await asyncio.to_thread(chat_write_behind.drain, config["CHAT_WRITE_DRAIN_TIMEOUT"])
+
+    # release pooled connections to the target databases and the app database
+    await engine_registry.adispose()
+    await async_engine.dispose()
+
+app = FastAPI(title="DB Retrieval", version="1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,8 +62,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "Content-Range", "Accept-Ranges", "Retry-After"],
 )
 
+# request ids for log lines and request metrics, outermost so CORS responses are counted too
+app.add_middleware(RequestMetricsMiddleware)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    # turns refused by admission control: the client should back off and retry
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "reason": exc.reason, "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 app.include_router(chat_router, prefix="/api/v1", tags=["Chat"])
 app.include_router(session_router, prefix="/api/v1", tags=["Session"])
 app.include_router(user_router, prefix="/api/v1", tags=["User"])
+app.include_router(result_router, prefix="/api/v1", tags=["Result"])
+app.include_router(metrics_router)